@@ -0,0 +1,191 @@
+# AI-Shopping-Assistant/app/services/alert_evaluator.py
+
+import os
+import asyncio
+import functools
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+from sqlalchemy import update, or_
+from sqlalchemy.orm import Session
+from ..database.db import Product, PriceAlert, SessionLocal
+from ..utils.logger import setup_logging
+from .affiliate import affiliate_service
+from .email_alerts import email_queue
+from .db_executor import run_db
+
+logger = setup_logging(__name__)
+
+# Keeps the IN (...) list well under SQLite's bound-parameter limit
+ALERT_QUERY_CHUNK = 500
+# A claimed alert whose delivery was never recorded (its worker died) can be claimed
+# again after this long (seconds)
+ALERT_CLAIM_TIMEOUT = int(os.getenv("ALERT_CLAIM_TIMEOUT", "3600"))
+
+
+def _unclaimed(now: datetime):
+    return or_(PriceAlert.notified_at == None, PriceAlert.notified_at < now - timedelta(seconds=ALERT_CLAIM_TIMEOUT))
+
+
+def find_triggered_alerts(db: Session, product_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    Joins the given products against their active, unclaimed alerts in one query
+    per chunk (served by the (product_id, active, target_price) index) and returns
+    the triggered alerts grouped by product.
+    """
+    triggered: Dict[int, Dict[str, Any]] = {}
+    now = datetime.utcnow()
+    for start in range(0, len(product_ids), ALERT_QUERY_CHUNK):
+        chunk = product_ids[start:start + ALERT_QUERY_CHUNK]
+        rows = db.query(
+            PriceAlert.id,
+            PriceAlert.user_email,
+            PriceAlert.target_price,
+            Product.id,
+            Product.name,
+            Product.url,
+            Product.store,
+            Product.current_price,
+        ).join(
+            Product, Product.id == PriceAlert.product_id
+        ).filter(
+            PriceAlert.product_id.in_(chunk),
+            PriceAlert.active == True,
+            PriceAlert.target_price > Product.current_price, # Price drop condition
+            _unclaimed(now),
+        ).all()
+
+        for alert_id, user_email, target_price, product_id, name, url, store, current_price in rows:
+            entry = triggered.get(product_id)
+            if entry is None:
+                entry = triggered[product_id] = {
+                    "product": {"id": product_id, "name": name, "url": url, "store": store, "current_price": current_price},
+                    "alerts": [],
+                }
+            entry["alerts"].append({"id": alert_id, "user_email": user_email, "target_price": target_price})
+    return triggered
+
+
+def claim_alerts(db: Session, alert_ids: List[int]) -> Set[int]:
+    """
+    Marks the given alerts as being notified (notified_at) and returns the ones this
+    call claimed. The UPDATE re-checks the claim, so when several worker processes
+    or hosts trigger the same alert, exactly one of them queues its email.
+    """
+    claimed: Set[int] = set()
+    now = datetime.utcnow()
+    for start in range(0, len(alert_ids), ALERT_QUERY_CHUNK):
+        chunk = alert_ids[start:start + ALERT_QUERY_CHUNK]
+        claimed.update(db.scalars(
+            update(PriceAlert).where(PriceAlert.id.in_(chunk), PriceAlert.active == True, _unclaimed(now))
+            .values(notified_at=now).returning(PriceAlert.id),
+            execution_options={"synchronize_session": False},
+        ).all())
+    db.commit()
+    return claimed
+
+
+def record_deliveries(delivered: List[int], failed: List[int]):
+    """
+    Deactivates delivered alerts and releases the claim on failed ones (they are
+    retried when they trigger again), with one bulk UPDATE per chunk.
+    """
+    db = SessionLocal()
+    try:
+        for alert_ids, values in ((delivered, {"active": False}), (failed, {"notified_at": None})):
+            for start in range(0, len(alert_ids), ALERT_QUERY_CHUNK):
+                chunk = alert_ids[start:start + ALERT_QUERY_CHUNK]
+                db.execute(
+                    update(PriceAlert).where(PriceAlert.id.in_(chunk)).values(**values),
+                    execution_options={"synchronize_session": False},
+                )
+        db.commit()
+    finally:
+        db.close()
+
+
+class AlertDeliveryTracker:
+    """
+    Follows queued alert emails without awaiting them, so a scrape batch never
+    waits on the queue's coalesce window or SMTP retries. Alerts are claimed in the
+    database before their email is queued (claim_alerts), so no other worker sends
+    them again; as emails finish, their outcomes are written back from the future's
+    done callback in batches on the DB executor: delivered alerts are deactivated,
+    failed ones released.
+    """
+
+    def __init__(self):
+        self._delivered: List[int] = []
+        self._failed: List[int] = []
+        self._writer: Optional[asyncio.Task] = None
+
+    def track(self, alert_id: int, future: asyncio.Future):
+        future.add_done_callback(functools.partial(self._on_done, alert_id))
+
+    def _on_done(self, alert_id: int, future: asyncio.Future):
+        if not future.cancelled() and future.exception() is None and future.result():
+            self._delivered.append(alert_id)
+        else:
+            self._failed.append(alert_id)
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.get_running_loop().create_task(self._write())
+
+    async def _write(self):
+        # Outcomes arriving while a write runs are picked up by the next loop iteration
+        while self._delivered or self._failed:
+            delivered, failed = self._delivered, self._failed
+            self._delivered, self._failed = [], []
+            try:
+                await run_db(record_deliveries, delivered, failed)
+            except Exception as e:
+                # Kept for the next outcome or drain(); until then the claim keeps them from being resent
+                logger.error(f"Recording {len(delivered) + len(failed)} alert deliveries failed: {e}")
+                self._delivered, self._failed = delivered + self._delivered, failed + self._failed
+                return
+
+    async def drain(self):
+        """Writes every outcome recorded so far (call on shutdown, after the email queue stops)."""
+        if self._writer is not None:
+            await self._writer
+        await self._write()
+
+
+alert_delivery_tracker = AlertDeliveryTracker()
+
+
+async def evaluate_price_alerts(db: Session, product_ids: List[int]) -> Dict[str, int]:
+    """
+    Evaluates every active alert for a batch of updated products, claims the
+    triggered ones and hands their emails to the delivery queue (which merges
+    alerts per recipient into digests) without waiting for delivery. Costs a
+    handful of queries regardless of the number of alerts; they run on the DB
+    executor threads.
+    """
+    if not product_ids:
+        return {"triggered": 0, "queued": 0}
+
+    triggered = await run_db(find_triggered_alerts, db, list(product_ids))
+    alert_ids = [alert["id"] for entry in triggered.values() for alert in entry["alerts"]]
+    claimed = await run_db(claim_alerts, db, alert_ids) if alert_ids else set()
+    queued = 0
+
+    for entry in triggered.values():
+        product = entry["product"]
+        alerts = [alert for alert in entry["alerts"] if alert["id"] in claimed] # Others: claimed by another worker
+        if not alerts:
+            continue
+        # Build the monetized link once per product, not once per alert
+        affiliate_link = affiliate_service.convert_to_affiliate_link(product["url"])
+
+        for alert in alerts:
+            alert_data = {
+                "product_name": product.get("name") or "Product",
+                "target_price": alert["target_price"],
+                "current_price": product["current_price"],
+                "product_url": affiliate_link,
+                "store": product.get("store") or "Store",
+            }
+            alert_delivery_tracker.track(alert["id"], email_queue.enqueue(alert["user_email"], alert_data))
+            queued += 1
+
+    logger.info(f"Alert evaluation: {len(product_ids)} products, {len(alert_ids)} triggered, {queued} queued.")
+    return {"triggered": len(alert_ids), "queued": queued}
@@ -0,0 +1,96 @@
+# AI-Shopping-Assistant/backfill_embeddings.py
+
+"""
+Bulk embedding backfill.
+
+Streams products that have no embedding yet in primary-key order, encodes them
+with sentence-transformers in large batches, and writes the compact binary
+embeddings back with one bulk UPDATE per chunk.
+
+Usage (from the project root):
+    python backfill_embeddings.py [--chunk-size 2048] [--batch-size 256] [--dtype float16]
+    python backfill_embeddings.py --migrate-json [--clear-json]   # convert legacy JSON embeddings
+    python backfill_embeddings.py --backend onnx                  # faster CPU encoding (see EMBEDDING_MODEL_BACKEND)
+
+When the backfill finishes it bumps catalog_state.embedding_version, and running
+API processes rebuild their vector index in the background (see app/ai/vector_index.py).
+"""
+
+import time
+import argparse
+
+# --- ABSOLUTE IMPORTS ---
+from app.database.db import SessionLocal, Product, create_db_and_tables
+from app.utils.logger import setup_logging
+from app.ai.embedding_store import (
+    EMBEDDING_MODEL_NAME, EMBEDDING_STORAGE_DTYPE, SUPPORTED_DTYPES,
+    product_text, store_product_embeddings, migrate_json_embeddings, bump_embedding_version,
+)
+from app.ai.model_backends import EMBEDDING_MODEL_BACKEND, SUPPORTED_BACKENDS, load_embedder
+# ------------------------
+
+logger = setup_logging(__name__)
+
+def backfill_embeddings(chunk_size: int, batch_size: int, dtype: str, backend: str = EMBEDDING_MODEL_BACKEND) -> int:
+    """Embeds every product missing an embedding. Returns the number of products written."""
+    model = load_embedder(EMBEDDING_MODEL_NAME, backend)
+    db = SessionLocal()
+    written, last_id = 0, 0
+    started = time.perf_counter()
+    try:
+        while True:
+            # Keyset pagination keeps each chunk query O(chunk) no matter how far in we are
+            rows = db.query(Product.id, Product.name, Product.description).filter(
+                Product.id > last_id,
+                Product.embedding_blob == None,
+                Product.embedding_vector == None,
+            ).order_by(Product.id).limit(chunk_size).all()
+            if not rows:
+                break
+
+            vectors = model.encode(
+                [product_text(name, description) for _, name, description in rows],
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+            store_product_embeddings(db, {row[0]: vector for row, vector in zip(rows, vectors)}, dtype)
+
+            written += len(rows)
+            last_id = rows[-1][0]
+            rate = written / (time.perf_counter() - started)
+            logger.info(f"Backfilled {written} embeddings ({rate:.1f} products/sec).")
+
+        if written:
+            bump_embedding_version(db) # Running API processes rebuild their vector index
+            db.commit()
+    finally:
+        db.close()
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, default=2048, help="Products fetched and written per transaction.")
+    parser.add_argument("--batch-size", type=int, default=256, help="Texts per model forward pass.")
+    parser.add_argument("--dtype", choices=SUPPORTED_DTYPES, default=EMBEDDING_STORAGE_DTYPE)
+    parser.add_argument("--backend", choices=SUPPORTED_BACKENDS, default=EMBEDDING_MODEL_BACKEND, help="Embedding model backend.")
+    parser.add_argument("--migrate-json", action="store_true", help="Convert legacy JSON embeddings instead of embedding new products.")
+    parser.add_argument("--clear-json", action="store_true", help="With --migrate-json, drop the JSON copy after converting.")
+    args = parser.parse_args()
+
+    # Adds the binary embedding columns to older database files
+    create_db_and_tables()
+
+    if args.migrate_json:
+        db = SessionLocal()
+        try:
+            count = migrate_json_embeddings(db, chunk_size=args.chunk_size, dtype=args.dtype, clear_json=args.clear_json)
+        finally:
+            db.close()
+        logger.info(f"Migrated {count} JSON embeddings to {args.dtype}.")
+    else:
+        count = backfill_embeddings(args.chunk_size, args.batch_size, args.dtype, args.backend)
+        logger.info(f"Backfill complete: {count} products embedded.")
+
+if __name__ == "__main__":
+    main()
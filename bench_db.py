@@ -0,0 +1,147 @@
+# AI-Shopping-Assistant/bench_db.py
+
+"""
+Concurrent read/write benchmark: API-style readers vs. a worker-style writer.
+
+Readers repeatedly load a 100-product page (the GET /products query); the writer
+updates prices with one commit per product, like the scrape worker. All of them
+are separate processes sharing one database, exactly like uvicorn + worker.py.
+
+Usage (from the project root):
+    python bench_db.py [--readers 4] [--writers 1] [--seconds 10] [--products 5000]
+    python bench_db.py --compare      # SQLite defaults vs. the tuned profile
+    DATABASE_URL=postgresql+psycopg://... python bench_db.py
+
+A throwaway SQLite file is used unless DATABASE_URL is set (the benchmark writes
+prices, so don't point it at production data).
+"""
+
+import os
+import time
+import random
+import tempfile
+import argparse
+import statistics
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# NOTE: app.database.db is imported inside the child processes, after DATABASE_URL
+# and SQLITE_TUNING are set, because the engine is created at import time.
+
+def seed(products: int):
+    from app.database.db import SessionLocal, Product
+    from sqlalchemy import insert
+
+    db = SessionLocal()
+    try:
+        if db.query(Product.id).count() >= products:
+            return
+        db.execute(insert(Product), [
+            {"name": f"Bench product {i}", "url": f"https://bench.example/{i}", "store": "bench", "current_price": 100.0}
+            for i in range(products)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+def _summary(latencies, errors, seconds):
+    ordered = sorted(latencies) or [0.0]
+    return {
+        "ops": len(latencies),
+        "per_second": len(latencies) / seconds,
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[int(0.95 * (len(ordered) - 1))] * 1000,
+        "errors": errors,
+    }
+
+def reader(seconds: float) -> dict:
+    from app.database.db import SessionLocal, Product
+    from sqlalchemy.exc import OperationalError
+
+    latencies, errors = [], 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        after_id = random.randint(0, 4000)
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            db.query(Product.id, Product.name, Product.current_price, Product.store, Product.last_scraped).filter(
+                Product.id > after_id
+            ).order_by(Product.id).limit(100).all()
+            latencies.append(time.perf_counter() - started)
+        except OperationalError: # "database is locked"
+            errors += 1
+        finally:
+            db.close()
+    return _summary(latencies, errors, seconds)
+
+def writer(seconds: float, products: int) -> dict:
+    from app.database.db import SessionLocal, Product
+    from sqlalchemy import update
+    from sqlalchemy.exc import OperationalError
+
+    latencies, errors = [], 0
+    deadline = time.monotonic() + seconds
+    db = SessionLocal()
+    try:
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                db.execute(
+                    update(Product).where(Product.id == random.randint(1, products)).values(current_price=round(random.uniform(50, 150), 2))
+                )
+                db.commit()
+                latencies.append(time.perf_counter() - started)
+            except OperationalError:
+                db.rollback()
+                errors += 1
+    finally:
+        db.close()
+    return _summary(latencies, errors, seconds)
+
+def run_profile(label: str, env: dict, args) -> None:
+    os.environ.update(env)
+    context = multiprocessing.get_context("spawn") # Children inherit the environment set above
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        pool.submit(seed, args.products).result()
+
+    with ProcessPoolExecutor(max_workers=args.readers + args.writers, mp_context=context) as pool:
+        readers = [pool.submit(reader, args.seconds) for _ in range(args.readers)]
+        writers = [pool.submit(writer, args.seconds, args.products) for _ in range(args.writers)]
+        read_results = [f.result() for f in readers]
+        write_results = [f.result() for f in writers]
+
+    print(f"\n{label}")
+    print(f"  {'':<8}{'ops/sec':>10}{'p50 ms':>10}{'p95 ms':>10}{'locked':>9}")
+    for name, results in (("reads", read_results), ("writes", write_results)):
+        if not results:
+            continue
+        print(
+            f"  {name:<8}{sum(r['per_second'] for r in results):>10.0f}"
+            f"{statistics.mean(r['p50_ms'] for r in results):>10.2f}"
+            f"{max(r['p95_ms'] for r in results):>10.2f}"
+            f"{sum(r['errors'] for r in results):>9}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=4, help="API-like reader processes.")
+    parser.add_argument("--writers", type=int, default=1, help="Worker-like writer processes.")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--compare", action="store_true", help="Also run with SQLite defaults (SQLITE_TUNING=0).")
+    args = parser.parse_args()
+
+    if os.getenv("DATABASE_URL"):
+        run_profile(f"Configured database ({os.environ['DATABASE_URL'].split('://')[0]})", {}, args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        profiles = [("SQLite defaults", "0")] if args.compare else []
+        profiles.append(("SQLite tuned profile (WAL, pragmas, pool)", "1"))
+        for label, tuning in profiles:
+            path = os.path.join(tmp, f"bench_{tuning}.db")
+            run_profile(label, {"DATABASE_URL": f"sqlite:///{path}", "SQLITE_TUNING": tuning}, args)
+
+if __name__ == "__main__":
+    main()
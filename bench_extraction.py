@@ -0,0 +1,97 @@
+# AI-Shopping-Assistant/bench_extraction.py
+
+"""
+Benchmarks the price extraction strategies over the saved HTML fixtures.
+
+Usage (from the project root):
+    python bench_extraction.py [--fixtures fixtures/html] [--iterations 200]
+
+Fixture files are named '<store>_<anything>.html'; the store prefix selects the
+registered extractor (e.g. 'amazon_laptop.html' -> amazon.com).
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+# --- ABSOLUTE IMPORTS ---
+from app.services import extractors
+from app.services.extractors import (
+    get_extractor, extract_structured_price, extract_price_async,
+    _select_with_soup, SELECTOLAX_AVAILABLE, LXML_AVAILABLE,
+)
+# ------------------------
+
+STORE_DOMAINS = {
+    "amazon": "amazon.com",
+    "ebay": "ebay.com",
+    "bestbuy": "bestbuy.com",
+}
+
+def load_fixtures(directory: str):
+    """Returns (url, html) pairs for every .html file in the fixture directory."""
+    corpus = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".html"):
+            continue
+        store = filename.split("_", 1)[0]
+        domain = STORE_DOMAINS.get(store, "example-store.com")
+        with open(os.path.join(directory, filename), encoding="utf-8") as f:
+            corpus.append((f"https://www.{domain}/{filename}", f.read()))
+    return corpus
+
+def time_strategy(fn, corpus, iterations: int):
+    """Runs fn(url, html) over the corpus `iterations` times; returns (ms/page, hits)."""
+    hits = sum(1 for url, html in corpus if fn(url, html) is not None)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for url, html in corpus:
+            fn(url, html)
+    elapsed = time.perf_counter() - started
+    return elapsed * 1000 / (iterations * len(corpus)), hits
+
+async def time_process_pool(corpus, iterations: int):
+    """Throughput of the async entry point (regex inline, DOM parsing in the process pool)."""
+    jobs = [(url, html) for _ in range(iterations) for url, html in corpus]
+    await extract_price_async(*corpus[0]) # Warm up the pool
+    started = time.perf_counter()
+    await asyncio.gather(*(extract_price_async(url, html) for url, html in jobs))
+    return len(jobs) / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", default=os.path.join("fixtures", "html"))
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    corpus = load_fixtures(args.fixtures)
+    if not corpus:
+        print(f"No .html fixtures found in {args.fixtures}")
+        sys.exit(1)
+
+    print(f"Corpus: {len(corpus)} pages, {args.iterations} iterations each\n")
+    print("Per-page results:")
+    for url, html in corpus:
+        print(f"  {url:<55} -> {get_extractor(url).extract(html)}")
+
+    strategies = [("regex pre-scan (JSON-LD/meta)", lambda url, html: extract_structured_price(html))]
+    if SELECTOLAX_AVAILABLE:
+        strategies.append(("selectolax", lambda url, html: extractors._select_with_selectolax(html, get_extractor(url).selectors)))
+    if LXML_AVAILABLE:
+        strategies.append(("bs4 + lxml", lambda url, html: _select_with_soup(html, get_extractor(url).selectors, "lxml")))
+    strategies.append(("bs4 + html5lib", lambda url, html: _select_with_soup(html, get_extractor(url).selectors, "html5lib")))
+    strategies.append(("full chain (extract)", lambda url, html: get_extractor(url).extract(html)))
+
+    print(f"\n{'Strategy':<32}{'ms/page':>10}{'pages/sec':>12}{'hits':>8}")
+    for name, fn in strategies:
+        ms_per_page, hits = time_strategy(fn, corpus, args.iterations)
+        print(f"{name:<32}{ms_per_page:>10.3f}{1000 / ms_per_page:>12.0f}{hits:>5}/{len(corpus)}")
+
+    pages_per_second = asyncio.run(time_process_pool(corpus, args.iterations))
+    print(f"\nextract_price_async with {extractors.EXTRACTION_WORKERS} pool workers: {pages_per_second:.0f} pages/sec")
+    extractors.shutdown_executor()
+
+if __name__ == "__main__":
+    main()
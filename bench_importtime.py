@@ -0,0 +1,84 @@
+# AI-Shopping-Assistant/bench_importtime.py
+
+"""
+Import-time regression check (python -X importtime).
+
+Imports each target module in a fresh interpreter, reports its total import time
+and the slowest top-level packages, and fails when a target pulls in a heavy ML
+package. The scrape worker and the products/scraper routes must never import
+torch; models are loaded lazily through app/ai/model_registry.py.
+
+Usage (from the project root):
+    python bench_importtime.py [--targets worker app.routes.products ...] [--top 10] [--budget-ms 0]
+
+Exit code 1 if a forbidden package was imported or a target exceeded --budget-ms.
+"""
+
+import sys
+import argparse
+import subprocess
+from collections import defaultdict
+
+# Modules that must stay import-light
+DEFAULT_TARGETS = ["worker", "app.routes.products", "app.routes.scraper"]
+# Heavy packages that only the model loaders may import
+FORBIDDEN = ("torch", "transformers", "sentence_transformers", "optimum", "onnxruntime")
+
+def import_profile(module: str):
+    """
+    Returns ({top-level package: microseconds}, total microseconds, set of every
+    package imported) for one import. Time is each module's own (self) time summed
+    per top-level package, so 'sqlalchemy' or 'numpy' show up under their own name
+    instead of inside whichever app module imported them first.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+
+    packages, total, seen = defaultdict(int), 0, set()
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        seen.add(package)
+        packages[package] += int(self_us)
+        total += int(self_us)
+    return packages, total, seen
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", nargs="+", default=DEFAULT_TARGETS)
+    parser.add_argument("--top", type=int, default=10, help="Slowest packages shown per target.")
+    parser.add_argument("--budget-ms", type=float, default=0, help="Fail if a target takes longer (0 = no budget).")
+    args = parser.parse_args()
+
+    failed = False
+    for target in args.targets:
+        try:
+            packages, total, seen = import_profile(target)
+        except RuntimeError as e:
+            print(f"{target}: could not be imported ({e})\n")
+            failed = True
+            continue
+
+        heavy = sorted(p for p in seen if p in FORBIDDEN)
+        print(f"{target}: {total / 1000:.0f} ms")
+        for name, micros in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {micros / 1000:>8.1f} ms  {name}")
+        if heavy:
+            print(f"  FAIL: imports {', '.join(heavy)}")
+            failed = True
+        if args.budget_ms and total / 1000 > args.budget_ms:
+            print(f"  FAIL: over the {args.budget_ms:.0f} ms budget")
+            failed = True
+        print()
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
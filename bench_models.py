@@ -0,0 +1,126 @@
+# AI-Shopping-Assistant/bench_models.py
+
+"""
+Compares the model backends (torch, quantized, onnx) for the chat and embedding models.
+
+Usage (from the project root):
+    python bench_models.py [--backends torch quantized onnx] [--models chat embedding]
+                           [--iterations 5] [--new-tokens 40] [--sentences 256]
+
+Each backend is loaded in a fresh process so resident memory (RSS) is measured in
+isolation. Reported per backend:
+    load s     - time to load (the first onnx run also includes the one-time export)
+    RSS MB     - resident memory added by loading the model
+    latency ms - median of one chat reply (fixed --new-tokens) / one sentence embedding
+    throughput - generated tokens/sec (chat) or sentences/sec in batches of 32 (embedding)
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# --- ABSOLUTE IMPORTS ---
+from app.ai.model_backends import SUPPORTED_BACKENDS, load_causal_lm, load_embedder
+from app.ai.inference_server import CHAT_MODEL_NAME, build_prompt
+from app.ai.embedding_store import EMBEDDING_MODEL_NAME
+# ------------------------
+
+PROMPTS = [
+    "Is this a good deal on a laptop for $450?",
+    "What should I look for in noise-cancelling headphones?",
+    "Best TV under $800 for gaming?",
+]
+SENTENCE = "Wireless noise-cancelling over-ear headphones with 30 hour battery life"
+
+def rss_mb() -> float:
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        import resource # Peak RSS; close enough right after loading (Unix only)
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+
+def bench_chat(backend: str, iterations: int, new_tokens: int) -> dict:
+    from transformers import AutoTokenizer
+
+    before = rss_mb()
+    started = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(CHAT_MODEL_NAME)
+    model = load_causal_lm(CHAT_MODEL_NAME, backend)
+    load_seconds = time.perf_counter() - started
+    rss = rss_mb() - before
+
+    def reply(prompt: str):
+        inputs = tokenizer(build_prompt(prompt), return_tensors="pt")
+        model.generate(
+            **inputs, max_new_tokens=new_tokens, min_new_tokens=new_tokens,
+            do_sample=False, pad_token_id=tokenizer.eos_token_id,
+        )
+
+    reply(PROMPTS[0]) # Warm-up
+    latencies = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        reply(PROMPTS[i % len(PROMPTS)])
+        latencies.append(time.perf_counter() - started)
+    median = statistics.median(latencies)
+    return {"load_s": load_seconds, "rss_mb": rss, "latency_ms": median * 1000, "throughput": new_tokens / median, "unit": "tokens/s"}
+
+def bench_embedding(backend: str, iterations: int, sentences: int) -> dict:
+    before = rss_mb()
+    started = time.perf_counter()
+    model = load_embedder(EMBEDDING_MODEL_NAME, backend)
+    load_seconds = time.perf_counter() - started
+    rss = rss_mb() - before
+
+    model.encode(SENTENCE) # Warm-up
+    latencies = []
+    for _ in range(iterations * 10):
+        started = time.perf_counter()
+        model.encode(SENTENCE)
+        latencies.append(time.perf_counter() - started)
+
+    corpus = [f"{SENTENCE} #{i}" for i in range(sentences)]
+    started = time.perf_counter()
+    model.encode(corpus, batch_size=32, convert_to_numpy=True, show_progress_bar=False)
+    throughput = sentences / (time.perf_counter() - started)
+    return {"load_s": load_seconds, "rss_mb": rss, "latency_ms": statistics.median(latencies) * 1000, "throughput": throughput, "unit": "sentences/s"}
+
+def run_isolated(fn, *args) -> dict:
+    """Runs one benchmark in a fresh interpreter so its memory is measured alone."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(fn, *args).result()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=SUPPORTED_BACKENDS, default=list(SUPPORTED_BACKENDS))
+    parser.add_argument("--models", nargs="+", choices=("chat", "embedding"), default=["chat", "embedding"])
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--new-tokens", type=int, default=40)
+    parser.add_argument("--sentences", type=int, default=256)
+    args = parser.parse_args()
+
+    print(f"CPU threads: {os.cpu_count()}\n")
+    print(f"{'Model':<11}{'Backend':<11}{'load s':>8}{'RSS MB':>9}{'latency ms':>12}{'throughput':>14}")
+    for model_kind in args.models:
+        for backend in args.backends:
+            try:
+                if model_kind == "chat":
+                    result = run_isolated(bench_chat, backend, args.iterations, args.new_tokens)
+                else:
+                    result = run_isolated(bench_embedding, backend, args.iterations, args.sentences)
+            except Exception as e:
+                print(f"{model_kind:<11}{backend:<11}  failed: {e}")
+                continue
+            print(
+                f"{model_kind:<11}{backend:<11}{result['load_s']:>8.1f}{result['rss_mb']:>9.0f}"
+                f"{result['latency_ms']:>12.1f}{result['throughput']:>9.1f} {result['unit']}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# AI-Shopping-Assistant/bench_workers.py
+
+"""
+Multi-worker claiming benchmark: N worker processes drain one table of due
+products through the scheduler's lease-based claims.
+
+Each worker loops like worker.py (claim a batch, scrape it, reschedule), with the
+network fetch replaced by a fixed simulated latency, so the numbers show how far
+the claim/reschedule path lets throughput scale with the worker count and
+whether any product was claimed twice.
+
+Usage (from the project root):
+    python bench_workers.py [--workers 1,2,4] [--seconds 10] [--latency 0.5] [--batch 200]
+    DATABASE_URL=postgresql+psycopg://... python bench_workers.py
+
+A throwaway SQLite file is used unless DATABASE_URL is set (the benchmark
+rewrites the schedule of every product, so don't point it at production data).
+"""
+
+import os
+import time
+import asyncio
+import tempfile
+import argparse
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+# NOTE: app.database.db is imported inside the child processes, after DATABASE_URL
+# is set, because the engine is created at import time.
+
+def seed(products: int):
+    from app.database.db import SessionLocal, Product
+    from sqlalchemy import insert, update
+
+    db = SessionLocal()
+    try:
+        existing = db.query(Product.id).count()
+        if existing < products:
+            db.execute(insert(Product), [
+                {"name": f"Bench product {i}", "url": f"https://bench.example/{i}", "store": "bench", "current_price": 100.0}
+                for i in range(existing, products)
+            ])
+        # Everything due and unclaimed
+        db.execute(update(Product).values(next_scrape_at=None, claimed_by=None, lease_expires_at=None))
+        db.commit()
+    finally:
+        db.close()
+
+def worker(worker_id: str, seconds: float, latency: float, batch: int) -> tuple:
+    from app.database.db import SessionLocal
+    from app.services.scheduler import scrape_scheduler
+
+    async def run() -> tuple:
+        claimed = []
+        started = time.monotonic()
+        deadline = started + seconds
+        while time.monotonic() < deadline:
+            db = SessionLocal()
+            try:
+                products = await asyncio.to_thread(scrape_scheduler.claim_due_products, db, worker_id, batch)
+                if not products:
+                    break
+                await asyncio.sleep(latency) # The batch's fetches, all in flight at once
+                ids = [p.id for p in products]
+                await asyncio.to_thread(scrape_scheduler.reschedule, db, ids)
+                claimed.extend(ids)
+            finally:
+                db.close()
+        return claimed, time.monotonic() - started # Excludes process start-up
+
+    return asyncio.run(run())
+
+def run_round(workers: int, args, context) -> None:
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        pool.submit(seed, args.products).result()
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [pool.submit(worker, f"bench-{i}", args.seconds, args.latency, args.batch) for i in range(workers)]
+        results = [f.result() for f in futures]
+    elapsed = max(seconds for _, seconds in results)
+
+    counts = Counter(product_id for claimed, _ in results for product_id in claimed)
+    duplicates = sum(1 for n in counts.values() if n > 1)
+    total = sum(len(claimed) for claimed, _ in results)
+    print(f"  {workers:<9}{total:>10}{total / elapsed:>14.0f}{duplicates:>12}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts to compare.")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated seconds per scrape batch.")
+    parser.add_argument("--batch", type=int, default=200, help="Products claimed per batch.")
+    parser.add_argument("--products", type=int, default=50000)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn") # Children inherit the environment set below
+    with tempfile.TemporaryDirectory() as tmp:
+        if not os.getenv("DATABASE_URL"):
+            os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench_workers.db')}"
+        print(f"\nLease-based claiming ({os.environ['DATABASE_URL'].split('://')[0]}, {args.latency}s per batch)")
+        print(f"  {'workers':<9}{'claimed':>10}{'products/sec':>14}{'duplicates':>12}")
+        for workers in (int(n) for n in args.workers.split(",")):
+            run_round(workers, args, context)
+
+if __name__ == "__main__":
+    main()
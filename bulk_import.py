@@ -0,0 +1,107 @@
+# AI-Shopping-Assistant/app/services/bulk_import.py
+
+import os
+from typing import Any, Dict, List, Tuple
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from ..database.db import Product, PriceAlert
+from ..utils.logger import setup_logging
+from .catalog_version import bump_catalog_version
+
+logger = setup_logging(__name__)
+
+# --- Configuration ---
+# Items validated, written and committed together (one transaction per chunk)
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+
+# (position in the upload, validated pydantic item)
+BulkItems = List[Tuple[int, Any]]
+
+
+def dialect_insert(db: Session):
+    """INSERT construct with on_conflict_do_nothing() for the active database."""
+    return postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+
+
+def import_products_chunk(db: Session, items: BulkItems) -> List[Dict[str, Any]]:
+    """
+    Inserts a chunk of ProductCreate items, skipping URLs that already exist, with
+    one INSERT ... ON CONFLICT (url) DO NOTHING and one lookup for the existing IDs.
+    Returns one result per item: status "created" or "exists", with the product ID.
+    """
+    rows: Dict[str, Dict[str, Any]] = {}
+    for _, item in items:
+        url = str(item.url)
+        if url not in rows: # Repeats within the upload resolve to the same product
+            rows[url] = {
+                "name": item.name,
+                "url": url,
+                "store": item.store,
+                "current_price": item.current_price,
+                "description": item.description,
+            }
+
+    stmt = dialect_insert(db)(Product).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_nothing(index_elements=[Product.url]).returning(Product.id, Product.url)
+    created = {url: product_id for product_id, url in db.execute(stmt)}
+
+    remaining = [url for url in rows if url not in created]
+    existing = dict(db.query(Product.url, Product.id).filter(Product.url.in_(remaining)).all()) if remaining else {}
+    if created:
+        bump_catalog_version(db)
+    db.commit()
+
+    results, reported = [], set()
+    for index, item in items:
+        url = str(item.url)
+        is_new = url in created and url not in reported
+        reported.add(url)
+        results.append({
+            "index": index,
+            "status": "created" if is_new else "exists",
+            "id": created.get(url, existing.get(url)),
+            "url": url,
+        })
+    logger.info(f"Bulk product import: {len(created)} created, {len(items) - len(created)} already tracked.")
+    return results
+
+
+def create_alerts_chunk(db: Session, items: BulkItems) -> List[Dict[str, Any]]:
+    """
+    Creates a chunk of PriceAlertCreate items. Current prices for every referenced
+    product come from one query; valid alerts are written with one executemany INSERT.
+    Returns one result per item: status "created" (with the alert ID) or "error".
+    """
+    product_ids = {item.product_id for _, item in items}
+    prices = dict(db.query(Product.id, Product.current_price).filter(Product.id.in_(product_ids)).all())
+
+    results: Dict[int, Dict[str, Any]] = {}
+    valid: List[Tuple[int, Dict[str, Any]]] = []
+    for index, item in items:
+        current_price = prices.get(item.product_id)
+        if current_price is None:
+            results[index] = {"index": index, "status": "error", "detail": f"Product with ID {item.product_id} not found."}
+        elif item.target_price >= current_price:
+            results[index] = {
+                "index": index,
+                "status": "error",
+                "detail": f"Target price (${item.target_price:.2f}) must be lower than current price (${current_price:.2f}).",
+            }
+        else:
+            valid.append((index, {
+                "product_id": item.product_id,
+                "user_email": item.user_email,
+                "target_price": item.target_price,
+                "active": True,
+            }))
+
+    if valid:
+        stmt = insert(PriceAlert).returning(PriceAlert.id, sort_by_parameter_order=True)
+        alert_ids = db.execute(stmt, [row for _, row in valid]).scalars().all()
+        db.commit()
+        for (index, _), alert_id in zip(valid, alert_ids):
+            results[index] = {"index": index, "status": "created", "id": alert_id}
+
+    logger.info(f"Bulk alert creation: {len(valid)} created, {len(items) - len(valid)} rejected.")
+    return [results[index] for index, _ in items]
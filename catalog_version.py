@@ -0,0 +1,70 @@
+# AI-Shopping-Assistant/app/services/catalog_version.py
+
+import os
+import time
+import threading
+from sqlalchemy import update, select, event
+from sqlalchemy.orm import Session
+from ..database.db import engine, CatalogState
+from ..utils.logger import setup_logging
+
+logger = setup_logging(__name__)
+
+# --- Configuration ---
+# How long a process trusts its last read of the version. Polls within this window
+# are answered without touching the database; writes from another process (the
+# worker) become visible to this process's ETags after at most this long.
+CATALOG_VERSION_TTL = float(os.getenv("CATALOG_VERSION_TTL", "2"))
+
+
+def bump_catalog_version(db: Session):
+    """
+    Marks the product listing as changed. Call inside the same transaction as the
+    write (before commit), so the new version and the new data land together.
+    This process's cached version is dropped once the session commits; dropping it
+    earlier would let a concurrent request re-cache the old version for the TTL.
+    """
+    db.execute(update(CatalogState).where(CatalogState.id == 1).values(version=CatalogState.version + 1))
+    db.info["catalog_version_bumped"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session):
+    if session.info.pop("catalog_version_bumped", False):
+        catalog_version.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_bump(session: Session):
+    session.info.pop("catalog_version_bumped", None)
+
+
+class CatalogVersion:
+    """Process-local, TTL-cached view of catalog_state.version."""
+
+    def __init__(self, ttl: float = CATALOG_VERSION_TTL):
+        self.ttl = ttl
+        self._version = 0
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> int:
+        now = time.monotonic()
+        if now < self._expires_at:
+            return self._version
+        with self._lock:
+            if now >= self._expires_at:
+                with engine.connect() as conn:
+                    self._version = conn.execute(select(CatalogState.version).where(CatalogState.id == 1)).scalar() or 0
+                self._expires_at = time.monotonic() + self.ttl
+        return self._version
+
+    def invalidate(self):
+        """Forces the next current() to re-read (used after this process writes)."""
+        self._expires_at = 0.0
+
+    def etag(self) -> str:
+        return f'W/"catalog-{self.current()}"'
+
+
+catalog_version = CatalogVersion()
@@ -0,0 +1,166 @@
+# AI-Shopping-Assistant/app/ai/chat_cache.py
+
+import os
+import re
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import numpy as np
+from ..utils.logger import setup_logging
+from .inference_server import FALLBACK_RESPONSE
+from .model_registry import model_registry
+
+logger = setup_logging(__name__)
+
+# --- Configuration ---
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "2048"))
+CHAT_CACHE_TTL = float(os.getenv("CHAT_CACHE_TTL", "3600"))
+# Also answer paraphrases ("best laptop under 500" ~ "what's the best laptop under $500?")
+CHAT_CACHE_SEMANTIC = os.getenv("CHAT_CACHE_SEMANTIC", "0") == "1"
+CHAT_CACHE_SIMILARITY = float(os.getenv("CHAT_CACHE_SIMILARITY", "0.92"))
+
+
+def normalize_prompt(text: str) -> str:
+    """Case, whitespace and trailing punctuation don't change the answer."""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = re.sub(r"\s+", " ", text)
+    return text.strip(" ?!.,")
+
+
+class _Entry:
+    __slots__ = ("response", "expires_at")
+
+    def __init__(self, response: str, ttl: float):
+        self.response = response
+        self.expires_at = time.time() + ttl
+
+
+class ChatResponseCache:
+    """
+    LRU + TTL cache of chatbot replies keyed on the normalized prompt.
+    With semantic matching enabled, a miss on the exact key falls back to the
+    cached prompt with the highest cosine similarity (same embedding model and
+    backend as product embeddings) if it clears CHAT_CACHE_SIMILARITY.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CHAT_CACHE_MAX_ENTRIES,
+        ttl: float = CHAT_CACHE_TTL,
+        semantic: bool = CHAT_CACHE_SEMANTIC,
+        threshold: float = CHAT_CACHE_SIMILARITY,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.semantic = semantic
+        self.threshold = threshold
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0}
+
+        # Semantic index: one normalized vector per cached key, stacked lazily for lookups
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: list = []
+        # Vectors computed by get() on a miss, reused by the put() that follows
+        self._pending: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+    # --- Embeddings ---
+
+    def _embed(self, text: str) -> np.ndarray:
+        model = model_registry.get("embedding") # Loaded on first semantic lookup
+        return model.encode(text, convert_to_numpy=True, normalize_embeddings=True).astype(np.float32)
+
+    def _semantic_lookup(self, vector: np.ndarray) -> Optional[str]:
+        with self._lock:
+            if not self._vectors:
+                return None
+            if self._matrix is None:
+                self._matrix_keys = list(self._vectors)
+                self._matrix = np.stack([self._vectors[k] for k in self._matrix_keys])
+            scores = self._matrix @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            return self._matrix_keys[best]
+
+    def _drop(self, key: str):
+        """Removes one entry. Caller holds the lock."""
+        self._entries.pop(key, None)
+        if self._vectors.pop(key, None) is not None:
+            self._matrix = None
+
+    # --- Lookup ---
+
+    def get(self, message: str) -> Optional[str]:
+        """Returns a cached reply for the message, or None. May run the embedding model."""
+        key = normalize_prompt(message)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at >= now:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return entry.response
+            if entry is not None:
+                self._drop(key)
+
+        if self.semantic and key:
+            vector = self._embed(key)
+            match = self._semantic_lookup(vector)
+            with self._lock:
+                entry = self._entries.get(match) if match else None
+                if entry is not None and entry.expires_at >= now:
+                    self._entries.move_to_end(match)
+                    self.counters["semantic_hits"] += 1
+                    return entry.response
+                self._pending[key] = vector
+                while len(self._pending) > 64:
+                    self._pending.popitem(last=False)
+
+        self.counters["misses"] += 1
+        return None
+
+    def put(self, message: str, response: str):
+        """Caches a generated reply (the generic fallback answer is never cached)."""
+        key = normalize_prompt(message)
+        if not key or not response or response == FALLBACK_RESPONSE:
+            return
+        vector = None
+        if self.semantic:
+            with self._lock:
+                vector = self._pending.pop(key, None)
+            if vector is None:
+                vector = self._embed(key)
+
+        with self._lock:
+            self._entries[key] = _Entry(response, self.ttl)
+            self._entries.move_to_end(key)
+            if vector is not None:
+                self._vectors[key] = vector
+                self._matrix = None
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._vectors.clear()
+            self._pending.clear()
+            self._matrix = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self.counters)
+        lookups = stats["hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["hits"] + stats["semantic_hits"]) / lookups, 4) if lookups else 0.0
+        stats["entries"] = len(self._entries)
+        stats["max_entries"] = self.max_entries
+        stats["semantic"] = self.semantic
+        return stats
+
+
+chat_response_cache = ChatResponseCache()
@@ -1,28 +1,50 @@
 # AI-Shopping-Assistant/app/routes/chatbot.py
 
+import json
+import asyncio
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from ..schemas import ChatRequest, ChatResponse
-from ..chatbot import generate_chat_response # Import the core AI logic
+from ..ai.inference_server import chat_inference_server, InferenceQueueFull, clean_response # Micro-batching model worker
+from ..ai.chat_cache import chat_response_cache # Replies to repeated prompts
 from ..utils.logger import setup_logging
 
 router = APIRouter()
 logger = setup_logging(__name__)
 
+async def _cached_reply(message: str):
+    if chat_response_cache.semantic:
+        # Semantic lookups run the embedding model; keep them off the event loop
+        return await asyncio.to_thread(chat_response_cache.get, message)
+    return chat_response_cache.get(message)
+
+async def _cache_reply(message: str, reply: str):
+    if chat_response_cache.semantic:
+        await asyncio.to_thread(chat_response_cache.put, message, reply)
+    else:
+        chat_response_cache.put(message, reply)
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_assistant(request: ChatRequest):
     """
     Handles incoming chat requests, passes them to the local AI model, 
     and returns the assistant's response.
+    Concurrent requests are batched together by the inference worker.
     """
     logger.info(f"Received chat request from session: {request.session_id}")
     
     # 1. Input Validation (handled automatically by FastAPI/Pydantic)
 
     try:
-        # 2. Call the core AI generation function
-        # NOTE: This uses the blocking model inference, which FastAPI 
-        # automatically runs in an external thread pool (run_in_threadpool).
-        assistant_text = generate_chat_response(request.user_message)
+        # 2. Answer repeated prompts from the response cache, skipping inference entirely
+        assistant_text = await _cached_reply(request.user_message)
+
+        if assistant_text is None:
+            # Queue the prompt on the dedicated inference worker and await its batched result
+            # (the event loop stays free while the model runs)
+            assistant_text = await asyncio.wrap_future(chat_inference_server.submit(request.user_message))
+            await _cache_reply(request.user_message, assistant_text)
         
         # 3. Construct the response object
         response = ChatResponse(
@@ -32,6 +54,13 @@ async def chat_with_assistant(request: ChatRequest):
         
         return response
 
+    except InferenceQueueFull as e:
+        # Backpressure: shed load instead of queueing unboundedly
+        logger.warning(f"Chat request rejected: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="The AI assistant is busy. Please try again in a moment."
+        )
     except Exception as e:
         logger.error(f"Chatbot processing error: {e}")
         # Return a 500 Internal Server Error in case of model failure
@@ -40,6 +69,79 @@ async def chat_with_assistant(request: ChatRequest):
             detail="The AI assistant is currently unable to process your request."
         )
 
+def _sse(data: str, event: str = None) -> str:
+    """Formats one Server-Sent Events message."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {data}\n\n"
+
+@router.post("/chat/stream")
+async def stream_chat_with_assistant(request: ChatRequest):
+    """
+    Same as /chat, but streams the reply as Server-Sent Events while it is generated:
+    - `data: {"token": "..."}` for each chunk of text,
+    - `event: done` with the final ChatResponse JSON (same shape as /chat),
+    - `event: error` if generation fails midway.
+    Closing the connection stops generation.
+    """
+    logger.info(f"Received streaming chat request from session: {request.session_id}")
+
+    cached = await _cached_reply(request.user_message)
+    if cached is not None:
+        final = ChatResponse(assistant_response=cached, session_id=request.session_id)
+        return StreamingResponse(
+            iter([_sse(json.dumps({"token": cached})), _sse(final.model_dump_json(), event="done")]),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    try:
+        tokens = chat_inference_server.open_stream(request.user_message)
+    except InferenceQueueFull as e:
+        logger.warning(f"Streaming chat request rejected: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="The AI assistant is busy. Please try again in a moment."
+        )
+
+    def event_stream():
+        # Plain generator: Starlette iterates it in a worker thread, off the event loop
+        parts = []
+        try:
+            for token in tokens:
+                parts.append(token)
+                yield _sse(json.dumps({"token": token}))
+            final = ChatResponse(assistant_response=clean_response("".join(parts)), session_id=request.session_id)
+            yield _sse(final.model_dump_json(), event="done")
+            chat_response_cache.put(request.user_message, final.assistant_response)
+        except Exception as e:
+            logger.error(f"Chatbot streaming error: {e}")
+            yield _sse(json.dumps({"detail": "The AI assistant is currently unable to process your request."}), event="error")
+        finally:
+            tokens.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Frees the streaming slot even if the body was never iterated (client gone before it started)
+        background=BackgroundTask(tokens.close),
+    )
+
+@router.get("/chat/stats")
+def get_chat_stats():
+    """
+    Returns inference worker metrics (queue depth, batch sizes, latency percentiles).
+    """
+    return chat_inference_server.get_stats()
+
+@router.get("/chat-cache/stats")
+def get_chat_cache_stats():
+    """
+    Returns chat response cache counters (hits, semantic hits, misses, hit ratio).
+    """
+    return chat_response_cache.get_stats()
+
 # --- Update app/main.py to include this new router ---
 
 # In app/main.py, ensure you change this line:
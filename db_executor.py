@@ -0,0 +1,35 @@
+# AI-Shopping-Assistant/app/services/db_executor.py
+
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+from ..database.db import DB_POOL_SIZE
+from ..utils.logger import setup_logging
+
+logger = setup_logging(__name__)
+
+T = TypeVar("T")
+
+# --- Configuration ---
+# Threads for blocking SQLAlchemy work called from async code. Defaults to the
+# connection pool size: more threads would only queue on pool checkout.
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", str(DB_POOL_SIZE)))
+
+db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+
+
+async def run_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Runs a synchronous database call on the dedicated DB threads and awaits it, so
+    a slow query or a locked SQLite write never stalls the event loop. A Session
+    may be passed in; it is only ever used by one thread at a time.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown_db_executor():
+    """Waits for in-flight DB calls to finish (call on shutdown)."""
+    db_executor.shutdown(wait=True)
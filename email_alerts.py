@@ -1,18 +1,38 @@
 # AI-Shopping-Assistant/app/services/email_alerts.py
 
+import os
+import time
+import asyncio
 import smtplib
 from email.mime.text import MIMEText
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 from ..utils.logger import setup_logging
 
 logger = setup_logging(__name__)
 
-# --- Configuration (Normally loaded from environment variables) ---
-SMTP_SERVER = "smtp.example.com"
-SMTP_PORT = 587
-SMTP_USER = "alerts@ai-shopping-assistant.com"
-SMTP_PASSWORD = "YOUR_SMTP_PASSWORD"
-SENDER_EMAIL = "no-reply@ai-shopping-assistant.com"
+# aiosmtplib is only needed for real (non-simulated) delivery through the queue
+try:
+    import aiosmtplib
+except ImportError:
+    aiosmtplib = None
+
+# --- Configuration (Loaded from environment variables, with example defaults) ---
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.example.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER", "alerts@ai-shopping-assistant.com")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "YOUR_SMTP_PASSWORD")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+SENDER_EMAIL = os.getenv("SENDER_EMAIL", "no-reply@ai-shopping-assistant.com")
+
+# --- Delivery Queue Configuration ---
+# Keep simulating delivery (log only) until real SMTP credentials are configured
+EMAIL_SIMULATE = os.getenv("EMAIL_SIMULATE", "true").lower() == "true"
+# Number of authenticated SMTP sessions kept open by the queue
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "3"))
+# Alerts for the same recipient arriving within this window are merged into one digest
+EMAIL_COALESCE_WINDOW = float(os.getenv("EMAIL_COALESCE_WINDOW", "2.0"))
+EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", "3"))
+EMAIL_RETRY_BACKOFF = float(os.getenv("EMAIL_RETRY_BACKOFF", "2.0")) # seconds, doubled per attempt
 
 class EmailService:
     """
@@ -80,4 +100,247 @@ class EmailService:
             logger.error(f"FAILURE: Could not send email to {recipient_email}. Error: {e}")
             return False
 
-email_service = EmailService()
\ No newline at end of file
+    def create_digest_body(self, alerts: List[Dict[str, Any]]) -> str:
+        """Generates one HTML body listing several price drops for the same recipient."""
+        rows = "".join(
+            f"""
+                    <li>
+                        <a href="{a.get('product_url', '#')}"><strong>{a.get('product_name', 'Unknown Product')}</strong></a>:
+                        now <b style="color: green;">${a.get('current_price', 0.0):.2f}</b>
+                        (your target: ${a.get('target_price', 0.0):.2f})
+                    </li>"""
+            for a in alerts
+        )
+        return f"""
+        <html>
+            <body>
+                <h2>🚨 {len(alerts)} Price Drop Alerts! 🚨</h2>
+                <p>Great news! These products dropped below your target prices:</p>
+                <ul>{rows}
+                </ul>
+                <p><i>These alerts were triggered because the prices are now below your set targets.</i></p>
+            </body>
+        </html>
+        """
+
+    def build_message(self, recipient_email: str, alerts: List[Dict[str, Any]]) -> MIMEText:
+        """Builds a single alert email, or a digest when there are several alerts."""
+        if len(alerts) == 1:
+            alert_data = alerts[0]
+            subject = f"Price Alert: {alert_data.get('product_name', 'Product')} dropped to ${alert_data.get('current_price', 0.0):.2f}!"
+            body = self.create_alert_body(alert_data)
+        else:
+            subject = f"Price Alerts: {len(alerts)} of your target prices were reached!"
+            body = self.create_digest_body(alerts)
+
+        msg = MIMEText(body, 'html')
+        msg['Subject'] = subject
+        msg['From'] = SENDER_EMAIL
+        msg['To'] = recipient_email
+        return msg
+
+email_service = EmailService()
+
+
+class EmailDeliveryQueue:
+    """
+    Asynchronous delivery queue for alert emails.
+    - A small pool of long-lived, authenticated SMTP sessions (aiosmtplib) sends
+      many messages per connection instead of connect/STARTTLS/login per email.
+    - Alerts for the same recipient within EMAIL_COALESCE_WINDOW become one digest.
+    - Failed sends are retried with exponential backoff, reconnecting the session.
+    Each enqueued alert gets a future resolving to True once delivered.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = SMTP_POOL_SIZE,
+        coalesce_window: float = EMAIL_COALESCE_WINDOW,
+        simulate: bool = EMAIL_SIMULATE,
+        hostname: str = SMTP_SERVER,
+        port: int = SMTP_PORT,
+        username: Optional[str] = SMTP_USER,
+        password: Optional[str] = SMTP_PASSWORD,
+        start_tls: bool = SMTP_STARTTLS,
+    ):
+        self.pool_size = max(1, pool_size)
+        self.coalesce_window = coalesce_window
+        self.simulate = simulate
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.start_tls = start_tls
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: Dict[str, List[Tuple[Dict[str, Any], asyncio.Future]]] = {}
+        self._flush_handles: Dict[str, asyncio.TimerHandle] = {}
+        self._workers: List[asyncio.Task] = []
+        self._started_at: Optional[float] = None
+        self.metrics = {
+            "enqueued": 0,
+            "delivered": 0, # Alerts delivered (a digest counts each alert it contains)
+            "messages_sent": 0, # SMTP messages sent
+            "digests": 0,
+            "retries": 0,
+            "failed": 0,
+            "connections_opened": 0,
+        }
+
+    # --- Lifecycle ---
+
+    async def start(self):
+        """Starts the sender tasks. Must be called from the running event loop."""
+        if self._workers:
+            return
+        if not self.simulate and aiosmtplib is None:
+            raise RuntimeError("aiosmtplib is required for real email delivery (pip install aiosmtplib).")
+        self._queue = asyncio.Queue()
+        self._started_at = time.monotonic()
+        self._workers = [asyncio.create_task(self._sender(i)) for i in range(self.pool_size)]
+        logger.info(f"EmailDeliveryQueue started with {self.pool_size} sessions (simulate={self.simulate}).")
+
+    async def stop(self):
+        """Flushes pending digests, waits for in-flight deliveries, and closes the sessions."""
+        if not self._workers:
+            return
+        for recipient in list(self._pending):
+            self._flush(recipient)
+        await self._queue.join()
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info(f"EmailDeliveryQueue stopped. Stats: {self.get_stats()}")
+
+    # --- Producer Side ---
+
+    def enqueue(self, recipient_email: str, alert_data: Dict[str, Any]) -> asyncio.Future:
+        """Queues an alert email and returns a future that resolves to the delivery result."""
+        if not self._workers:
+            raise RuntimeError("EmailDeliveryQueue.start() must be awaited before enqueueing.")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.metrics["enqueued"] += 1
+
+        self._pending.setdefault(recipient_email, []).append((alert_data, future))
+        if recipient_email not in self._flush_handles:
+            self._flush_handles[recipient_email] = loop.call_later(self.coalesce_window, self._flush, recipient_email)
+        return future
+
+    def _flush(self, recipient_email: str):
+        handle = self._flush_handles.pop(recipient_email, None)
+        if handle is not None:
+            handle.cancel()
+        items = self._pending.pop(recipient_email, None)
+        if items:
+            self._queue.put_nowait((recipient_email, items))
+
+    # --- Consumer Side ---
+
+    async def _connect(self):
+        smtp = aiosmtplib.SMTP(hostname=self.hostname, port=self.port, start_tls=self.start_tls)
+        await smtp.connect()
+        if self.username and self.password:
+            await smtp.login(self.username, self.password)
+        self.metrics["connections_opened"] += 1
+        return smtp
+
+    async def _deliver(self, smtp, msg: MIMEText):
+        if self.simulate:
+            logger.info(f"SIMULATING: Sending '{msg['Subject']}' to {msg['To']}")
+            return smtp
+        if smtp is None or not smtp.is_connected:
+            smtp = await self._connect()
+        await smtp.send_message(msg)
+        return smtp
+
+    async def _sender(self, index: int):
+        smtp = None
+        try:
+            while True:
+                recipient_email, items = await self._queue.get()
+                alerts = [alert_data for alert_data, _ in items]
+                msg = email_service.build_message(recipient_email, alerts)
+                delivered = False
+
+                for attempt in range(EMAIL_MAX_RETRIES + 1):
+                    try:
+                        smtp = await self._deliver(smtp, msg)
+                        delivered = True
+                        break
+                    except Exception as e:
+                        logger.warning(f"Email to {recipient_email} failed (attempt {attempt + 1}): {e}")
+                        if smtp is not None:
+                            smtp.close() # Drop the broken session; the next attempt reconnects
+                            smtp = None
+                        if attempt < EMAIL_MAX_RETRIES:
+                            self.metrics["retries"] += 1
+                            await asyncio.sleep(EMAIL_RETRY_BACKOFF * 2 ** attempt)
+
+                if delivered:
+                    self.metrics["messages_sent"] += 1
+                    self.metrics["delivered"] += len(items)
+                    if len(items) > 1:
+                        self.metrics["digests"] += 1
+                else:
+                    self.metrics["failed"] += len(items)
+                    logger.error(f"FAILURE: Could not send email to {recipient_email} after {EMAIL_MAX_RETRIES + 1} attempts.")
+
+                for _, future in items:
+                    if not future.done():
+                        future.set_result(delivered)
+                self._queue.task_done()
+        finally:
+            if smtp is not None and smtp.is_connected:
+                try:
+                    await smtp.quit()
+                except Exception:
+                    smtp.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Returns the delivery counters plus delivered alerts per second since start."""
+        stats = dict(self.metrics)
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        stats["delivered_per_second"] = round(stats["delivered"] / elapsed, 2) if elapsed > 0 else 0.0
+        stats["pending_recipients"] = len(self._pending)
+        return stats
+
+email_queue = EmailDeliveryQueue()
+
+# --- Example Usage (delivers through a local aiosmtpd stand-in server) ---
+if __name__ == "__main__":
+    from aiosmtpd.controller import Controller
+
+    class CountingHandler:
+        def __init__(self):
+            self.received = 0
+
+        async def handle_DATA(self, server, session, envelope):
+            self.received += 1
+            return "250 Message accepted for delivery"
+
+    handler = CountingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=8025)
+    controller.start()
+
+    async def main():
+        queue = EmailDeliveryQueue(
+            simulate=False, hostname="127.0.0.1", port=8025,
+            username=None, password=None, start_tls=False, coalesce_window=0.1,
+        )
+        await queue.start()
+        futures = [
+            queue.enqueue(f"user{i % 50}@example.com", {
+                "product_name": f"Product {i}", "target_price": 100.0,
+                "current_price": 90.0, "product_url": "https://example.com",
+            })
+            for i in range(500)
+        ]
+        results = await asyncio.gather(*futures)
+        await queue.stop()
+        print(f"Delivered {sum(results)}/{len(results)} alerts in {handler.received} SMTP messages.")
+        print(f"Queue stats: {queue.get_stats()}")
+
+    asyncio.run(main())
+    controller.stop()
\ No newline at end of file
@@ -0,0 +1,119 @@
+# AI-Shopping-Assistant/app/ai/embedding_store.py
+
+import os
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import update, select, func
+from sqlalchemy.orm import Session
+from ..database.db import Product, CatalogState
+from ..utils.logger import setup_logging
+
+logger = setup_logging(__name__)
+
+# --- Configuration ---
+# On-disk precision for Product.embedding_blob: float32 (exact), float16 (2x smaller) or int8 (4x smaller)
+EMBEDDING_STORAGE_DTYPE = os.getenv("EMBEDDING_STORAGE_DTYPE", "float32").lower()
+# Must match the model used by app/ai/recommender.py so old and new vectors are comparable
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+
+
+def product_text(name: Optional[str], description: Optional[str]) -> str:
+    """Text that gets embedded for a product."""
+    return f"{name or ''}. {description or ''}".strip(" .")
+
+
+def encode_embedding(vector: Iterable[float], dtype: str = EMBEDDING_STORAGE_DTYPE) -> Tuple[bytes, str, Optional[float]]:
+    """
+    Packs a vector into bytes. Returns (blob, dtype, scale); scale is only set for
+    int8, which uses symmetric per-vector quantization (value = q * scale).
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype '{dtype}'. Use one of {SUPPORTED_DTYPES}.")
+    array = np.asarray(vector, dtype=np.float32)
+
+    if dtype == "int8":
+        max_abs = float(np.abs(array).max()) if array.size else 0.0
+        scale = max_abs / 127.0 if max_abs > 0 else 1.0
+        quantized = np.clip(np.rint(array / scale), -127, 127).astype(np.int8)
+        return quantized.tobytes(), dtype, scale
+    return array.astype(dtype).tobytes(), dtype, None
+
+
+def decode_embedding(blob: bytes, dtype: str, scale: Optional[float] = None) -> np.ndarray:
+    """Unpacks a stored embedding into a float32 vector (zero-copy for float32)."""
+    array = np.frombuffer(blob, dtype=np.dtype(dtype or "float32"))
+    if dtype == "int8":
+        return array.astype(np.float32) * np.float32(scale or 1.0)
+    return array.astype(np.float32, copy=False)
+
+
+def read_embedding(blob: Optional[bytes], dtype: Optional[str], scale: Optional[float], raw_json: Optional[str]) -> Optional[np.ndarray]:
+    """Returns a product's embedding, preferring the binary column over the legacy JSON one."""
+    if blob:
+        return decode_embedding(blob, dtype, scale)
+    if raw_json:
+        return np.asarray(json.loads(raw_json), dtype=np.float32)
+    return None
+
+
+def read_product_embedding(product: Product) -> Optional[np.ndarray]:
+    return read_embedding(product.embedding_blob, product.embedding_dtype, product.embedding_scale, product.embedding_vector)
+
+
+def read_embedding_version(db) -> int:
+    """Current catalog_state.embedding_version (db may be a Session or a Connection)."""
+    return db.execute(select(func.coalesce(CatalogState.embedding_version, 0)).where(CatalogState.id == 1)).scalar() or 0
+
+
+def bump_embedding_version(db: Session) -> int:
+    """
+    Signals running API processes to rebuild their vector index. Returns the new
+    version; the caller commits.
+    """
+    db.execute(
+        update(CatalogState).where(CatalogState.id == 1)
+        .values(embedding_version=func.coalesce(CatalogState.embedding_version, 0) + 1)
+    )
+    return read_embedding_version(db)
+
+
+def embedding_update_row(product_id: int, vector: Iterable[float], dtype: str = EMBEDDING_STORAGE_DTYPE, clear_json: bool = False) -> Dict[str, Any]:
+    """Builds one parameter row for a bulk `update(Product)` that stores the binary embedding."""
+    blob, dtype, scale = encode_embedding(vector, dtype)
+    row = {"id": product_id, "embedding_blob": blob, "embedding_dtype": dtype, "embedding_scale": scale}
+    if clear_json:
+        row["embedding_vector"] = None
+    return row
+
+
+def store_product_embeddings(db: Session, vectors: Dict[int, Iterable[float]], dtype: str = EMBEDDING_STORAGE_DTYPE, clear_json: bool = False):
+    """Writes many binary embeddings with a single executemany UPDATE and one commit."""
+    if not vectors:
+        return
+    rows = [embedding_update_row(pid, vector, dtype, clear_json) for pid, vector in vectors.items()]
+    db.execute(update(Product), rows)
+    db.commit()
+
+
+def migrate_json_embeddings(db: Session, chunk_size: int = 2000, dtype: str = EMBEDDING_STORAGE_DTYPE, clear_json: bool = False) -> int:
+    """
+    Converts legacy JSON embeddings into the binary column, walking the table by
+    primary key in chunks. With clear_json=True the JSON copy is dropped to reclaim space.
+    """
+    migrated, last_id = 0, 0
+    while True:
+        rows: List[Tuple[int, str]] = db.query(Product.id, Product.embedding_vector).filter(
+            Product.id > last_id,
+            Product.embedding_vector != None,
+            Product.embedding_blob == None,
+        ).order_by(Product.id).limit(chunk_size).all()
+        if not rows:
+            break
+        store_product_embeddings(db, {pid: json.loads(raw) for pid, raw in rows}, dtype, clear_json)
+        migrated += len(rows)
+        last_id = rows[-1][0]
+        logger.info(f"Migrated {migrated} JSON embeddings to {dtype} blobs...")
+    return migrated
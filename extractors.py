@@ -0,0 +1,295 @@
+# AI-Shopping-Assistant/app/services/extractors.py
+
+import os
+import re
+import json
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+from ..utils.logger import setup_logging
+from .affiliate import affiliate_service
+
+logger = setup_logging(__name__)
+
+# --- Configuration ---
+# Number of processes used for DOM parsing (0 = parse inline, useful for debugging)
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+
+# Fast DOM parsers are optional; html5lib (pinned in requirements.txt) is the last resort
+try:
+    from selectolax.parser import HTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    SELECTOLAX_AVAILABLE = False
+
+try:
+    import lxml  # noqa: F401
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# --- Price Parsing ---
+
+PRICE_NUMBER_RE = re.compile(r"\d[\d.,\s]*")
+JSON_LD_RE = re.compile(
+    r"<script[^>]+type=[\"']application/ld\+json[\"'][^>]*>(.*?)</script>",
+    re.IGNORECASE | re.DOTALL,
+)
+META_TAG_RE = re.compile(r"<meta\b[^>]*>", re.IGNORECASE)
+META_PRICE_NAME_RE = re.compile(
+    r"(?:property|name|itemprop)\s*=\s*[\"'](?:og:price:amount|product:price:amount|price)[\"']",
+    re.IGNORECASE,
+)
+META_CONTENT_RE = re.compile(r"content\s*=\s*[\"']([^\"']+)[\"']", re.IGNORECASE)
+
+
+def parse_price(raw: Any) -> Optional[float]:
+    """
+    Converts a price string such as '$1,299.99', '1.299,99 €' or 49 into a float.
+    Returns None when no positive number can be found.
+    """
+    if raw is None:
+        return None
+    if isinstance(raw, (int, float)):
+        return float(raw) if raw > 0 else None
+
+    match = PRICE_NUMBER_RE.search(str(raw))
+    if not match:
+        return None
+    number = re.sub(r"\s", "", match.group(0)).rstrip(".,")
+
+    # Whichever separator comes last is the decimal separator (if followed by 1-2 digits)
+    last_dot, last_comma = number.rfind("."), number.rfind(",")
+    decimal_pos = max(last_dot, last_comma)
+    if decimal_pos != -1 and len(number) - decimal_pos - 1 in (1, 2):
+        integer_part = re.sub(r"[.,]", "", number[:decimal_pos])
+        number = f"{integer_part}.{number[decimal_pos + 1:]}"
+    else:
+        number = re.sub(r"[.,]", "", number)
+
+    try:
+        price = float(number)
+    except ValueError:
+        return None
+    return price if price > 0 else None
+
+
+def _find_offer_price(node: Any) -> Optional[float]:
+    """Walks a JSON-LD document looking for offers.price / offers.lowPrice."""
+    if isinstance(node, list):
+        for item in node:
+            price = _find_offer_price(item)
+            if price is not None:
+                return price
+        return None
+    if not isinstance(node, dict):
+        return None
+
+    offers = node.get("offers")
+    if offers is not None:
+        for offer in offers if isinstance(offers, list) else [offers]:
+            if isinstance(offer, dict):
+                price = parse_price(offer.get("price", offer.get("lowPrice")))
+                if price is not None:
+                    return price
+
+    for key in ("@graph", "mainEntity", "itemOffered"):
+        if key in node:
+            price = _find_offer_price(node[key])
+            if price is not None:
+                return price
+    return None
+
+
+def extract_structured_price(html: str) -> Optional[float]:
+    """
+    Cheap pre-scan (regex only, no DOM): JSON-LD Product offers first, then
+    og:price:amount / product:price:amount / itemprop=price meta tags.
+    """
+    for match in JSON_LD_RE.finditer(html):
+        try:
+            price = _find_offer_price(json.loads(match.group(1).strip()))
+        except (ValueError, TypeError):
+            continue
+        if price is not None:
+            return price
+
+    for match in META_TAG_RE.finditer(html):
+        tag = match.group(0)
+        if META_PRICE_NAME_RE.search(tag):
+            content = META_CONTENT_RE.search(tag)
+            price = parse_price(content.group(1)) if content else None
+            if price is not None:
+                return price
+    return None
+
+# --- DOM Parsing Backends ---
+
+def _node_price(text: Optional[str], content: Optional[str]) -> Optional[float]:
+    # itemprop=price nodes often carry the machine-readable value in 'content'
+    return parse_price(content) if content else parse_price(text)
+
+
+def _select_with_selectolax(html: str, selectors: List[str]) -> Optional[float]:
+    tree = HTMLParser(html)
+    for selector in selectors:
+        node = tree.css_first(selector)
+        if node is not None:
+            price = _node_price(node.text(strip=True), node.attributes.get("content"))
+            if price is not None:
+                return price
+    return None
+
+
+def _select_with_soup(html: str, selectors: List[str], parser: str) -> Optional[float]:
+    from bs4 import BeautifulSoup # Imported lazily; only the slow paths need it
+
+    soup = BeautifulSoup(html, parser)
+    for selector in selectors:
+        node = soup.select_one(selector)
+        if node is not None:
+            price = _node_price(node.get_text(strip=True), node.get("content"))
+            if price is not None:
+                return price
+    return None
+
+# --- Per-Store Extractors ---
+
+class PriceExtractor:
+    """
+    Extracts the current price from a product page. Subclasses (or instances) only
+    need to supply CSS selectors; the strategy order is shared:
+    1. JSON-LD / meta tag regex pre-scan
+    2. selectolax, or lxml through BeautifulSoup
+    3. html5lib through BeautifulSoup (slowest, most forgiving)
+    """
+
+    domain: str = ""
+    selectors: List[str] = ['[itemprop="price"]', ".price", "#price"]
+
+    def __init__(self, domain: Optional[str] = None, selectors: Optional[List[str]] = None):
+        if domain is not None:
+            self.domain = domain
+        if selectors is not None:
+            self.selectors = selectors
+
+    def extract_fast(self, html: str) -> Optional[float]:
+        """Structured-data path only. Cheap enough to run on the event loop."""
+        return extract_structured_price(html)
+
+    def extract_dom(self, html: str) -> Optional[float]:
+        """Selector-based paths, from the fastest available parser down to html5lib."""
+        if SELECTOLAX_AVAILABLE:
+            price = _select_with_selectolax(html, self.selectors)
+            if price is not None:
+                return price
+        elif LXML_AVAILABLE:
+            price = _select_with_soup(html, self.selectors, "lxml")
+            if price is not None:
+                return price
+        return _select_with_soup(html, self.selectors, "html5lib")
+
+    def extract(self, html: str) -> Optional[float]:
+        price = self.extract_fast(html)
+        if price is not None:
+            return price
+        return self.extract_dom(html)
+
+
+class AmazonExtractor(PriceExtractor):
+    domain = "amazon.com"
+    selectors = [
+        "#corePrice_feature_div .a-offscreen",
+        "#corePriceDisplay_desktop_feature_div .a-offscreen",
+        "#priceblock_dealprice",
+        "#priceblock_ourprice",
+        ".a-price .a-offscreen",
+    ]
+
+
+class EbayExtractor(PriceExtractor):
+    domain = "ebay.com"
+    selectors = [
+        ".x-price-primary .ux-textspans",
+        "#prcIsum",
+        "#mm-saleDscPrc",
+        '[itemprop="price"]',
+    ]
+
+
+class BestBuyExtractor(PriceExtractor):
+    domain = "bestbuy.com"
+    selectors = [
+        '[data-testid="customer-price"] span',
+        ".priceView-customer-price span",
+        ".priceView-hero-price span",
+    ]
+
+
+# --- Registry (keyed by domain, like AFFILIATE_CONFIG) ---
+
+EXTRACTOR_REGISTRY: Dict[str, PriceExtractor] = {}
+DEFAULT_EXTRACTOR = PriceExtractor()
+
+
+def register_extractor(extractor: PriceExtractor) -> PriceExtractor:
+    """Registers (or replaces) the extractor for its domain."""
+    EXTRACTOR_REGISTRY[extractor.domain] = extractor
+    return extractor
+
+
+for _extractor_cls in (AmazonExtractor, EbayExtractor, BestBuyExtractor):
+    register_extractor(_extractor_cls())
+
+
+def get_extractor(url: str) -> PriceExtractor:
+    """Returns the extractor registered for the URL's domain, or the generic one."""
+    return EXTRACTOR_REGISTRY.get(affiliate_service.get_domain(url).lower(), DEFAULT_EXTRACTOR)
+
+
+def extract_price(url: str, html: str) -> Optional[float]:
+    """Synchronous, all-strategies extraction."""
+    return get_extractor(url).extract(html)
+
+
+def _extract_dom_price(url: str, html: str) -> Optional[float]:
+    # Top-level function so it can be pickled into the process pool
+    return get_extractor(url).extract_dom(html)
+
+# --- Async Entry Point (Process Pool) ---
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_executor() -> Optional[ProcessPoolExecutor]:
+    """Lazily creates the shared parsing process pool."""
+    global _executor
+    if _executor is None and EXTRACTION_WORKERS > 0:
+        _executor = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS)
+        logger.info(f"Extraction process pool started with {EXTRACTION_WORKERS} workers.")
+    return _executor
+
+
+def shutdown_executor():
+    """Stops the parsing process pool. Call on worker/API shutdown."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def extract_price_async(url: str, html: str) -> Optional[float]:
+    """
+    Extracts a price without blocking the event loop: the regex pre-scan runs inline,
+    and DOM parsing (when needed) is shipped to the process pool.
+    """
+    extractor = get_extractor(url)
+    price = extractor.extract_fast(html)
+    if price is not None:
+        return price
+
+    executor = get_executor()
+    if executor is None:
+        return extractor.extract_dom(html)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, _extract_dom_price, url, html)
@@ -0,0 +1,167 @@
+# AI-Shopping-Assistant/app/services/http_client.py
+
+import os
+import asyncio
+from typing import Any, Dict, Optional
+import httpx
+from ..utils.logger import setup_logging
+
+logger = setup_logging(__name__)
+
+# --- Configuration (Overridable through environment variables / .env) ---
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "15"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; SageMindShoppingAssistant/1.0)",
+    "Accept": "text/html,application/xhtml+xml",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+# HTTP/2 needs the optional 'h2' package (pip install httpx[http2]); fall back to HTTP/1.1 keep-alive
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class HttpClientPool:
+    """
+    Keeps one long-lived, connection-pooled httpx.AsyncClient per proxy endpoint
+    (plus one for direct connections), so repeated fetches to the same store reuse
+    TCP/TLS connections instead of handshaking for every product.
+
+    Counters:
+    - client_hits / client_misses: fetches served by an existing client vs. ones
+      that had to create a client for a new proxy endpoint.
+    - connection_reuses / new_connections: requests sent over a pooled keep-alive
+      connection vs. requests that opened a new TCP connection.
+    """
+
+    def __init__(self, timeout: float = HTTP_TIMEOUT_SECONDS, http2: bool = HTTP2_AVAILABLE):
+        self.timeout = timeout
+        self.http2 = http2
+        self._clients: Dict[Optional[str], httpx.AsyncClient] = {}
+        self._lock = asyncio.Lock()
+        self.counters = {
+            "client_hits": 0,
+            "client_misses": 0,
+            "requests": 0,
+            "new_connections": 0,
+            "connection_reuses": 0,
+        }
+        logger.info(f"HttpClientPool initialized (http2={self.http2}).")
+
+    def _build_client(self, proxy_url: Optional[str]) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+        return httpx.AsyncClient(
+            proxy=proxy_url,
+            http2=self.http2,
+            limits=limits,
+            timeout=self.timeout,
+            headers=DEFAULT_HEADERS,
+            follow_redirects=True,
+        )
+
+    async def get_client(self, proxy_dict: Optional[dict] = None) -> httpx.AsyncClient:
+        """Returns the pooled client for the proxy (as produced by ProxyService), creating it once."""
+        proxy_url = proxy_dict.get("http://") if proxy_dict else None
+
+        client = self._clients.get(proxy_url)
+        if client is not None:
+            self.counters["client_hits"] += 1
+            return client
+
+        async with self._lock:
+            client = self._clients.get(proxy_url)
+            if client is None:
+                self.counters["client_misses"] += 1
+                client = self._build_client(proxy_url)
+                self._clients[proxy_url] = client
+                endpoint = proxy_url.split('@')[-1] if proxy_url else "direct"
+                logger.debug(f"Created pooled HTTP client for {endpoint}.")
+            else:
+                self.counters["client_hits"] += 1
+            return client
+
+    async def fetch(
+        self,
+        url: str,
+        proxy_dict: Optional[dict] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> httpx.Response:
+        """Performs a GET for `url` through the pooled client of the given proxy."""
+        client = await self.get_client(proxy_dict)
+        opened_connection = False
+
+        async def trace(event_name: str, info: Dict[str, Any]):
+            nonlocal opened_connection
+            # httpcore only emits connect_tcp for connections it has to open
+            if event_name == "connection.connect_tcp.complete":
+                opened_connection = True
+
+        response = await client.get(url, headers=headers, extensions={"trace": trace})
+        self.counters["requests"] += 1
+        if opened_connection:
+            self.counters["new_connections"] += 1
+        else:
+            self.counters["connection_reuses"] += 1
+        return response
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Returns a snapshot of the pool counters."""
+        stats = dict(self.counters)
+        stats["clients"] = len(self._clients)
+        return stats
+
+    async def aclose(self):
+        """Closes every pooled client. Call on worker/API shutdown."""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+        logger.info("HttpClientPool closed.")
+
+
+http_client_pool = HttpClientPool()
+
+# --- Example Usage (for testing the module directly against a local stub server) ---
+if __name__ == "__main__":
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1" # Needed for keep-alive
+
+        def do_GET(self):
+            body = b"<html><body><span class='price'>$19.99</span></body></html>"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stub_url = f"http://127.0.0.1:{server.server_address[1]}/item"
+
+    async def main():
+        pool = HttpClientPool(http2=False)
+        for _ in range(5):
+            response = await pool.fetch(stub_url)
+            print(f"GET {stub_url} -> {response.status_code}")
+        print(f"Pool stats: {pool.get_stats()}")
+        await pool.aclose()
+
+    asyncio.run(main())
+    server.shutdown()
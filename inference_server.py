@@ -0,0 +1,410 @@
+# AI-Shopping-Assistant/app/ai/inference_server.py
+
+import os
+import time
+import queue
+import threading
+import weakref
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Dict, Iterator, List, Optional
+from ..utils.logger import setup_logging
+from .model_backends import CHAT_MODEL_BACKEND
+from .model_registry import model_registry
+
+logger = setup_logging(__name__)
+
+# --- Configuration ---
+CHAT_MODEL_NAME = os.getenv("CHAT_MODEL_NAME", "gpt2")
+CHAT_MAX_NEW_TOKENS = int(os.getenv("CHAT_MAX_NEW_TOKENS", "60"))
+# Requests arriving within this window (after the first one) share a generate() call
+CHAT_BATCH_WINDOW_MS = float(os.getenv("CHAT_BATCH_WINDOW_MS", "20"))
+CHAT_MAX_BATCH_SIZE = int(os.getenv("CHAT_MAX_BATCH_SIZE", "8"))
+# Requests beyond this many waiting are rejected (the route answers 503)
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "64"))
+# Streaming generations run unbatched, one thread each, so they get their own cap
+CHAT_MAX_STREAMS = int(os.getenv("CHAT_MAX_STREAMS", "4"))
+CHAT_MODEL_LOAD_TIMEOUT = 300.0
+# Encode the shared system prompt once and reuse its key/value states for every request
+CHAT_PREFIX_CACHE = os.getenv("CHAT_PREFIX_CACHE", "1") == "1"
+
+SYSTEM_PROMPT = (
+    "The following is a conversation with SageMind, a helpful AI shopping assistant "
+    "that gives short, practical advice about products, prices and deals.\n"
+)
+STOP_MARKERS = ("\nUser:", "\nCustomer:", "\n\n")
+FALLBACK_RESPONSE = "I'm not sure about that one. Could you tell me a bit more?"
+# Streamed text is held back by this much so a marker split across tokens is never sent
+_MARKER_HOLDBACK = max(len(m) for m in STOP_MARKERS) - 1
+
+
+class InferenceQueueFull(Exception):
+    """Raised when the chat inference queue is at capacity."""
+
+
+def prompt_suffix(user_message: str) -> str:
+    """The per-request part of the prompt that follows SYSTEM_PROMPT."""
+    return f"User: {user_message.strip()}\nSageMind:"
+
+
+def build_prompt(user_message: str) -> str:
+    return SYSTEM_PROMPT + prompt_suffix(user_message)
+
+
+def clean_response(text: str) -> str:
+    """Cuts the generation at the first turn marker."""
+    for marker in STOP_MARKERS:
+        cut = text.find(marker)
+        if cut != -1:
+            text = text[:cut]
+    return text.strip() or FALLBACK_RESPONSE
+
+
+class _Request:
+    __slots__ = ("message", "future", "enqueued_at")
+
+    def __init__(self, message: str):
+        self.message = message
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class _TokenStream:
+    """
+    Iterator over streamed text that frees its slot on close(). If close() is never
+    called (the response never started iterating), the slot is freed when the
+    stream is garbage-collected.
+    """
+
+    def __init__(self, chunks: Iterator[str], release):
+        self._chunks = chunks
+        self._release = release
+        weakref.finalize(self, release)
+
+    def __iter__(self):
+        return self._chunks
+
+    def close(self):
+        try:
+            self._chunks.close()
+        except ValueError:
+            pass # Still running in another thread; its own finally stops generation
+        self._release()
+
+
+class ChatInferenceServer:
+    """
+    Dedicated CPU inference worker for the chatbot.
+    A single background thread owns the model. It takes the first waiting prompt,
+    collects more for up to CHAT_BATCH_WINDOW_MS (or until CHAT_MAX_BATCH_SIZE),
+    left-pads them into one batch, and runs a single generate() call. Each caller
+    gets a Future, so N concurrent chats cost one forward pass per token, not N,
+    and they no longer occupy FastAPI's default threadpool.
+    The key/value states of SYSTEM_PROMPT are computed once after loading and
+    passed as past_key_values, so each generate() only encodes the user's turn.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = CHAT_MAX_BATCH_SIZE,
+        batch_window_ms: float = CHAT_BATCH_WINDOW_MS,
+        max_queue: int = CHAT_MAX_QUEUE,
+        max_new_tokens: int = CHAT_MAX_NEW_TOKENS,
+    ):
+        self.model_name = CHAT_MODEL_NAME
+        self.backend = CHAT_MODEL_BACKEND
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_new_tokens = max_new_tokens
+        self._queue: "queue.Queue[_Request]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._model = None
+        self._tokenizer = None
+        self._prefix_ids = None
+        self._prefix_past = None
+        self._ready = threading.Event()
+        self._load_error: Optional[Exception] = None
+        self._stream_slots = threading.BoundedSemaphore(CHAT_MAX_STREAMS)
+
+        self.metrics = {"requests": 0, "rejected": 0, "cancelled": 0, "batches": 0, "failed": 0}
+        self._batch_sizes: deque = deque(maxlen=1000)
+        self._latencies_ms: deque = deque(maxlen=1000)
+        self._queue_waits_ms: deque = deque(maxlen=1000)
+
+    # --- Lifecycle ---
+
+    def start(self):
+        """Starts the worker thread (the model is fetched from the registry inside it). Safe to call repeatedly."""
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._load_error = None
+                self._thread = threading.Thread(target=self._run, name="chat-inference", daemon=True)
+                self._thread.start()
+
+    def _load_model(self):
+        # Loads on first use (or returns the copy already loaded by the startup warm-up)
+        self._tokenizer, self._model = model_registry.get("chat")
+        if CHAT_PREFIX_CACHE:
+            self._build_prefix_cache()
+        self._ready.set()
+
+    # --- System Prompt KV Cache ---
+
+    def _build_prefix_cache(self):
+        import torch
+
+        try:
+            prefix_ids = self._tokenizer(SYSTEM_PROMPT, return_tensors="pt")["input_ids"]
+            with torch.no_grad():
+                past = self._model(input_ids=prefix_ids, use_cache=True).past_key_values
+            if hasattr(past, "to_legacy_cache"):
+                past = past.to_legacy_cache()
+            # Legacy (key, value) tuples: generate() concatenates onto them and never mutates them
+            self._prefix_ids, self._prefix_past = prefix_ids, tuple((k, v) for k, v in past)
+            logger.info(f"Cached key/value states for the {prefix_ids.shape[1]}-token system prompt.")
+        except Exception as e:
+            logger.warning(f"System prompt KV cache disabled: {e}")
+            self._prefix_ids = self._prefix_past = None
+
+    def _encode(self, messages: List[str]) -> Dict[str, Any]:
+        """
+        Tokenizes a batch for generate(). With the prefix cache, the user turns are
+        left-padded on their own and appended to the cached prefix, so the padding
+        sits between prefix and turn (masked out; GPT-2 derives positions from the mask).
+        """
+        if self._prefix_past is None:
+            return self._tokenizer([build_prompt(m) for m in messages], return_tensors="pt", padding=True)
+
+        import torch
+
+        size = len(messages)
+        turns = self._tokenizer([prompt_suffix(m) for m in messages], return_tensors="pt", padding=True)
+        prefix_ids = self._prefix_ids.expand(size, -1)
+        return {
+            "input_ids": torch.cat([prefix_ids, turns["input_ids"]], dim=1),
+            "attention_mask": torch.cat([torch.ones_like(prefix_ids), turns["attention_mask"]], dim=1),
+            "past_key_values": tuple(
+                (k.expand(size, -1, -1, -1), v.expand(size, -1, -1, -1)) for k, v in self._prefix_past
+            ),
+        }
+
+    # --- Producer Side ---
+
+    def submit(self, message: str) -> Future:
+        """Queues a chat message. Raises InferenceQueueFull when at capacity."""
+        self.start()
+        request = _Request(message)
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full:
+            self.metrics["rejected"] += 1
+            raise InferenceQueueFull(f"Chat inference queue is full ({self._queue.maxsize} waiting).")
+        self.metrics["requests"] += 1
+        return request.future
+
+    def open_stream(self, message: str) -> "_TokenStream":
+        """
+        Reserves a streaming slot (raises InferenceQueueFull when none is free) and
+        returns an iterator of text chunks as the model produces them.
+        """
+        if not self._stream_slots.acquire(blocking=False):
+            self.metrics["rejected"] += 1
+            raise InferenceQueueFull(f"All {CHAT_MAX_STREAMS} streaming slots are busy.")
+        released = threading.Event()
+
+        def release():
+            if not released.is_set():
+                released.set()
+                self._stream_slots.release()
+
+        self.start()
+        self.metrics["requests"] += 1
+        return _TokenStream(self._stream(message, release), release)
+
+    def _wait_until_ready(self):
+        """Waits for the model, giving up as soon as the load fails (not after the full timeout)."""
+        deadline = time.monotonic() + CHAT_MODEL_LOAD_TIMEOUT
+        while not self._ready.wait(timeout=0.5):
+            thread = self._thread
+            if self._load_error is not None or thread is None or not thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError(f"Chat model '{self.model_name}' is not loaded.")
+
+    def _stream(self, message: str, release) -> Iterator[str]:
+        from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+        stop = threading.Event()
+
+        class _StopWhenSet(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                return stop.is_set()
+
+        started = time.perf_counter()
+        try:
+            self._wait_until_ready()
+
+            while True:
+                inputs = self._encode([message])
+                streamer = TextIteratorStreamer(self._tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=60)
+                failure: List[Exception] = []
+
+                def generate(inputs=inputs, streamer=streamer, failure=failure):
+                    try:
+                        self._model.generate(
+                            **inputs,
+                            streamer=streamer,
+                            max_new_tokens=self.max_new_tokens,
+                            do_sample=True,
+                            top_p=0.92,
+                            temperature=0.8,
+                            pad_token_id=self._tokenizer.eos_token_id,
+                            stopping_criteria=StoppingCriteriaList([_StopWhenSet()]),
+                        )
+                    except Exception as e:
+                        failure.append(e)
+                        streamer.end() # Wake the consumer now rather than after the streamer's timeout
+
+                threading.Thread(target=generate, daemon=True).start()
+
+                text, sent, stopped = "", 0, False
+                for chunk in streamer:
+                    text += chunk
+                    cut = min((i for i in (text.find(m) for m in STOP_MARKERS) if i != -1), default=-1)
+                    if cut != -1:
+                        text, stopped = text[:cut], True
+                        break
+                    safe_end = len(text) - _MARKER_HOLDBACK
+                    if safe_end > sent:
+                        yield text[sent:safe_end]
+                        sent = safe_end
+
+                if failure and not stopped:
+                    if sent == 0 and "past_key_values" in inputs:
+                        # Same fallback as _generate(); nothing was sent yet, so start over without the cache
+                        logger.warning(f"Generation from the cached system prompt failed ({failure[0]}); disabling the prefix cache.")
+                        self._prefix_past = None
+                        continue
+                    raise failure[0] # The route turns this into an `error` event
+                if len(text.rstrip()) > sent:
+                    yield text[sent:].rstrip()
+                break
+            self._latencies_ms.append((time.perf_counter() - started) * 1000)
+        finally:
+            # Stops generation early on a stop marker or a client disconnect (GeneratorExit)
+            stop.set()
+            release()
+
+    # --- Consumer Side ---
+
+    def _claim(self, request: _Request) -> bool:
+        """
+        Marks the request as running so it can no longer be cancelled. Returns False
+        (and drops it) if its client already went away (the awaiting route was cancelled).
+        """
+        if request.future.set_running_or_notify_cancel():
+            return True
+        self.metrics["cancelled"] += 1
+        return False
+
+    def _collect_batch(self) -> List[_Request]:
+        batch: List[_Request] = []
+        while not batch:
+            request = self._queue.get()
+            if self._claim(request):
+                batch.append(request)
+        deadline = time.perf_counter() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if self._claim(request):
+                batch.append(request)
+        return batch
+
+    def _generate(self, messages: List[str]) -> List[str]:
+        import torch
+
+        inputs = self._encode(messages)
+        try:
+            with torch.inference_mode():
+                output = self._model.generate(
+                    **inputs,
+                    max_new_tokens=self.max_new_tokens,
+                    do_sample=True,
+                    top_p=0.92,
+                    temperature=0.8,
+                    pad_token_id=self._tokenizer.eos_token_id,
+                )
+        except Exception as e:
+            if "past_key_values" not in inputs:
+                raise
+            # Model/transformers combination that can't resume from the cached prefix
+            logger.warning(f"Generation from the cached system prompt failed ({e}); disabling the prefix cache.")
+            self._prefix_past = None
+            return self._generate(messages)
+        new_tokens = output[:, inputs["input_ids"].shape[1]:]
+        return [clean_response(t) for t in self._tokenizer.batch_decode(new_tokens, skip_special_tokens=True)]
+
+    def _run(self):
+        try:
+            self._load_model()
+        except Exception as e:
+            self._load_error = e
+            logger.error(f"Failed to load chat model '{self.model_name}': {e}")
+            # Fail everything queued so far; the next submit() retries the load
+            while not self._queue.empty():
+                future = self._queue.get_nowait().future
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        while True:
+            batch = self._collect_batch()
+            started = time.perf_counter()
+            for request in batch:
+                self._queue_waits_ms.append((started - request.enqueued_at) * 1000)
+            try:
+                responses = self._generate([r.message for r in batch])
+            except Exception as e:
+                self.metrics["failed"] += len(batch)
+                logger.error(f"Chat batch of {len(batch)} failed: {e}")
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+
+            finished = time.perf_counter()
+            self.metrics["batches"] += 1
+            self._batch_sizes.append(len(batch))
+            for request, text in zip(batch, responses):
+                self._latencies_ms.append((finished - request.enqueued_at) * 1000)
+                if not request.future.done():
+                    request.future.set_result(text)
+
+    # --- Metrics ---
+
+    @staticmethod
+    def _percentile(values, pct: float) -> Optional[float]:
+        if not values:
+            return None
+        ordered = sorted(values)
+        return round(ordered[min(len(ordered) - 1, int(pct * len(ordered)))], 1)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self.metrics)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["model_loaded"] = self._model is not None
+        stats["backend"] = self.backend
+        stats["prefix_cache_tokens"] = int(self._prefix_ids.shape[1]) if self._prefix_past is not None else 0
+        stats["avg_batch_size"] = round(sum(self._batch_sizes) / len(self._batch_sizes), 2) if self._batch_sizes else None
+        stats["latency_ms_p50"] = self._percentile(self._latencies_ms, 0.50)
+        stats["latency_ms_p95"] = self._percentile(self._latencies_ms, 0.95)
+        stats["queue_wait_ms_p95"] = self._percentile(self._queue_waits_ms, 0.95)
+        return stats
+
+
+chat_inference_server = ChatInferenceServer()
@@ -0,0 +1,61 @@
+# AI-Shopping-Assistant/app/services/loop_monitor.py
+
+import os
+import asyncio
+from typing import Any, Dict, List, Optional
+from ..utils.logger import setup_logging
+
+logger = setup_logging(__name__)
+
+# --- Configuration ---
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5")) # Seconds between probes
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "100")) # Lag logged as a stall
+
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag: a probe task sleeps for a fixed interval and records
+    how late it wakes up. Anything blocking the loop (sync DB calls, CPU work in
+    a coroutine) shows up as lag; lags above the threshold are logged as stalls.
+    """
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, threshold_ms: float = LOOP_LAG_THRESHOLD_MS):
+        self.interval = interval
+        self.threshold_ms = threshold_ms
+        self._task: Optional[asyncio.Task] = None
+        self._recent_ms: List[float] = []
+        self.metrics = {"samples": 0, "stalls": 0, "max_lag_ms": 0.0}
+
+    def start(self):
+        """Starts probing the running loop (no-op if already running)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._probe())
+            logger.info(f"Event loop lag monitor started (threshold {self.threshold_ms:.0f} ms).")
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _probe(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, loop.time() - expected) * 1000
+            self.metrics["samples"] += 1
+            self.metrics["max_lag_ms"] = max(self.metrics["max_lag_ms"], round(lag_ms, 1))
+            self._recent_ms = (self._recent_ms + [lag_ms])[-120:]
+            if lag_ms >= self.threshold_ms:
+                self.metrics["stalls"] += 1
+                logger.warning(f"Event loop stalled for {lag_ms:.0f} ms (something blocked the loop).")
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self.metrics)
+        stats["running"] = self._task is not None and not self._task.done()
+        stats["threshold_ms"] = self.threshold_ms
+        stats["avg_recent_lag_ms"] = round(sum(self._recent_ms) / len(self._recent_ms), 2) if self._recent_ms else None
+        return stats
+
+
+loop_lag_monitor = LoopLagMonitor()
@@ -0,0 +1,161 @@
+# AI-Shopping-Assistant/app/ai/model_backends.py
+
+import os
+import time
+from typing import List, Union
+import numpy as np
+from ..database.db import BASE_DIR
+from ..utils.logger import setup_logging
+from .embedding_store import EMBEDDING_MODEL_NAME
+
+logger = setup_logging(__name__)
+
+# --- Configuration ---
+# "torch"     - full-precision PyTorch (the original behaviour)
+# "quantized" - PyTorch with dynamic int8 quantization of the Linear layers (CPU)
+# "onnx"      - ONNX Runtime export via optimum (exported once, then loaded from ONNX_EXPORT_DIR)
+CHAT_MODEL_BACKEND = os.getenv("CHAT_MODEL_BACKEND", "torch").lower()
+EMBEDDING_MODEL_BACKEND = os.getenv("EMBEDDING_MODEL_BACKEND", "torch").lower()
+ONNX_EXPORT_DIR = os.getenv("ONNX_EXPORT_DIR", os.path.join(BASE_DIR, "onnx_models"))
+
+SUPPORTED_BACKENDS = ("torch", "quantized", "onnx")
+
+
+def _check_backend(backend: str) -> str:
+    if backend not in SUPPORTED_BACKENDS:
+        raise ValueError(f"Unsupported model backend '{backend}'. Use one of {SUPPORTED_BACKENDS}.")
+    return backend
+
+
+def _export_dir(model_name: str, task: str) -> str:
+    return os.path.join(ONNX_EXPORT_DIR, f"{model_name.replace('/', '--')}-{task}")
+
+
+# --- Dynamic int8 quantization ---
+
+def _conv1d_to_linear(module):
+    """
+    GPT-2 implements its projections as transformers' Conv1D (a transposed Linear),
+    which quantize_dynamic doesn't recognise. Swap them for equivalent nn.Linear layers.
+    """
+    import torch
+    from transformers.pytorch_utils import Conv1D
+
+    for name, child in module.named_children():
+        if isinstance(child, Conv1D):
+            in_features, out_features = child.weight.shape
+            linear = torch.nn.Linear(in_features, out_features)
+            linear.weight.data = child.weight.data.t().contiguous()
+            linear.bias.data = child.bias.data
+            setattr(module, name, linear)
+        else:
+            _conv1d_to_linear(child)
+    return module
+
+
+def quantize_dynamic_int8(model):
+    """int8 weights, activations quantized on the fly: ~4x smaller Linear layers and faster CPU matmuls."""
+    import torch
+
+    model = _conv1d_to_linear(model)
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+# --- Chat (causal LM) ---
+
+def load_causal_lm(model_name: str, backend: str = CHAT_MODEL_BACKEND):
+    """Loads the chat model with the configured backend. All backends support .generate()."""
+    backend = _check_backend(backend)
+    started = time.perf_counter()
+
+    if backend == "onnx":
+        from optimum.onnxruntime import ORTModelForCausalLM
+
+        path = _export_dir(model_name, "causal-lm")
+        if os.path.isdir(path):
+            model = ORTModelForCausalLM.from_pretrained(path, use_cache=True)
+        else:
+            logger.info(f"Exporting '{model_name}' to ONNX (one-time) in {path}...")
+            model = ORTModelForCausalLM.from_pretrained(model_name, export=True, use_cache=True)
+            model.save_pretrained(path)
+    else:
+        from transformers import AutoModelForCausalLM
+
+        model = AutoModelForCausalLM.from_pretrained(model_name)
+        model.eval()
+        if backend == "quantized":
+            model = quantize_dynamic_int8(model)
+
+    logger.info(f"Loaded chat model '{model_name}' ({backend}) in {time.perf_counter() - started:.1f}s.")
+    return model
+
+
+# --- Embeddings ---
+
+class OnnxSentenceEncoder:
+    """
+    ONNX Runtime replacement for SentenceTransformer.encode(): transformer forward
+    pass, attention-masked mean pooling and optional L2 normalization, matching
+    the pooling used by all-MiniLM-L6-v2.
+    """
+
+    def __init__(self, model_name: str):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        path = _export_dir(model_name, "feature-extraction")
+        if os.path.isdir(path):
+            self.model = ORTModelForFeatureExtraction.from_pretrained(path)
+            self.tokenizer = AutoTokenizer.from_pretrained(path)
+        else:
+            # sentence-transformers hub names are short ("all-MiniLM-L6-v2")
+            repo = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+            logger.info(f"Exporting '{repo}' to ONNX (one-time) in {path}...")
+            self.model = ORTModelForFeatureExtraction.from_pretrained(repo, export=True)
+            self.tokenizer = AutoTokenizer.from_pretrained(repo)
+            self.model.save_pretrained(path)
+            self.tokenizer.save_pretrained(path)
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = False,
+        show_progress_bar: bool = False,
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        chunks = []
+        for start in range(0, len(texts), batch_size):
+            inputs = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=True, return_tensors="np")
+            hidden = np.asarray(self.model(**inputs).last_hidden_state)
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if normalize_embeddings:
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            chunks.append(pooled.astype(np.float32))
+        vectors = np.concatenate(chunks) if chunks else np.empty((0, 0), dtype=np.float32)
+        return vectors[0] if single else vectors
+
+
+def load_embedder(model_name: str = EMBEDDING_MODEL_NAME, backend: str = EMBEDDING_MODEL_BACKEND):
+    """
+    Loads the sentence embedding model with the configured backend. The result
+    exposes SentenceTransformer's encode(texts, batch_size=..., convert_to_numpy=...,
+    normalize_embeddings=..., show_progress_bar=...) for every backend.
+    """
+    backend = _check_backend(backend)
+    started = time.perf_counter()
+
+    if backend == "onnx":
+        model = OnnxSentenceEncoder(model_name)
+    else:
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(model_name, device="cpu")
+        if backend == "quantized":
+            model = quantize_dynamic_int8(model)
+
+    logger.info(f"Loaded embedding model '{model_name}' ({backend}) in {time.perf_counter() - started:.1f}s.")
+    return model
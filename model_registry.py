@@ -0,0 +1,139 @@
+# AI-Shopping-Assistant/app/ai/model_registry.py
+
+import os
+import time
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+from ..utils.logger import setup_logging
+
+logger = setup_logging(__name__)
+
+# --- Configuration ---
+# Comma-separated models to load in the background at API startup (e.g. "chat,embedding").
+# Empty = everything loads on first use.
+MODEL_WARMUP = [name.strip() for name in os.getenv("MODEL_WARMUP", "").split(",") if name.strip()]
+
+
+class _ModelSpec:
+    __slots__ = ("loader", "warmup", "model", "lock", "load_seconds", "error")
+
+    def __init__(self, loader: Callable[[], Any], warmup: Optional[Callable[[Any], None]]):
+        self.loader = loader
+        self.warmup = warmup
+        self.model = None
+        self.lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+
+class ModelRegistry:
+    """
+    Named, lazily loaded models. Nothing heavy is imported until get() is first
+    called for a model (loaders import torch/transformers inside themselves), so
+    importing the app - or the scrape worker - stays fast and small. Each model
+    loads exactly once even when many threads ask for it at the same time.
+    """
+
+    def __init__(self):
+        self._specs: Dict[str, _ModelSpec] = {}
+
+    def register(self, name: str, loader: Callable[[], Any], warmup: Optional[Callable[[Any], None]] = None):
+        """Registers a loader (and an optional warm-up call, e.g. one dummy inference)."""
+        self._specs[name] = _ModelSpec(loader, warmup)
+
+    def get(self, name: str) -> Any:
+        """Returns the model, loading it on first use."""
+        spec = self._specs.get(name)
+        if spec is None:
+            raise KeyError(f"No model registered under '{name}'.")
+        if spec.model is None:
+            with spec.lock:
+                if spec.model is None:
+                    started = time.perf_counter()
+                    try:
+                        spec.model = spec.loader()
+                    except Exception as e:
+                        spec.error = str(e)
+                        raise
+                    spec.load_seconds = round(time.perf_counter() - started, 2)
+                    spec.error = None
+                    logger.info(f"Model '{name}' loaded in {spec.load_seconds}s.")
+        return spec.model
+
+    def is_loaded(self, name: str) -> bool:
+        spec = self._specs.get(name)
+        return spec is not None and spec.model is not None
+
+    def warm_up(self, names: Optional[Iterable[str]] = None, background: bool = True) -> Optional[threading.Thread]:
+        """
+        Loads (and warms up) the given models, by default every registered one.
+        With background=True this returns immediately so startup isn't blocked;
+        requests that arrive first simply wait for the same load.
+        """
+        names = list(names) if names is not None else list(self._specs)
+
+        def run():
+            for name in names:
+                try:
+                    model = self.get(name)
+                    warmup = self._specs[name].warmup
+                    if warmup is not None:
+                        warmup(model)
+                except Exception as e:
+                    logger.error(f"Warm-up of model '{name}' failed: {e}")
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            name: {"loaded": spec.model is not None, "load_seconds": spec.load_seconds, "error": spec.error}
+            for name, spec in self._specs.items()
+        }
+
+
+model_registry = ModelRegistry()
+
+
+# --- Registered Models ---
+
+def _load_chat():
+    from transformers import AutoTokenizer # Heavy import, first use only
+    from .inference_server import CHAT_MODEL_NAME
+    from .model_backends import load_causal_lm
+
+    tokenizer = AutoTokenizer.from_pretrained(CHAT_MODEL_NAME)
+    tokenizer.pad_token = tokenizer.eos_token # GPT-2 has no pad token
+    tokenizer.padding_side = "left" # Decoder-only models must be left-padded for batching
+    return tokenizer, load_causal_lm(CHAT_MODEL_NAME)
+
+
+def _warm_chat(_):
+    # Starting the inference server also computes the cached system-prompt KV states
+    from .inference_server import chat_inference_server
+    chat_inference_server.start()
+
+
+def _load_embedding():
+    from .model_backends import load_embedder
+    return load_embedder()
+
+
+model_registry.register("chat", _load_chat, warmup=_warm_chat)
+model_registry.register("embedding", _load_embedding, warmup=lambda model: model.encode("warm up"))
+
+
+def warm_up_models(names: Optional[Iterable[str]] = None) -> Optional[threading.Thread]:
+    """
+    Startup hook: loads MODEL_WARMUP (or the given names) in the background.
+    Call from the application's startup event; does nothing when none are configured.
+    """
+    names = list(names) if names is not None else MODEL_WARMUP
+    if not names:
+        return None
+    logger.info(f"Warming up models in the background: {', '.join(names)}")
+    return model_registry.warm_up(names)
@@ -0,0 +1,202 @@
+# AI-Shopping-Assistant/app/services/price_history.py
+
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from ..database.db import PriceHistory, PricePoint, CatalogState
+from ..utils.logger import setup_logging
+from .bulk_import import dialect_insert
+
+logger = setup_logging(__name__)
+
+# --- Configuration ---
+MAX_BUCKETS = 5000
+RESOLUTION_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def to_epoch(value: datetime) -> int:
+    """Naive datetimes in this app are UTC (datetime.utcnow())."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def from_epoch(ts: int) -> datetime:
+    return datetime.fromtimestamp(int(ts), tz=timezone.utc).replace(tzinfo=None)
+
+
+def parse_resolution(value: str) -> int:
+    """'15m', '6h', '1d', '1w' or plain seconds -> seconds."""
+    match = re.fullmatch(r"\s*(\d+)\s*([mhdw]?)\s*", value.lower())
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f"Invalid resolution '{value}'. Use e.g. 3600, 15m, 6h, 1d or 1w.")
+    return int(match.group(1)) * RESOLUTION_UNITS.get(match.group(2), 1)
+
+
+# --- Writing ---
+
+def write_price_points(db: Session, rows: Iterable[Dict[str, Any]]):
+    """
+    Adds observations given as {"product_id", "price", "timestamp"} dicts (the
+    PriceHistory shape). A second observation in the same second replaces the first.
+    Does not commit.
+    """
+    points = {}
+    for row in rows:
+        key = (row["product_id"], to_epoch(row["timestamp"]))
+        points[key] = {"product_id": key[0], "ts": key[1], "price_cents": int(round(row["price"] * 100))}
+    if not points:
+        return
+    stmt = dialect_insert(db)(PricePoint).values(list(points.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PricePoint.product_id, PricePoint.ts],
+        set_={"price_cents": stmt.excluded.price_cents},
+    )
+    db.execute(stmt)
+
+
+def migrate_legacy_history(db: Session, chunk_size: int = 10000) -> int:
+    """
+    Copies the old price_history rows into price_points, walking price_history by
+    id in chunks. Each chunk commits together with catalog_state's
+    price_history_migrated_id marker, so an interrupted migration resumes where it
+    stopped; once everything is copied, a call costs one empty query.
+    """
+    marker = db.query(CatalogState.price_history_migrated_id).filter(CatalogState.id == 1).scalar() or 0
+    copied, last_id = 0, marker
+    while True:
+        rows = db.query(PriceHistory.id, PriceHistory.product_id, PriceHistory.price, PriceHistory.timestamp).filter(
+            PriceHistory.id > last_id,
+        ).order_by(PriceHistory.id).limit(chunk_size).all()
+        if not rows:
+            break
+        write_price_points(db, (
+            {"product_id": pid, "price": price, "timestamp": ts}
+            for _, pid, price, ts in rows if pid is not None and price is not None and ts is not None
+        ))
+        last_id = rows[-1][0]
+        db.execute(update(CatalogState).where(CatalogState.id == 1).values(price_history_migrated_id=last_id))
+        db.commit()
+        copied += len(rows)
+    if copied:
+        logger.info(f"Migrated {copied} legacy PriceHistory rows into price_points (resumed after id {marker}).")
+    return copied
+
+
+# --- Reading ---
+
+def load_series(db: Session, product_id: int, start: int, end: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(timestamps, prices) for one product in [start, end), read as one clustered range scan."""
+    rows = db.query(PricePoint.ts, PricePoint.price_cents).filter(
+        PricePoint.product_id == product_id, PricePoint.ts >= start, PricePoint.ts < end,
+    ).order_by(PricePoint.ts).all()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    data = np.array(rows, dtype=np.int64)
+    return data[:, 0], data[:, 1] / 100.0
+
+
+def downsample(
+    ts: np.ndarray,
+    prices: np.ndarray,
+    start: int,
+    end: int,
+    resolution: int,
+    opening_price: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Min/max/avg/last per time bucket of [start, end), fully vectorized. Only price
+    changes are stored, so the series is a step function: a price holds until the
+    next point (the price before the first one is `opening_price`). Bucket and
+    change boundaries cut the window into constant-price segments, sorted by time,
+    so ufunc.reduceat aggregates every bucket in one pass:
+    - min/max include the price carried into the bucket,
+    - avg is weighted by how long each price was in force,
+    - count is the number of changes in the bucket (0 for a bucket that just
+      carries the previous price).
+    Buckets before the first known price are omitted.
+    """
+    bucket_starts = np.arange(start, end, resolution, dtype=np.int64)
+    if bucket_starts.size == 0 or (ts.size == 0 and opening_price is None):
+        return []
+
+    edges = np.union1d(bucket_starts, ts)
+    durations = np.diff(np.r_[edges, end])
+    # Price in force from each edge on (NaN while unknown)
+    carried = np.nan if opening_price is None else opening_price
+    if ts.size:
+        latest = np.searchsorted(ts, edges, side="right") - 1
+        segment_prices = np.where(latest >= 0, prices[np.maximum(latest, 0)], carried)
+    else:
+        segment_prices = np.full(edges.size, carried, dtype=np.float64)
+    known = ~np.isnan(segment_prices)
+    weights = np.where(known, durations, 0)
+
+    first_segment = np.searchsorted(edges, bucket_starts)
+    last_segment = np.r_[first_segment[1:], edges.size] - 1
+    mins = np.fmin.reduceat(segment_prices, first_segment)
+    maxs = np.fmax.reduceat(segment_prices, first_segment)
+    held = np.add.reduceat(weights, first_segment)
+    weighted = np.add.reduceat(np.where(known, segment_prices, 0.0) * weights, first_segment)
+    avgs = weighted / np.maximum(held, 1)
+    lasts = segment_prices[last_segment]
+    counts = np.bincount((ts - start) // resolution, minlength=bucket_starts.size)
+
+    return [
+        {
+            "start": from_epoch(b).isoformat(),
+            "min": round(float(lo), 2),
+            "max": round(float(hi), 2),
+            "avg": round(float(avg), 2),
+            "last": round(float(last), 2),
+            "count": int(n),
+        }
+        for b, lo, hi, avg, last, n, h in zip(bucket_starts.tolist(), mins, maxs, avgs, lasts, counts, held)
+        if h > 0
+    ]
+
+
+def price_before(db: Session, product_id: int, ts: int) -> Optional[float]:
+    """The last recorded price before `ts` (prices persist until the next change)."""
+    cents = db.query(PricePoint.price_cents).filter(
+        PricePoint.product_id == product_id, PricePoint.ts < ts,
+    ).order_by(PricePoint.ts.desc()).limit(1).scalar()
+    return cents / 100.0 if cents is not None else None
+
+
+def get_price_history_buckets(
+    db: Session,
+    product_id: int,
+    resolution: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """
+    Downsampled history for a product (default window: the last 365 days).
+    Buckets are aligned to multiples of the resolution (UTC days for '1d'). Points
+    are only stored when the price changes; 'opening_price' (the price in force at
+    the window start) is carried forward, so every bucket from the first known
+    price on is reported, time-weighted (see downsample()).
+    """
+    end_ts = to_epoch(end) if end else to_epoch(datetime.utcnow()) + 1
+    start_ts = to_epoch(start) if start else end_ts - 365 * 86400
+    start_ts -= start_ts % resolution
+    if end_ts <= start_ts:
+        raise ValueError("'start' must be before 'end'.")
+    if (end_ts - start_ts) / resolution > MAX_BUCKETS:
+        raise ValueError(f"That window and resolution would produce more than {MAX_BUCKETS} buckets.")
+
+    ts, prices = load_series(db, product_id, start_ts, end_ts)
+    opening_price = price_before(db, product_id, start_ts)
+    return {
+        "product_id": product_id,
+        "start": from_epoch(start_ts).isoformat(),
+        "end": from_epoch(end_ts).isoformat(),
+        "resolution_seconds": resolution,
+        "points": int(ts.size),
+        "opening_price": opening_price,
+        "buckets": downsample(ts, prices, start_ts, end_ts, resolution, opening_price),
+    }
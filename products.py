@@ -1,11 +1,17 @@
 # AI-Shopping-Assistant/app/routes/products.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import json
+import tempfile
+from collections import Counter
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Any, AsyncIterator, Callable, List, Optional, Tuple
+from datetime import datetime
 
 # Import dependencies
-from ..database.db import get_db, Product, PriceAlert
+from ..database.db import get_db, Product, PriceAlert, SessionLocal
 from ..schemas import (
     ProductCreate, 
     Product as ProductSchema, 
@@ -13,10 +19,31 @@ from ..schemas import (
     PriceAlert as PriceAlertSchema
 )
 from ..utils.logger import setup_logging
+from ..ai.similar_cache import on_product_added
+from ..services.catalog_version import catalog_version, bump_catalog_version
+from ..services.bulk_import import BULK_CHUNK_SIZE, import_products_chunk, create_alerts_chunk
+from ..services.price_history import get_price_history_buckets, parse_resolution
+from ..services.db_executor import run_db
 
 router = APIRouter()
 logger = setup_logging(__name__)
 
+MAX_PAGE_SIZE = 1000
+
+# Columns served by the product listing; embeddings and scrape bookkeeping are never loaded.
+# last_scraped alone doesn't bump the catalog version, so a revalidated (304) listing can
+# show an older scrape time until the next new product or price change (index.html labels
+# it as a lower bound).
+PRODUCT_LIST_COLUMNS = (
+    Product.id,
+    Product.name,
+    Product.description,
+    Product.url,
+    Product.current_price,
+    Product.store,
+    Product.last_scraped,
+)
+
 # --- 1. Product Listing and Creation ---
 
 @router.post("/", response_model=ProductSchema, status_code=status.HTTP_201_CREATED)
@@ -41,21 +68,201 @@ def create_product(product: ProductCreate, db: Session = Depends(get_db)):
         description=product.description
     )
     db.add(db_product)
+    bump_catalog_version(db)
     db.commit()
     db.refresh(db_product)
     logger.info(f"Created new product entry: ID {db_product.id}")
+
+    # Index it and invalidate cached recommendations it could now appear in
+    on_product_added(db, db_product)
     return db_product
 
 @router.get("/", response_model=List[ProductSchema])
-def read_products(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_products(
+    request: Request,
+    response: Response,
+    after_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+):
     """
-    Retrieves a list of all products in the database.
+    Retrieves a page of products ordered by ID.
+
+    Pagination is keyset-based: pass the `X-Next-Cursor` header of one page as
+    `after_id` to get the next one (constant cost however deep you go). `skip`
+    still works for old clients but is O(skip).
+    Responses carry an ETag derived from the catalog version, so a poll with a
+    matching If-None-Match gets 304 Not Modified without querying the products.
     """
-    products = db.query(Product).offset(skip).limit(limit).all()
+    etag = catalog_version.etag()
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = db.query(*PRODUCT_LIST_COLUMNS).order_by(Product.id)
+    if after_id is not None:
+        query = query.filter(Product.id > after_id)
+    elif skip:
+        query = query.offset(skip)
+    products = query.limit(limit).all()
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache" # Cache, but revalidate with If-None-Match
+    if len(products) == limit:
+        response.headers["X-Next-Cursor"] = str(products[-1].id)
     logger.info(f"Retrieved {len(products)} products from the database.")
     return products
 
-# --- 2. Price Alert Management ---
+# --- 2. Bulk Import ---
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+# NDJSON uploads beyond this size are spooled to a temporary file rather than kept in memory
+BULK_SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+async def _spool_body(request: Request) -> tempfile.SpooledTemporaryFile:
+    """
+    Reads the whole upload into a spool before the response starts. Once a
+    StreamingResponse is running, Starlette listens for the client's disconnect on
+    the same receive channel, which would swallow the rest of the body.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=BULK_SPOOL_MAX_MEMORY)
+    try:
+        async for data in request.stream():
+            spool.write(data)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+async def _bulk_source(request: Request) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Yields (index, raw item) from the request body: a JSON array, or NDJSON, which
+    is spooled (to disk past BULK_SPOOL_MAX_MEMORY) and then read line by line, so a
+    100k-line feed is never held in memory. The body is fully read by the time the
+    first item is yielded.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_TYPES:
+        spool = await _spool_body(request)
+        try:
+            index = 0
+            for line in spool:
+                if line.strip():
+                    yield index, line
+                    index += 1
+        finally:
+            spool.close()
+        return
+
+    try:
+        payload = await request.json()
+    except ValueError:
+        payload = None
+    if not isinstance(payload, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Send a JSON array of items, or NDJSON with Content-Type: application/x-ndjson.",
+        )
+    for index, item in enumerate(payload):
+        yield index, item
+
+async def _first_and_rest(source: AsyncIterator):
+    """
+    Pulls the first item before the response starts streaming, so body errors become
+    a 400 and the request body has been read (see _spool_body).
+    """
+    try:
+        first = await source.__anext__()
+    except StopAsyncIteration:
+        first = None
+
+    async def rest():
+        try:
+            if first is not None:
+                yield first
+            async for item in source:
+                yield item
+        finally:
+            await source.aclose() # Closes the spool even if the client went away mid-stream
+    return rest()
+
+def _ndjson(obj) -> bytes:
+    return (json.dumps(obj) + "\n").encode()
+
+async def _stream_bulk_results(source: AsyncIterator, schema, process_chunk: Callable):
+    """
+    Validates items, hands them to `process_chunk` in chunks of BULK_CHUNK_SIZE
+    (one transaction each, run on the DB executor threads), and streams one NDJSON result
+    per item followed by a summary line.
+    """
+    db = SessionLocal() # Own session: the request's dependencies close before streaming ends
+    totals = Counter()
+    chunk = []
+
+    async def flush():
+        try:
+            results = await run_db(process_chunk, db, chunk)
+        except Exception as e:
+            await run_db(db.rollback)
+            logger.error(f"Bulk chunk of {len(chunk)} items failed: {e}")
+            results = [{"index": index, "status": "error", "detail": "Database error; chunk rolled back."} for index, _ in chunk]
+        return results
+
+    try:
+        async for index, raw in source:
+            try:
+                data = json.loads(raw) if isinstance(raw, (bytes, str)) else raw
+                chunk.append((index, schema.model_validate(data)))
+            except ValueError as e: # Bad JSON line or pydantic ValidationError
+                detail = e.errors()[0]["msg"] if isinstance(e, ValidationError) else "Invalid JSON."
+                totals["error"] += 1
+                yield _ndjson({"index": index, "status": "error", "detail": detail})
+                continue
+
+            if len(chunk) >= BULK_CHUNK_SIZE:
+                for result in await flush():
+                    totals[result["status"]] += 1
+                    yield _ndjson(result)
+                chunk = []
+
+        if chunk:
+            for result in await flush():
+                totals[result["status"]] += 1
+                yield _ndjson(result)
+        yield _ndjson({"summary": dict(totals)})
+    finally:
+        db.close()
+
+@router.post("/bulk")
+async def bulk_import_products(request: Request):
+    """
+    Imports many products at once (e.g. a merchant feed). Body: a JSON array of
+    products, or NDJSON (one product per line, Content-Type: application/x-ndjson).
+    URLs that are already tracked are skipped via INSERT ... ON CONFLICT.
+    Streams NDJSON back: {"index", "status": created|exists|error, "id", ...} per
+    item, then {"summary": {...}}.
+    """
+    source = await _first_and_rest(_bulk_source(request))
+    return StreamingResponse(
+        _stream_bulk_results(source, ProductCreate, import_products_chunk),
+        media_type="application/x-ndjson",
+    )
+
+@router.post("/alerts/bulk")
+async def bulk_create_price_alerts(request: Request):
+    """
+    Creates many price alerts at once (JSON array or NDJSON, like /bulk). Alerts
+    are validated against current prices per chunk; streams one result per item.
+    """
+    source = await _first_and_rest(_bulk_source(request))
+    return StreamingResponse(
+        _stream_bulk_results(source, PriceAlertCreate, create_alerts_chunk),
+        media_type="application/x-ndjson",
+    )
+
+# --- 3. Price Alert Management ---
 
 @router.post("/alerts", response_model=PriceAlertSchema, status_code=status.HTTP_201_CREATED)
 def create_price_alert(alert: PriceAlertCreate, db: Session = Depends(get_db)):
@@ -96,4 +303,29 @@ def read_price_alerts_by_email(email: str, db: Session = Depends(get_db)):
     Retrieves all active price alerts for a given user email.
     """
     alerts = db.query(PriceAlert).filter(PriceAlert.user_email == email, PriceAlert.active == True).all()
-    return alerts
\ No newline at end of file
+    return alerts
+
+# --- 4. Price History ---
+
+@router.get("/{product_id}/history")
+def read_price_history(
+    product_id: int,
+    resolution: str = "1d",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Returns a product's price history downsampled to min/max/avg/last buckets,
+    e.g. ?resolution=1d for a year of daily buckets or ?resolution=1h&start=... for
+    a zoomed-in view. Times are UTC; the default window is the last 365 days.
+    """
+    if not db.query(Product.id).filter(Product.id == product_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Product with ID {product_id} not found."
+        )
+    try:
+        return get_price_history_buckets(db, product_id, parse_resolution(resolution), start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
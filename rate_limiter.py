@@ -0,0 +1,178 @@
+# AI-Shopping-Assistant/app/services/rate_limiter.py
+
+import os
+import time
+import asyncio
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+from ..utils.logger import setup_logging
+
+logger = setup_logging(__name__)
+
+# --- Configuration ---
+# Starting request rate (requests/sec) and burst size for any domain without an override
+DEFAULT_RATE = float(os.getenv("SCRAPE_DEFAULT_RATE", "2.0"))
+DEFAULT_BURST = int(os.getenv("SCRAPE_DEFAULT_BURST", "4"))
+
+# Per-store starting points (keyed by domain, like AFFILIATE_CONFIG)
+DOMAIN_RATE_CONFIG = {
+    "amazon.com": {"rate": 1.0, "burst": 2, "max_rate": 5.0},
+    "ebay.com": {"rate": 2.0, "burst": 4, "max_rate": 10.0},
+    "bestbuy.com": {"rate": 1.0, "burst": 2, "max_rate": 5.0},
+}
+
+# Adaptive (AIMD) tuning: halve on throttling, creep back up on success
+RATE_DECREASE_FACTOR = 0.5
+RATE_INCREASE_STEP = 0.05 # requests/sec added per successful response
+MIN_RATE = 0.05
+DEFAULT_MAX_RATE = 10.0
+# Pause applied on 429/503 when the store sends no Retry-After header
+DEFAULT_THROTTLE_PAUSE = 30.0
+MAX_RETRY_AFTER = 3600.0
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses a Retry-After header (delta-seconds or HTTP-date) into seconds from now."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def split_budget(budget: int, processes: int, index: int, what: str = "budget") -> int:
+    """
+    Process `index`'s share of an integer per-store budget split between `processes`
+    sibling worker processes. The remainder goes to the lowest indexes, so the shares
+    add up to the budget exactly. A share is never below 1 (a store can't be left
+    unscraped), so with more processes than the budget allows the aggregate is
+    `processes` instead; that is logged as a warning.
+    """
+    processes = max(1, processes)
+    share = budget // processes + (1 if index % processes < budget % processes else 0)
+    if share < 1:
+        logger.warning(f"{processes} worker processes exceed the {what} of {budget}; each still gets 1 ({processes} in total).")
+        return 1
+    return share
+
+
+class TokenBucket:
+    """Token bucket for a single domain, with an adjustable refill rate and a pause deadline."""
+
+    def __init__(self, rate: float, burst: int, max_rate: float):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_rate = max_rate
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.throttled = 0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> float:
+        """Takes a token if possible. Returns 0 on success, otherwise seconds to wait."""
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class DomainRateLimiter:
+    """
+    Shapes outgoing scrape requests per store domain. Each domain has a token bucket
+    whose rate adapts to the store's responses: it is halved on 429/503 (and paused
+    for Retry-After), then increased additively on every success. That keeps
+    each store near its highest sustainable rate without a fixed pessimistic delay.
+    """
+
+    def __init__(self):
+        self.buckets: Dict[str, TokenBucket] = {}
+        # Worker processes on this host sharing each domain's budget, and this one's index (see set_processes)
+        self.processes = 1
+        self.process_index = 0
+        logger.info("DomainRateLimiter initialized.")
+
+    def set_processes(self, processes: int, index: int = 0):
+        """
+        Splits every domain's rate, burst and additive step between `processes` worker
+        processes (worker.py --processes); `index` is this process's position. Rates
+        divide evenly; bursts are split with split_budget(), so they only exceed the
+        configured burst when there are more processes than burst tokens.
+        Call before the first request.
+        """
+        self.processes = max(1, processes)
+        self.process_index = index
+        self.buckets.clear()
+
+    def _bucket(self, domain: str) -> TokenBucket:
+        bucket = self.buckets.get(domain)
+        if bucket is None:
+            config = DOMAIN_RATE_CONFIG.get(domain, {})
+            bucket = TokenBucket(
+                rate=config.get("rate", DEFAULT_RATE) / self.processes,
+                burst=split_budget(config.get("burst", DEFAULT_BURST), self.processes, self.process_index, f"{domain} burst"),
+                max_rate=config.get("max_rate", DEFAULT_MAX_RATE) / self.processes,
+            )
+            self.buckets[domain] = bucket
+        return bucket
+
+    async def acquire(self, domain: str):
+        """Waits until a request to `domain` is allowed."""
+        bucket = self._bucket(domain)
+        while True:
+            wait = bucket.try_acquire()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def report_success(self, domain: str):
+        """Additive increase after a successful response."""
+        bucket = self._bucket(domain)
+        bucket.rate = min(bucket.max_rate, bucket.rate + RATE_INCREASE_STEP / self.processes)
+
+    def report_throttled(self, domain: str, retry_after: Optional[str] = None):
+        """Multiplicative decrease after a 429/503, plus a pause honouring Retry-After."""
+        bucket = self._bucket(domain)
+        bucket.throttled += 1
+        bucket.rate = max(MIN_RATE / self.processes, bucket.rate * RATE_DECREASE_FACTOR)
+
+        pause = parse_retry_after(retry_after)
+        if pause is None:
+            pause = DEFAULT_THROTTLE_PAUSE
+        pause = min(pause, MAX_RETRY_AFTER)
+        bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + pause)
+        # Allow a single probe request once the pause ends, then refill at the lowered rate
+        bucket.tokens = 1.0
+        bucket.updated = bucket.blocked_until
+        logger.warning(f"Throttled by {domain}: rate lowered to {bucket.rate:.2f} req/s, pausing {pause:.0f}s.")
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the current rate, pause and throttle count per domain."""
+        now = time.monotonic()
+        return {
+            domain: {
+                "rate": round(bucket.rate, 3),
+                "burst": bucket.burst,
+                "paused_for": max(0.0, round(bucket.blocked_until - now, 1)),
+                "throttled": bucket.throttled,
+            }
+            for domain, bucket in self.buckets.items()
+        }
+
+
+rate_limiter = DomainRateLimiter()
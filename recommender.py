@@ -3,10 +3,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any
+import json
 
 # Import dependencies
-from ..database.db import get_db
-from ..ai.recommender import find_similar_products 
+from ..database.db import get_db, Product
+from ..ai.vector_index import get_vector_index, search_similar_products, index_product_from_db
+from ..ai.embedding_store import store_product_embeddings, bump_embedding_version
+from ..ai.similar_cache import similar_cache
 from ..utils.logger import setup_logging
 
 router = APIRouter()
@@ -32,7 +35,9 @@ def get_similar_products(
     """
     Retrieves a list of products semantically similar to the product_id provided.
 
-    The recommendations are based on Cosine Similarity of the product embeddings.
+    The recommendations are based on Cosine Similarity of the product embeddings,
+    served from the in-process vector index (brute-force JSON comparison is only
+    used as a fallback for products without a stored embedding).
     """
     logger.info(f"Requesting top {limit} similar products for Product ID: {product_id}")
     
@@ -40,8 +45,20 @@ def get_similar_products(
         limit = 20 # Cap the limit to prevent excessive load
 
     try:
-        # Call the core recommendation logic
-        recommendations = find_similar_products(db, product_id, limit)
+        index = get_vector_index(db)
+        recommendations = similar_cache.get(product_id, limit, index.cache_generation)
+
+        if recommendations is None:
+            # Use the vector index; fall back to the core recommendation logic
+            recommendations = search_similar_products(db, index, product_id, limit)
+            if recommendations is None and index_product_from_db(db, index, product_id):
+                # Embedded after this process built its index (e.g. by the backfill)
+                similar_cache.invalidate_for_embedding(product_id, index)
+                recommendations = search_similar_products(db, index, product_id, limit)
+            if recommendations is None:
+                from ..ai.recommender import find_similar_products # Loads the embedding model; keep it off the import path
+                recommendations = find_similar_products(db, product_id, limit)
+            similar_cache.put(product_id, limit, recommendations, index.cache_generation)
 
         if not recommendations:
             logger.warning(f"No recommendations found for Product ID {product_id}.")
@@ -73,10 +90,34 @@ def refresh_product_embedding_endpoint(product_id: int, db: Session = Depends(ge
     
     try:
         update_product_embedding(db, product_id)
+
+        # Mirror the new embedding into the binary column and keep the vector index in sync
+        product = db.query(Product).filter(Product.id == product_id).first()
+        if product and product.embedding_vector:
+            vector = json.loads(product.embedding_vector)
+            store_product_embeddings(db, {product_id: vector})
+            index = get_vector_index(db)
+            index.upsert(product_id, vector)
+            # Other API processes rebuild from the database; this one is already up to date
+            new_version = bump_embedding_version(db)
+            db.commit()
+            if new_version == index.embedding_version + 1:
+                index.embedding_version = new_version
+            # Drop only the cached results this embedding change can affect
+            similar_cache.invalidate_for_embedding(product_id, index)
+
         return {"status": "success", "message": f"Embedding for Product ID {product_id} updated."}
     except Exception as e:
         logger.error(f"Failed to refresh embedding for Product ID {product_id}: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to refresh embedding. Check server logs."
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/similar-cache/stats")
+def get_similar_cache_stats() -> Dict[str, Any]:
+    """
+    Returns hit/miss counters and the hit ratio of the similar-products result cache.
+    """
+    return similar_cache.get_stats()
\ No newline at end of file
@@ -0,0 +1,246 @@
+# AI-Shopping-Assistant/app/services/scheduler.py
+
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import func, update, select, or_, and_, bindparam
+from sqlalchemy.orm import Session
+from ..database.db import Product, PricePoint, PriceAlert
+from ..utils.logger import setup_logging
+from .price_history import to_epoch
+
+logger = setup_logging(__name__)
+
+# --- Configuration (seconds unless noted) ---
+BASE_INTERVAL = int(os.getenv("SCRAPE_BASE_INTERVAL", str(3600 * 6)))
+MIN_INTERVAL = int(os.getenv("SCRAPE_MIN_INTERVAL", str(60 * 30)))
+MAX_INTERVAL = int(os.getenv("SCRAPE_MAX_INTERVAL", str(3600 * 48)))
+# How long a claimed product waits before being retried if its scrape fails
+RETRY_INTERVAL = int(os.getenv("SCRAPE_RETRY_INTERVAL", str(60 * 15)))
+SCHEDULER_BATCH_SIZE = int(os.getenv("SCHEDULER_BATCH_SIZE", "200"))
+# A claimed product is leased to its worker for this long; the worker renews the lease
+# while it works, so a crashed worker's products are reclaimed after at most this long
+SCRAPE_LEASE_SECONDS = int(os.getenv("SCRAPE_LEASE_SECONDS", "120"))
+
+# Price history window used to measure volatility (days)
+VOLATILITY_WINDOW_DAYS = 14
+# Coefficient of variation at which the interval is halved (2% price swings)
+VOLATILITY_REFERENCE = 0.02
+# Relative gap to the nearest alert target below which the interval shrinks proportionally
+PROXIMITY_REFERENCE = 0.10
+# Products nobody is watching are checked this much less often
+NO_ALERT_FACTOR = 2.0
+# Random spread so products added together don't stay in lockstep
+JITTER = 0.1
+
+
+def compute_interval(
+    current_price: Optional[float],
+    volatility: float,
+    alert_count: int,
+    nearest_target: Optional[float],
+) -> float:
+    """
+    Returns the number of seconds until a product's next scrape:
+    - volatile prices (coefficient of variation over the recent window) are checked sooner,
+    - products without active alerts are checked less often,
+    - prices close to (or below) the nearest alert target are checked much sooner.
+    """
+    interval = BASE_INTERVAL / (1.0 + volatility / VOLATILITY_REFERENCE)
+
+    if alert_count == 0:
+        interval *= NO_ALERT_FACTOR
+    elif nearest_target is not None and current_price:
+        gap = (current_price - nearest_target) / current_price
+        if gap <= 0:
+            interval = MIN_INTERVAL
+        else:
+            interval *= min(1.0, max(0.1, gap / PROXIMITY_REFERENCE))
+
+    interval *= random.uniform(1 - JITTER, 1 + JITTER)
+    return min(MAX_INTERVAL, max(MIN_INTERVAL, interval))
+
+
+class ScrapeScheduler:
+    """
+    Gives every product its own `next_scrape_at` and serves due products in batches
+    from the (indexed) column, so the worker pulls work continuously instead of
+    sweeping the whole catalog on a fixed timer.
+    Claims are leases (claimed_by, lease_expires_at), so any number of worker
+    processes can share the table without scraping the same product twice.
+    """
+
+    def __init__(self, batch_size: int = SCHEDULER_BATCH_SIZE):
+        self.batch_size = batch_size
+
+    @staticmethod
+    def _claimable(now: datetime):
+        due = (Product.next_scrape_at == None) | (Product.next_scrape_at <= now)
+        unleased = (Product.lease_expires_at == None) | (Product.lease_expires_at <= now)
+        return and_(due, unleased)
+
+    def claim_due_products(self, db: Session, worker_id: str, limit: Optional[int] = None) -> List[Product]:
+        """
+        Leases the most overdue products (never-scheduled first) to `worker_id` for
+        SCRAPE_LEASE_SECONDS and returns them as detached rows. The claim is one
+        UPDATE ... RETURNING that re-checks the lease, so concurrent workers never
+        get the same product; expired leases (crashed workers) are claimable again.
+        """
+        now = datetime.utcnow()
+        claimable = self._claimable(now)
+        # SKIP LOCKED lets PostgreSQL workers claim side by side instead of queueing
+        # on each other's rows (ignored on SQLite, where writes are serialized anyway)
+        candidates = select(Product.id).where(claimable).order_by(
+            Product.next_scrape_at.is_not(None), Product.next_scrape_at
+        ).limit(limit or self.batch_size).with_for_update(skip_locked=True)
+        products = db.scalars(
+            update(Product).where(Product.id.in_(candidates), claimable)
+            .values(claimed_by=worker_id, lease_expires_at=now + timedelta(seconds=SCRAPE_LEASE_SECONDS))
+            .returning(Product),
+            execution_options={"synchronize_session": False},
+        ).all()
+        # Detach first so the commit below doesn't expire the loaded rows
+        db.expunge_all()
+        db.commit()
+        return sorted(products, key=lambda p: (p.next_scrape_at is not None, p.next_scrape_at or now))
+
+    def lease_urls(self, db: Session, worker_id: str, urls: List[str]) -> Tuple[Dict[str, int], Set[str]]:
+        """
+        Leases the existing products behind scrape job URLs to `worker_id`, due or
+        not, so the scheduler doesn't hand them to anyone else while the job runs.
+        Returns ({url: product ID} leased, URLs whose product another worker holds).
+        URLs without a product yet are in neither.
+        """
+        if not urls:
+            return {}, set()
+        now = datetime.utcnow()
+        unleased = or_(Product.lease_expires_at == None, Product.lease_expires_at <= now, Product.claimed_by == worker_id)
+        rows = db.execute(
+            update(Product).where(Product.url.in_(urls), unleased)
+            .values(claimed_by=worker_id, lease_expires_at=now + timedelta(seconds=SCRAPE_LEASE_SECONDS))
+            .returning(Product.url, Product.id),
+            execution_options={"synchronize_session": False},
+        ).all()
+        leased = {url: product_id for url, product_id in rows}
+        busy = {url for (url,) in db.query(Product.url).filter(Product.url.in_(urls)).all()} - set(leased)
+        db.commit()
+        return leased, busy
+
+    def renew_leases(self, db: Session, worker_id: str, product_ids: List[int]) -> int:
+        """Extends this worker's leases on the given products. Returns how many it still held."""
+        if not product_ids:
+            return 0
+        result = db.execute(
+            update(Product).where(Product.id.in_(product_ids), Product.claimed_by == worker_id)
+            .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=SCRAPE_LEASE_SECONDS)),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+        return result.rowcount
+
+    def release_failed(self, db: Session, worker_id: str, product_ids: List[int]):
+        """
+        Releases products whose scrape failed and retries them after RETRY_INTERVAL
+        (rather than immediately, which would hammer a failing store).
+        """
+        if not product_ids:
+            return
+        db.execute(
+            update(Product).where(Product.id.in_(product_ids), Product.claimed_by == worker_id)
+            .values(claimed_by=None, lease_expires_at=None, next_scrape_at=datetime.utcnow() + timedelta(seconds=RETRY_INTERVAL)),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+
+    def get_overdue_seconds(self, products: List[Product]) -> float:
+        """How far behind schedule the most overdue product of a batch is."""
+        now = datetime.utcnow()
+        # Claimed products are detached copies, so this is still their original due time
+        due_times = [p.next_scrape_at for p in products if p.next_scrape_at is not None]
+        if not due_times:
+            return 0.0
+        return max(0.0, (now - min(due_times)).total_seconds())
+
+    def seconds_until_next_due(self, db: Session) -> Optional[float]:
+        """
+        Seconds until the next product becomes claimable (None when there are no
+        products). Products leased by other workers count from their lease expiry.
+        """
+        now = datetime.utcnow()
+        unleased = (Product.lease_expires_at == None) | (Product.lease_expires_at <= now)
+        if db.query(Product.id).filter(Product.next_scrape_at == None, unleased).first():
+            return 0.0
+        candidates = [
+            db.query(func.min(Product.next_scrape_at)).filter(unleased).scalar(),
+            db.query(func.min(Product.lease_expires_at)).filter(Product.lease_expires_at > now).scalar(),
+        ]
+        candidates = [at for at in candidates if at is not None]
+        if not candidates:
+            return None
+        return max(0.0, (min(candidates) - now).total_seconds())
+
+    def reschedule(self, db: Session, worker_id: str, product_ids: List[int]) -> Dict[int, datetime]:
+        """
+        Computes and stores next_scrape_at for the given products using three grouped
+        queries (prices, price history stats, active alert stats) and one executemany
+        UPDATE, which also releases their leases. Products leased to another worker
+        in the meantime (this worker's lease expired) are left to that worker.
+        """
+        if not product_ids:
+            return {}
+
+        prices = dict(db.query(Product.id, Product.current_price).filter(Product.id.in_(product_ids)).all())
+
+        since = datetime.utcnow() - timedelta(days=VOLATILITY_WINDOW_DAYS)
+        # Integer cents: the coefficient of variation doesn't depend on the unit
+        history_rows = db.query(
+            PricePoint.product_id,
+            func.count(PricePoint.price_cents),
+            func.avg(PricePoint.price_cents),
+            func.avg(PricePoint.price_cents * PricePoint.price_cents),
+        ).filter(
+            PricePoint.product_id.in_(product_ids),
+            PricePoint.ts >= to_epoch(since),
+        ).group_by(PricePoint.product_id).all()
+
+        volatility = {}
+        for product_id, count, mean, mean_sq in history_rows:
+            if count and count > 1 and mean:
+                mean, mean_sq = float(mean), float(mean_sq) # avg() of integers is NUMERIC on PostgreSQL
+                variance = max(0.0, mean_sq - mean * mean)
+                volatility[product_id] = variance ** 0.5 / mean
+
+        alert_rows = db.query(
+            PriceAlert.product_id,
+            func.count(PriceAlert.id),
+            func.max(PriceAlert.target_price),
+        ).filter(
+            PriceAlert.product_id.in_(product_ids),
+            PriceAlert.active == True,
+        ).group_by(PriceAlert.product_id).all()
+        alerts = {product_id: (count, nearest) for product_id, count, nearest in alert_rows}
+
+        now = datetime.utcnow()
+        schedule = {}
+        for product_id in prices:
+            alert_count, nearest_target = alerts.get(product_id, (0, None))
+            interval = compute_interval(prices[product_id], volatility.get(product_id, 0.0), alert_count, nearest_target)
+            schedule[product_id] = now + timedelta(seconds=interval)
+
+        if schedule:
+            # Core UPDATE (not the ORM bulk-by-primary-key form) so the owner check can be in the WHERE
+            products = Product.__table__
+            db.execute(
+                update(products).where(
+                    products.c.id == bindparam("product_id"),
+                    or_(products.c.claimed_by == worker_id, products.c.claimed_by == None),
+                ).values(next_scrape_at=bindparam("at"), claimed_by=None, lease_expires_at=None),
+                [{"product_id": pid, "at": at} for pid, at in schedule.items()],
+            )
+        db.commit()
+        logger.info(f"Rescheduled {len(schedule)} products.")
+        return schedule
+
+
+scrape_scheduler = ScrapeScheduler()
@@ -0,0 +1,132 @@
+# AI-Shopping-Assistant/app/services/scrape_engine.py
+
+import os
+import time
+import asyncio
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+from ..utils.logger import setup_logging
+from .affiliate import affiliate_service
+from .rate_limiter import split_budget
+
+logger = setup_logging(__name__)
+
+# --- Configuration (Overridable through environment variables / .env) ---
+# Total number of scrapes allowed in flight at once across all stores
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "32"))
+# Maximum number of simultaneous scrapes against a single store domain
+SCRAPE_PER_STORE_CONCURRENCY = int(os.getenv("SCRAPE_PER_STORE_CONCURRENCY", "4"))
+
+
+class ScrapeEngine:
+    """
+    Runs scrape tasks concurrently with a global concurrency budget and a
+    per-store budget, so one cycle takes roughly
+    (products / concurrency) * average scrape latency instead of
+    products * average scrape latency.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = SCRAPE_CONCURRENCY,
+        per_store_concurrency: int = SCRAPE_PER_STORE_CONCURRENCY,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.per_store_budget = max(1, per_store_concurrency)
+        self.per_store_concurrency = self.per_store_budget
+        # Semaphores are created lazily inside run() so they bind to the running loop
+        self._global_limit: Optional[asyncio.Semaphore] = None
+        self._store_limits: Dict[str, asyncio.Semaphore] = {}
+        logger.info(
+            f"ScrapeEngine initialized (global={self.concurrency}, per_store={self.per_store_concurrency})."
+        )
+
+    def set_processes(self, processes: int, index: int = 0):
+        """
+        Splits the per-store budget between `processes` worker processes on this host
+        (worker.py --processes; `index` is this one's position) with split_budget():
+        the shares add up to SCRAPE_PER_STORE_CONCURRENCY unless there are more
+        processes than that, in which case each still runs 1. The global budget
+        stays per process. Call before run().
+        """
+        self.per_store_concurrency = split_budget(self.per_store_budget, processes, index, "per-store concurrency")
+        self._store_limits = {}
+
+    def get_store_key(self, product: Any) -> str:
+        """
+        Returns the key used for per-store limiting. The URL domain is preferred
+        (it matches AFFILIATE_CONFIG keys); the free-text store name is the fallback.
+        """
+        domain = affiliate_service.get_domain(getattr(product, "url", "") or "")
+        if domain:
+            return domain.lower()
+        return (getattr(product, "store", None) or "unknown").strip().lower()
+
+    def _store_limit(self, key: str) -> asyncio.Semaphore:
+        limit = self._store_limits.get(key)
+        if limit is None:
+            limit = asyncio.Semaphore(self.per_store_concurrency)
+            self._store_limits[key] = limit
+        return limit
+
+    async def _run_one(self, product: Any, task: Callable[[Any], Awaitable[Any]], stats: Dict[str, Any]):
+        key = self.get_store_key(product)
+        # Take the store slot first so a slow store cannot hog global slots while queued
+        async with self._store_limit(key):
+            async with self._global_limit:
+                try:
+                    await task(product)
+                    stats["succeeded"] += 1
+                except Exception as e:
+                    stats["failed"] += 1
+                    logger.error(f"Scrape task failed for Product ID {getattr(product, 'id', '?')}: {e}")
+                finally:
+                    stats["per_store"][key] += 1
+
+    async def run(
+        self,
+        products: Iterable[Any],
+        task: Callable[[Any], Awaitable[Any]],
+        interval: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Runs `task(product)` for every product within the concurrency limits and
+        returns the cycle statistics. If `interval` is given, a warning is logged
+        when the cycle takes longer than that budget.
+        """
+        self._global_limit = asyncio.Semaphore(self.concurrency)
+        self._store_limits = {}
+
+        stats: Dict[str, Any] = {
+            "total": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "per_store": defaultdict(int),
+        }
+
+        started = time.perf_counter()
+        coros = [self._run_one(product, task, stats) for product in products]
+        stats["total"] = len(coros)
+        if coros:
+            await asyncio.gather(*coros)
+        elapsed = time.perf_counter() - started
+
+        stats["per_store"] = dict(stats["per_store"])
+        stats["duration_seconds"] = elapsed
+        stats["products_per_second"] = stats["total"] / elapsed if elapsed > 0 else 0.0
+        stats["overrun"] = interval is not None and elapsed > interval
+
+        logger.info(
+            f"Scrape cycle: {stats['total']} products in {elapsed:.1f}s "
+            f"({stats['products_per_second']:.2f} products/sec, "
+            f"{stats['succeeded']} ok, {stats['failed']} failed, {len(stats['per_store'])} stores)."
+        )
+        if stats["overrun"]:
+            logger.warning(
+                f"Scrape cycle overran its interval: took {elapsed:.1f}s, budget is {interval:.0f}s. "
+                f"Consider raising SCRAPE_CONCURRENCY (currently {self.concurrency})."
+            )
+        return stats
+
+
+scrape_engine = ScrapeEngine()
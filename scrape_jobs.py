@@ -0,0 +1,146 @@
+# AI-Shopping-Assistant/app/services/scrape_jobs.py
+
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from sqlalchemy import update, delete, select, or_, and_, exists
+from sqlalchemy.orm import Session
+from ..database.db import ScrapeJob, Product
+from ..utils.logger import setup_logging
+from .bulk_import import dialect_insert
+
+logger = setup_logging(__name__)
+
+# --- Configuration ---
+# Jobs the worker claims per cycle
+SCRAPE_JOB_BATCH = int(os.getenv("SCRAPE_JOB_BATCH", "50"))
+# How often an idle worker checks for submitted jobs (seconds)
+SCRAPE_JOB_POLL_INTERVAL = float(os.getenv("SCRAPE_JOB_POLL_INTERVAL", "1.0"))
+# A running job older than this is assumed lost (worker crashed) and is claimed again...
+SCRAPE_JOB_TIMEOUT = int(os.getenv("SCRAPE_JOB_TIMEOUT", "600"))
+# ...up to this many attempts, after which it is marked failed
+SCRAPE_JOB_MAX_ATTEMPTS = int(os.getenv("SCRAPE_JOB_MAX_ATTEMPTS", "3"))
+# Finished jobs are kept this long for status polling
+SCRAPE_JOB_RETENTION_DAYS = int(os.getenv("SCRAPE_JOB_RETENTION_DAYS", "7"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class ClaimedJob(NamedTuple):
+    id: int
+    url: str
+    product_name: Optional[str]
+    store: Optional[str]
+
+
+def submit_scrape_job(db: Session, url: str, product_name: str, store: str) -> Tuple[int, bool]:
+    """
+    Queues a scrape of `url` and returns (job ID, created). If a job for the URL is
+    already queued or running, no new job is created and its ID is returned, so
+    duplicate submissions share one fetch.
+    """
+    active = ScrapeJob.status.in_(ACTIVE_STATUSES)
+    for _ in range(3): # The in-flight job may finish between the insert and the lookup
+        stmt = dialect_insert(db)(ScrapeJob).values(
+            url=url, product_name=product_name, store=store, status="queued", attempts=0, created_at=datetime.utcnow(),
+        )
+        stmt = stmt.on_conflict_do_nothing(index_elements=[ScrapeJob.url], index_where=active).returning(ScrapeJob.id)
+        job_id = db.execute(stmt).scalar()
+        if job_id is not None:
+            db.commit()
+            logger.info(f"Queued scrape job {job_id} for {url}.")
+            return job_id, True
+        job_id = db.query(ScrapeJob.id).filter(ScrapeJob.url == url, active).scalar()
+        db.commit()
+        if job_id is not None:
+            logger.info(f"Scrape of {url} already in flight as job {job_id}; coalesced.")
+            return job_id, False
+    raise RuntimeError(f"Could not queue a scrape job for {url}.")
+
+
+def get_scrape_job(db: Session, job_id: int) -> Optional[Dict[str, Any]]:
+    job = db.get(ScrapeJob, job_id)
+    if job is None:
+        return None
+    return {
+        "job_id": job.id,
+        "url": job.url,
+        "status": job.status,
+        "attempts": job.attempts,
+        "product_id": job.product_id,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def has_queued_jobs(db: Session) -> bool:
+    return db.query(ScrapeJob.id).filter(ScrapeJob.status == "queued").first() is not None
+
+
+def claim_scrape_jobs(db: Session, limit: int = SCRAPE_JOB_BATCH) -> List[ClaimedJob]:
+    """
+    Atomically moves up to `limit` jobs (oldest first) to "running" and returns
+    them. Jobs left running past SCRAPE_JOB_TIMEOUT are claimed again, or failed
+    once they have used up SCRAPE_JOB_MAX_ATTEMPTS. Jobs for a product some worker
+    currently holds a lease on wait until that scrape is over.
+    """
+    now = datetime.utcnow()
+    stale = and_(ScrapeJob.status == "running", ScrapeJob.started_at < now - timedelta(seconds=SCRAPE_JOB_TIMEOUT))
+    db.execute(
+        update(ScrapeJob).where(stale, ScrapeJob.attempts >= SCRAPE_JOB_MAX_ATTEMPTS)
+        .values(status="failed", error="Timed out.", finished_at=now),
+        execution_options={"synchronize_session": False},
+    )
+
+    leased = exists().where(Product.url == ScrapeJob.url, Product.lease_expires_at > now)
+    claimable = and_(or_(ScrapeJob.status == "queued", stale), ~leased)
+    # SKIP LOCKED lets several PostgreSQL workers claim side by side (ignored on SQLite,
+    # where the UPDATE itself is serialized)
+    candidates = select(ScrapeJob.id).where(claimable).order_by(ScrapeJob.id).limit(limit).with_for_update(skip_locked=True)
+    rows = db.execute(
+        update(ScrapeJob).where(ScrapeJob.id.in_(candidates), claimable)
+        .values(status="running", started_at=now, attempts=ScrapeJob.attempts + 1)
+        .returning(ScrapeJob.id, ScrapeJob.url, ScrapeJob.product_name, ScrapeJob.store),
+        execution_options={"synchronize_session": False},
+    ).all()
+    db.commit()
+    return sorted(ClaimedJob(*row) for row in rows)
+
+
+def requeue_scrape_jobs(db: Session, job_ids: List[int]):
+    """Puts claimed jobs back in the queue without using up an attempt."""
+    if not job_ids:
+        return
+    db.execute(
+        update(ScrapeJob).where(ScrapeJob.id.in_(job_ids), ScrapeJob.status == "running")
+        .values(status="queued", started_at=None, attempts=ScrapeJob.attempts - 1),
+        execution_options={"synchronize_session": False},
+    )
+    db.commit()
+
+
+def finish_scrape_jobs(db: Session, outcomes: List[Dict[str, Any]]):
+    """
+    Records finished jobs with one executemany UPDATE. Each outcome is
+    {"id", "status" ("done"/"failed"), "product_id", "error"}.
+    """
+    if not outcomes:
+        return
+    now = datetime.utcnow()
+    db.execute(update(ScrapeJob), [{**outcome, "finished_at": now} for outcome in outcomes])
+    db.commit()
+
+
+def prune_finished_jobs(db: Session) -> int:
+    """Deletes finished jobs older than SCRAPE_JOB_RETENTION_DAYS."""
+    cutoff = datetime.utcnow() - timedelta(days=SCRAPE_JOB_RETENTION_DAYS)
+    result = db.execute(
+        delete(ScrapeJob).where(ScrapeJob.status.in_(("done", "failed")), ScrapeJob.finished_at < cutoff),
+        execution_options={"synchronize_session": False},
+    )
+    db.commit()
+    if result.rowcount:
+        logger.info(f"Pruned {result.rowcount} finished scrape jobs.")
+    return result.rowcount
@@ -0,0 +1,236 @@
+# AI-Shopping-Assistant/app/services/scrape_writer.py
+
+import os
+import time
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import update
+from ..database.db import SessionLocal, Product
+from ..utils.logger import setup_logging
+from .bulk_import import dialect_insert
+from .catalog_version import bump_catalog_version
+from .price_history import write_price_points
+from .db_executor import run_db
+
+logger = setup_logging(__name__)
+
+# --- Configuration ---
+# Buffered outcomes are written once this many products are pending...
+SCRAPE_WRITE_BATCH_SIZE = int(os.getenv("SCRAPE_WRITE_BATCH_SIZE", "200"))
+# ...or at least this often (seconds)
+SCRAPE_WRITE_FLUSH_INTERVAL = float(os.getenv("SCRAPE_WRITE_FLUSH_INTERVAL", "1.0"))
+
+
+class ScrapeWriteError(Exception):
+    """Raised by flush() when the batch could not be written (the updates stay buffered for a retry)."""
+
+
+class ScrapeResultWriter:
+    """
+    Write-behind buffer for scrape outcomes. Concurrent scrapes record their
+    results here instead of committing one by one; a flush writes everything
+    pending in a single transaction:
+    - one executemany UPDATE for existing products (price, last_scraped, validators),
+    - one INSERT ... ON CONFLICT DO NOTHING for newly scraped products,
+    - one INSERT of price history points (price_points), recorded only on a price change.
+    Flushes happen when SCRAPE_WRITE_BATCH_SIZE products are pending, every
+    SCRAPE_WRITE_FLUSH_INTERVAL seconds, and on an explicit flush()/stop().
+    """
+
+    def __init__(self, batch_size: int = SCRAPE_WRITE_BATCH_SIZE, flush_interval: float = SCRAPE_WRITE_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._updates: Dict[int, Dict[str, Any]] = {}
+        self._history: List[Dict[str, Any]] = []
+        # url -> (product row, futures waiting for the new ID)
+        self._new: Dict[str, Tuple[Dict[str, Any], List[asyncio.Future]]] = {}
+        # Updates taken by the flush currently being written (still not visible in the database)
+        self._writing: Dict[int, Dict[str, Any]] = {}
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._batch_flush: Optional[asyncio.Task] = None
+        self.metrics = {"flushes": 0, "products_written": 0, "history_rows": 0, "failed_flushes": 0}
+        self._flush_seconds: List[float] = []
+
+    # --- Recording ---
+
+    def _pending(self) -> int:
+        return len(self._updates) + len(self._new)
+
+    def _after_record(self):
+        loop = asyncio.get_running_loop()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = loop.create_task(self._flush_periodically())
+        if self._pending() >= self.batch_size and (self._batch_flush is None or self._batch_flush.done()):
+            self._batch_flush = loop.create_task(self.flush())
+            self._batch_flush.add_done_callback(self._log_task_error)
+
+    @staticmethod
+    def _log_task_error(task: asyncio.Task):
+        # A failed write is already logged by flush()
+        if not task.cancelled() and task.exception() is not None and not isinstance(task.exception(), ScrapeWriteError):
+            logger.error(f"Background scrape result flush failed: {task.exception()}")
+
+    def pending_price(self, product_id: int) -> Optional[float]:
+        """
+        The price recorded for a product but not yet written to the database, if
+        any. Compare new prices against this before the stored row, or a second
+        scrape before the flush records the same change twice.
+        """
+        for buffered in (self._updates, self._writing):
+            row = buffered.get(product_id)
+            if row is not None and "current_price" in row:
+                return row["current_price"]
+        return None
+
+    def record_update(self, product_id: int, fields: Dict[str, Any], new_price: Optional[float] = None):
+        """
+        Buffers column updates for an existing product (later calls for the same
+        product merge over earlier ones). Pass new_price only when the price moved;
+        that appends a price point.
+        """
+        row = self._updates.setdefault(product_id, {"id": product_id})
+        row.update(fields)
+        if new_price is not None:
+            row["current_price"] = new_price
+            self._history.append({"product_id": product_id, "price": new_price, "timestamp": fields.get("last_scraped") or datetime.utcnow()})
+        self._after_record()
+
+    async def add_product(self, fields: Dict[str, Any]) -> int:
+        """Buffers a newly scraped product and waits for the flush that assigns its ID."""
+        future = asyncio.get_running_loop().create_future()
+        url = fields["url"]
+        if url in self._new:
+            self._new[url][1].append(future) # Same URL scraped twice before a flush
+        else:
+            self._new[url] = (dict(fields), [future])
+        self._after_record()
+        return await future
+
+    # --- Flushing ---
+
+    async def _flush_periodically(self):
+        while self._pending() or self._history:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except ScrapeWriteError:
+                pass # Retried on the next tick
+
+    async def flush(self) -> int:
+        """
+        Writes everything buffered so far. Returns the number of products written.
+        Raises ScrapeWriteError when the write fails; updates are kept for the next
+        flush, while new products fail (their add_product() calls raise).
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not (self._updates or self._new or self._history):
+                return 0
+            updates, history, new = self._updates, self._history, self._new
+            self._updates, self._history, self._new = {}, [], {}
+            self._writing = updates
+
+            started = time.perf_counter()
+            try:
+                new_ids, history_rows = await run_db(self._write, list(updates.values()), history, new)
+            except Exception as e:
+                self.metrics["failed_flushes"] += 1
+                logger.error(f"Flushing {len(updates) + len(new)} scrape results failed: {e}")
+                # Keep the updates for the next flush unless a newer result superseded them
+                for product_id, row in updates.items():
+                    self._updates.setdefault(product_id, row)
+                self._history = history + self._history
+                for _, futures in new.values():
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(e)
+                raise ScrapeWriteError(str(e)) from e
+            finally:
+                self._writing = {}
+
+            for url, (_, futures) in new.items():
+                for future in futures:
+                    if not future.done():
+                        future.set_result(new_ids[url])
+
+            written = len(updates) + len(new)
+            self.metrics["flushes"] += 1
+            self.metrics["products_written"] += written
+            self.metrics["history_rows"] += history_rows
+            self._flush_seconds = (self._flush_seconds + [time.perf_counter() - started])[-100:]
+            logger.debug(f"Flushed {written} scrape results and {history_rows} history rows.")
+            return written
+
+    def _write(self, updates: List[Dict[str, Any]], history: List[Dict[str, Any]], new: Dict[str, Tuple[Dict[str, Any], list]]) -> Tuple[Dict[str, int], int]:
+        """One transaction for the whole batch (runs on the DB executor). Returns (new IDs by URL, history rows written)."""
+        db = SessionLocal()
+        try:
+            if updates:
+                db.execute(update(Product), updates)
+
+            new_ids: Dict[str, int] = {}
+            if new:
+                stmt = dialect_insert(db)(Product).values([row for row, _ in new.values()])
+                stmt = stmt.on_conflict_do_nothing(index_elements=[Product.url]).returning(Product.id, Product.url)
+                inserted = {url: product_id for product_id, url in db.execute(stmt)}
+                new_ids.update(inserted)
+                history = history + [
+                    {"product_id": inserted[url], "price": row["current_price"], "timestamp": row["last_scraped"]}
+                    for url, (row, _) in new.items() if url in inserted
+                ]
+
+                missing = [url for url in new if url not in inserted]
+                if missing: # Added by someone else since the scrape started: update it instead
+                    existing = db.query(Product.url, Product.id, Product.current_price).filter(Product.url.in_(missing)).all()
+                    late_updates = []
+                    for url, product_id, old_price in existing:
+                        row = new[url][0]
+                        new_ids[url] = product_id
+                        late_updates.append({
+                            "id": product_id,
+                            **{k: v for k, v in row.items() if k not in ("url", "name", "store")},
+                        })
+                        if old_price != row["current_price"]:
+                            history.append({"product_id": product_id, "price": row["current_price"], "timestamp": row["last_scraped"]})
+                    if late_updates:
+                        db.execute(update(Product), late_updates)
+
+            if history:
+                write_price_points(db, history)
+            if new_ids or history:
+                # Only new products and price changes alter the listing. Flushes that just
+                # touch last_scraped/validators (e.g. after a 304) leave the ETag valid,
+                # and keep the hot catalog_state row out of most scrape transactions.
+                bump_catalog_version(db)
+            db.commit()
+            return new_ids, len(history)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def stop(self):
+        """Flushes what's left (call on shutdown)."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        if self._batch_flush is not None:
+            await asyncio.gather(self._batch_flush, return_exceptions=True)
+            self._batch_flush = None
+        try:
+            await self.flush()
+        except ScrapeWriteError:
+            logger.error(f"Dropping {self._pending()} unwritten scrape results on shutdown.")
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self.metrics)
+        stats["pending"] = self._pending()
+        stats["avg_flush_ms"] = round(1000 * sum(self._flush_seconds) / len(self._flush_seconds), 2) if self._flush_seconds else None
+        return stats
+
+
+scrape_writer = ScrapeResultWriter()
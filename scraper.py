@@ -2,15 +2,28 @@
 
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel, HttpUrl
-from typing import List, Optional
+from typing import List, NamedTuple, Optional
 import asyncio # Used for async operations simulation
+import hashlib
+import time
+import httpx
+from datetime import datetime
 from ..utils.logger import setup_logging
 from ..services.proxy_service import proxy_service # Import our proxy manager
+from ..services.http_client import http_client_pool # Pooled async HTTP clients (one per proxy)
+from ..services.extractors import extract_price_async # Per-store price extraction
+from ..services.rate_limiter import rate_limiter # Per-domain adaptive request shaping
+from ..services.affiliate import affiliate_service
+from ..services.scrape_writer import scrape_writer # Write-behind buffer for scrape results and PriceHistory
+from ..services.db_executor import run_db # Blocking DB calls run off the event loop
+from ..services.loop_monitor import loop_lag_monitor
+from ..services.scrape_jobs import submit_scrape_job, get_scrape_job # Durable queue consumed by worker.py
 from ..database.db import get_db, SessionLocal
 from ..database.db import Product
 from sqlalchemy.orm import Session
 
-router = APIRouter()
+# The loop lag monitor runs for the lifetime of the API process
+router = APIRouter(on_startup=[loop_lag_monitor.start], on_shutdown=[loop_lag_monitor.stop])
 logger = setup_logging(__name__)
 
 # --- Request Schema for Scraper ---
@@ -21,93 +34,210 @@ class ScrapingRequest(BaseModel):
     product_name: str
     store: str
     
-class ScrapingResponse(BaseModel):
-    """Schema for the scraping response."""
-    status: str
-    message: str
+class ScrapeJobResponse(BaseModel):
+    """Schema for a queued scrape job and its outcome."""
+    job_id: int
+    url: str
+    status: str # queued / running / done / failed
+    attempts: int = 0
     product_id: Optional[int] = None
+    error: Optional[str] = None
+    coalesced: bool = False # True when the URL was already queued or running
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
     
-# --- Placeholder Scraping Function (I/O BOUND TASK) ---
+class ScrapeResult(NamedTuple):
+    product_id: int
+    price_changed: bool
 
-# In a real app, this function would live in a service file (e.g., app/services/scraper.py)
-# and use libraries like httpx and beautifulsoup4.
+# Responses that mean the proxy's IP is blocked or throttled (counts against its health)
+PROXY_BLOCK_STATUSES = {403, 407, 429, 503}
+# Responses that mean the store wants us to slow down (shrinks the domain's request rate)
+THROTTLE_STATUSES = {429, 503}
 
-async def perform_scraping_task(db: Session, request: ScrapingRequest, proxy_dict: Optional[dict]):
+# --- Conditional GET Helpers ---
+
+def build_conditional_headers(product: Optional[Product]) -> dict:
+    """Builds If-None-Match / If-Modified-Since headers from the product's cached validators."""
+    headers = {}
+    if product is None:
+        return headers
+    if product.etag:
+        headers["If-None-Match"] = product.etag
+    if product.last_modified:
+        headers["If-Modified-Since"] = product.last_modified
+    return headers
+
+def find_product_by_url(db: Session, url: str) -> Optional[Product]:
+    return db.query(Product).filter(Product.url == url).first()
+
+def cache_validator_fields(product: Optional[Product], response, content_hash: Optional[str] = None) -> dict:
+    """The response's ETag/Last-Modified (and the body hash) as product column values."""
+    fields = {
+        "etag": response.headers.get("ETag", product.etag if product else None),
+        "last_modified": response.headers.get("Last-Modified", product.last_modified if product else None),
+    }
+    if content_hash:
+        fields["content_hash"] = content_hash
+    return fields
+
+def mark_product_unchanged(product: Product, response=None):
+    """
+    Records that an unchanged page was checked. Only last_scraped (and refreshed
+    validators) are written; the price and PriceHistory are left alone.
     """
-    Simulates the actual web scraping process. Since this is a blocking
-    I/O operation, FastAPI will automatically run it in a thread pool.
+    fields = {"last_scraped": datetime.utcnow()}
+    if response is not None:
+        fields.update(cache_validator_fields(product, response))
+    scrape_writer.record_update(product.id, fields)
+
+# --- Scraping Function (I/O BOUND TASK) ---
+
+async def scrape_and_record(db: Session, request: ScrapingRequest, proxy_dict: Optional[dict]) -> ScrapeResult:
+    """
+    Fetches the product page through the pooled async HTTP client for the chosen
+    proxy (reusing keep-alive connections) and records the extracted price.
+    Fetches are conditional on the stored ETag/Last-Modified, and a 304 or an
+    identical body hash skips parsing and the price update.
+    Results go to the write-behind scrape_writer rather than being committed here;
+    only a new product waits for the flush that assigns its ID.
     """
     url = str(request.url)
     logger.info(f"Starting scrape for {url} using proxy: {proxy_dict is not None}")
     
-    # 1. Simulate the work (fetching and parsing)
-    await asyncio.sleep(2) # Simulate network latency and processing time
+    # Check if product exists (simplified logic); its cached validators make the fetch conditional
+    product = await run_db(find_product_by_url, db, url)
 
-    # 2. Simulate Success and Data Extraction
-    # In a real scenario, this price would be parsed from the HTML
-    simulated_price = 150.0 + (hash(url) % 500) / 100.0 # Creates a "random" price
-    
-    # 3. Save to Database
-    # Check if product exists (simplified logic)
-    product = db.query(Product).filter(Product.url == url).first()
+    # 1. Fetch the page over a pooled connection, feeding the outcome into the proxy's health score
+    #    and the store's rate limit
+    domain = affiliate_service.get_domain(url).lower()
+    await rate_limiter.acquire(domain)
+    proxy_url = proxy_dict.get('http://') if proxy_dict else None
+    started = time.perf_counter()
+    try:
+        response = await http_client_pool.fetch(url, proxy_dict, headers=build_conditional_headers(product))
+    except httpx.TransportError:
+        proxy_service.report_failure(proxy_url)
+        raise
 
+    if response.status_code in PROXY_BLOCK_STATUSES:
+        proxy_service.report_failure(proxy_url)
+    else:
+        proxy_service.report_success(proxy_url, time.perf_counter() - started)
+
+    if response.status_code in THROTTLE_STATUSES:
+        rate_limiter.report_throttled(domain, response.headers.get("Retry-After"))
+    else:
+        rate_limiter.report_success(domain)
+
+    if response.status_code == 304 and product:
+        # Page unchanged since the last scrape: skip parsing and the price update
+        mark_product_unchanged(product)
+        logger.info(f"Product ID {product.id} not modified (304), skipping parse.")
+        return ScrapeResult(product.id, False)
+
+    response.raise_for_status()
+    content_hash = hashlib.blake2b(response.content, digest_size=16).hexdigest()
+
+    if product and product.content_hash == content_hash:
+        # Server ignored the validators but the body is byte-identical
+        mark_product_unchanged(product, response)
+        logger.info(f"Product ID {product.id} content unchanged, skipping parse.")
+        return ScrapeResult(product.id, False)
+
+    # 2. Data Extraction (structured-data pre-scan inline, DOM parsing in the process pool)
+    price = await extract_price_async(url, response.text)
+    if price is None:
+        raise ValueError(f"Could not extract a price from {url}")
+    
+    # 3. Save to Database (buffered; PriceHistory only gets a row when the price moved)
+    fields = {"last_scraped": datetime.utcnow(), **cache_validator_fields(product, response, content_hash)}
     if product:
         # Update existing product
-        product.current_price = simulated_price
-        product.last_scraped = datetime.utcnow()
-        db.commit()
-        db.refresh(product)
-        logger.info(f"Updated price for Product ID {product.id} to ${simulated_price:.2f}")
-    else:
-        # Create new product
-        new_product = Product(
-            name=request.product_name,
-            url=url,
-            store=request.store,
-            current_price=simulated_price
-        )
-        db.add(new_product)
-        db.commit()
-        db.refresh(new_product)
-        product = new_product
-        logger.info(f"New product scraped and created: ID {product.id}")
-
-    return product.id
+        # Compare with a price still waiting in the write buffer, if any, before the stored one
+        previous_price = scrape_writer.pending_price(product.id)
+        if previous_price is None:
+            previous_price = product.current_price
+        price_changed = price != previous_price
+        scrape_writer.record_update(product.id, fields, new_price=price if price_changed else None)
+        logger.info(f"Updated price for Product ID {product.id} to ${price:.2f}")
+        return ScrapeResult(product.id, price_changed)
+
+    # Create new product
+    product_id = await scrape_writer.add_product({
+        "name": request.product_name,
+        "url": url,
+        "store": request.store,
+        "current_price": price,
+        **fields,
+    })
+    logger.info(f"New product scraped and created: ID {product_id}")
+    return ScrapeResult(product_id, True)
 
 # --- FastAPI Endpoint ---
 
-@router.post("/trigger", response_model=ScrapingResponse)
+@router.post("/trigger", response_model=ScrapeJobResponse, status_code=202)
 async def trigger_scrape(
     request: ScrapingRequest, 
     db: Session = Depends(get_db)
 ):
     """
-    Triggers a scraping task for a specific product URL.
+    Queues a scrape of a specific product URL and returns its job immediately.
+    The worker process runs the job; poll GET /jobs/{job_id} for the result.
+    A URL that is already queued or being scraped returns the existing job.
     """
-    # 1. Get Proxy
-    proxy_dict = proxy_service.get_random_proxy()
-    
     try:
-        # 2. Execute the Scraping Task
-        # FastAPI handles running blocking synchronous code (like the HTTP request/parsing) 
-        # inside the thread pool, but our simulation uses 'await asyncio.sleep' 
-        # so we keep it async.
-        product_id = await perform_scraping_task(db, request, proxy_dict)
-        
-        return ScrapingResponse(
-            status="success",
-            message=f"Scraping completed and price updated/created for product ID {product_id}.",
-            product_id=product_id
-        )
-        
+        job_id, created = await run_db(submit_scrape_job, db, str(request.url), request.product_name, request.store)
+        job = await run_db(get_scrape_job, db, job_id)
     except Exception as e:
-        # 3. Handle Errors
-        logger.error(f"Scraping failed for {request.url}: {e}")
-        # Report the proxy failure if used
-        if proxy_dict:
-            proxy_service.report_failure(proxy_dict.get('http://'))
-            
-        raise HTTPException(
-            status_code=500,
-            detail=f"Scraping failed: Could not fetch data from {request.store}. Error: {str(e)}"
-        )
\ No newline at end of file
+        logger.error(f"Could not queue scrape for {request.url}: {e}")
+        raise HTTPException(status_code=500, detail="Could not queue the scrape job.")
+
+    return ScrapeJobResponse(**job, coalesced=not created)
+
+@router.get("/jobs/{job_id}", response_model=ScrapeJobResponse)
+async def get_scrape_job_status(job_id: int, db: Session = Depends(get_db)):
+    """
+    Returns a scrape job's status (queued / running / done / failed) and, once
+    done, the ID of the scraped product.
+    """
+    job = await run_db(get_scrape_job, db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Scrape job {job_id} not found.")
+    return ScrapeJobResponse(**job)
+
+@router.get("/http-pool")
+def get_http_pool_stats():
+    """
+    Returns the pooled HTTP client counters (client hits/misses and connection reuse).
+    """
+    return http_client_pool.get_stats()
+
+@router.get("/proxies")
+def get_proxy_stats():
+    """
+    Returns per-proxy health stats (success rate, EWMA latency, cooldown, selection weight).
+    """
+    return proxy_service.get_proxy_stats()
+
+@router.get("/write-buffer")
+def get_write_buffer_stats():
+    """
+    Returns the scrape result write-behind buffer counters (flushes, rows written, pending).
+    """
+    return scrape_writer.get_stats()
+
+@router.get("/loop-lag")
+def get_loop_lag_stats():
+    """
+    Returns event loop lag measurements (probe samples, stalls over the threshold, max lag).
+    """
+    return loop_lag_monitor.get_stats()
+
+@router.get("/rate-limits")
+def get_rate_limit_stats():
+    """
+    Returns the adaptive request rate, pause and throttle count for each store domain.
+    """
+    return rate_limiter.get_stats()
\ No newline at end of file
@@ -0,0 +1,259 @@
+# AI-Shopping-Assistant/app/ai/similar_cache.py
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from ..database.db import Product
+from ..utils.logger import setup_logging
+from .vector_index import VectorIndex, get_vector_index
+from .embedding_store import read_product_embedding
+
+logger = setup_logging(__name__)
+
+# --- Configuration ---
+SIMILAR_CACHE_MAX_ENTRIES = int(os.getenv("SIMILAR_CACHE_MAX_ENTRIES", "10000"))
+# Results include current_price, which the worker updates, so entries also expire after a while
+SIMILAR_CACHE_TTL = float(os.getenv("SIMILAR_CACHE_TTL", "300"))
+# Optional SQLite file shared by every API worker process (unset = in-process cache only)
+SIMILAR_CACHE_DISK_PATH = os.getenv("SIMILAR_CACHE_DISK_PATH")
+
+CacheKey = Tuple[int, int] # (product_id, limit)
+
+
+class _Entry:
+    __slots__ = ("results", "expires_at", "members", "min_score", "generation")
+
+    def __init__(self, results: List[Dict[str, Any]], limit: int, ttl: float, generation: str):
+        self.results = results
+        self.expires_at = time.time() + ttl
+        self.members = {r["product_id"] for r in results}
+        # A list shorter than the limit can gain any newly embedded product
+        self.min_score = min(r["similarity_score"] for r in results) if len(results) >= limit else float("-inf")
+        self.generation = generation
+
+
+class SimilarProductsCache:
+    """
+    LRU + TTL cache for /similar/{product_id} results, keyed on (product_id, limit),
+    with an optional on-disk SQLite store shared between worker processes. Entries
+    are tagged with the index's cache_generation (the same in every process serving
+    one embedding_version) and ignored once it changes.
+
+    Invalidation is embedding-aware: when product X's embedding changes, only the
+    entries whose answer can change are dropped:
+    - the entry for X itself,
+    - entries that currently list X (its score changed),
+    - entries where X's new similarity beats the entry's lowest listed score.
+    """
+
+    def __init__(self, max_entries: int = SIMILAR_CACHE_MAX_ENTRIES, ttl: float = SIMILAR_CACHE_TTL, disk_path: Optional[str] = SIMILAR_CACHE_DISK_PATH):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+        self.disk_path = disk_path
+        self._local = threading.local() # Per-thread read connection for the disk store
+        if disk_path:
+            self._init_disk()
+
+    # --- Disk Store ---
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.disk_path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _init_disk(self):
+        with self._connect() as conn:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(similar_cache)")]
+            if columns and "generation" not in columns: # Older layout (per-process build IDs); it's only a cache
+                conn.execute("DROP TABLE similar_cache")
+                conn.execute("DROP TABLE IF EXISTS similar_cache_members")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS similar_cache ("
+                " product_id INTEGER, lim INTEGER, payload TEXT, min_score REAL,"
+                " expires_at REAL, generation TEXT, PRIMARY KEY (product_id, lim))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS similar_cache_members ("
+                " member_id INTEGER, product_id INTEGER, lim INTEGER)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_similar_cache_members ON similar_cache_members (member_id)")
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _disk_still_valid(self, key: CacheKey, entry: _Entry) -> bool:
+        """
+        True if the shared store still holds this exact entry. Another process's
+        invalidation deletes the disk row, so checking it on every in-memory hit
+        keeps this process's LRU from serving results invalidated elsewhere.
+        """
+        row = self._reader().execute(
+            "SELECT expires_at FROM similar_cache WHERE product_id = ? AND lim = ?", key
+        ).fetchone()
+        return row is not None and row[0] == entry.expires_at
+
+    def _disk_get(self, key: CacheKey, generation: str) -> Optional[_Entry]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT payload, expires_at, generation FROM similar_cache WHERE product_id = ? AND lim = ?", key
+            ).fetchone()
+        if row is None or row[1] < time.time() or row[2] != generation:
+            return None
+        entry = _Entry(json.loads(row[0]), key[1], 0, generation)
+        entry.expires_at = row[1]
+        return entry
+
+    def _disk_put(self, key: CacheKey, entry: _Entry):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM similar_cache_members WHERE product_id = ? AND lim = ?", key)
+            conn.execute(
+                "INSERT OR REPLACE INTO similar_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, json.dumps(entry.results), entry.min_score, entry.expires_at, entry.generation),
+            )
+            conn.executemany(
+                "INSERT INTO similar_cache_members VALUES (?, ?, ?)",
+                [(member, *key) for member in entry.members],
+            )
+
+    def _disk_delete(self, conn: sqlite3.Connection, keys: List[CacheKey]):
+        conn.executemany("DELETE FROM similar_cache WHERE product_id = ? AND lim = ?", keys)
+        conn.executemany("DELETE FROM similar_cache_members WHERE product_id = ? AND lim = ?", keys)
+
+    # --- Lookup ---
+
+    def get(self, product_id: int, limit: int, generation: str = "") -> Optional[List[Dict[str, Any]]]:
+        key = (product_id, limit)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry.expires_at < time.time() or entry.generation != generation):
+                del self._entries[key]
+                entry = None
+        if entry is not None and (not self.disk_path or self._disk_still_valid(key, entry)):
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry.results
+        if entry is not None:
+            with self._lock:
+                self._entries.pop(key, None) # Invalidated (or replaced) by another process
+
+        if self.disk_path:
+            entry = self._disk_get(key, generation)
+            if entry is not None:
+                self._store(key, entry)
+                self.counters["disk_hits"] += 1
+                return entry.results
+
+        self.counters["misses"] += 1
+        return None
+
+    def _store(self, key: CacheKey, entry: _Entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def put(self, product_id: int, limit: int, results: List[Dict[str, Any]], generation: str = ""):
+        if not results:
+            return
+        key = (product_id, limit)
+        entry = _Entry(results, limit, self.ttl, generation)
+        self._store(key, entry)
+        if self.disk_path:
+            self._disk_put(key, entry)
+
+    # --- Invalidation ---
+
+    def _stale_keys(self, product_id: int, candidates: List[Tuple[CacheKey, float]], member_keys: set, index: VectorIndex) -> List[CacheKey]:
+        stale = [key for key, _ in candidates if key[0] == product_id or key in member_keys]
+        others = [(key, min_score) for key, min_score in candidates if key[0] != product_id and key not in member_keys]
+
+        row = index.id_to_row.get(product_id)
+        if row is None:
+            return stale # Not embedded: it can't rank into anyone's results
+        rows = [index.id_to_row.get(key[0]) for key, _ in others]
+        known = [(i, r) for i, r in enumerate(rows) if r is not None]
+        if known:
+            sims = index.matrix[[r for _, r in known]] @ index.matrix[row]
+            for (i, _), sim in zip(known, sims):
+                key, min_score = others[i]
+                if sim >= min_score:
+                    stale.append(key)
+        return stale
+
+    def invalidate_for_embedding(self, product_id: int, index: VectorIndex) -> int:
+        """
+        Drops every entry whose result can change because `product_id`'s embedding
+        changed (or it was just added). Call after the index has been updated.
+        """
+        with self._lock:
+            candidates = [(key, entry.min_score) for key, entry in self._entries.items()]
+            member_keys = {key for key, entry in self._entries.items() if product_id in entry.members}
+            stale = self._stale_keys(product_id, candidates, member_keys, index)
+            for key in stale:
+                self._entries.pop(key, None)
+        dropped = len(stale)
+
+        if self.disk_path:
+            with self._connect() as conn:
+                disk_candidates = [((pid, lim), score) for pid, lim, score in conn.execute(
+                    "SELECT product_id, lim, min_score FROM similar_cache"
+                )]
+                disk_members = {(pid, lim) for pid, lim in conn.execute(
+                    "SELECT product_id, lim FROM similar_cache_members WHERE member_id = ?", (product_id,)
+                )}
+                disk_stale = self._stale_keys(product_id, disk_candidates, disk_members, index)
+                self._disk_delete(conn, disk_stale)
+            dropped = max(dropped, len(disk_stale))
+
+        self.counters["invalidations"] += dropped
+        logger.debug(f"Invalidated {dropped} similar-product cache entries for Product ID {product_id}.")
+        return dropped
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk_path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM similar_cache")
+                conn.execute("DELETE FROM similar_cache_members")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and ratio, for sizing the cache."""
+        stats = dict(self.counters)
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        stats["entries"] = len(self._entries)
+        stats["max_entries"] = self.max_entries
+        return stats
+
+
+similar_cache = SimilarProductsCache()
+
+
+def on_product_added(db: Session, product: Product):
+    """
+    Indexes a newly added product that already carries an embedding and drops the
+    cached results it would now appear in. Products without an embedding can't be
+    recommended yet, so nothing needs invalidating for them.
+    """
+    vector = read_product_embedding(product)
+    if vector is None:
+        return
+    index = get_vector_index(db)
+    index.upsert(product.id, vector)
+    similar_cache.invalidate_for_embedding(product.id, index)
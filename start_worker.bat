@@ -8,7 +8,7 @@ echo ================================================
 echo  Starting SageMind Tech Services Worker...
 echo ================================================
 echo This process handles all background scraping and price alerts.
-echo Keep this window open. It will check prices every 6 hours.
+echo Keep this window open. Each product is re-checked on its own schedule (more often when its price moves).
 echo ------------------------------------------------
 
 rem Command to run the worker script
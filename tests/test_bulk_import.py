@@ -0,0 +1,90 @@
+# AI-Shopping-Assistant/tests/test_bulk_import.py
+
+import json
+import asyncio
+import pytest
+from fastapi import FastAPI
+from app.routes import products
+
+LINES = 20_000
+CHUNK_BYTES = 64 * 1024
+
+
+@pytest.fixture
+def app(monkeypatch):
+    def import_chunk(db, items):
+        return [{"index": index, "status": "created", "id": index + 1} for index, _ in items]
+
+    monkeypatch.setattr(products, "import_products_chunk", import_chunk)
+    app = FastAPI()
+    app.include_router(products.router, prefix="/products")
+    return app
+
+
+def ndjson_feed(lines: int) -> bytes:
+    return b"".join(
+        (json.dumps({
+            "name": f"Product {i}",
+            "url": f"https://shop.example/item/{i}",
+            "store": "Example",
+            "current_price": 9.99,
+            "description": "x" * 200,
+        }) + "\n").encode()
+        for i in range(lines)
+    )
+
+
+async def post_like_uvicorn(app, path: str, body: bytes, content_type: str):
+    """
+    Sends the body in many http.request messages and, like uvicorn, only answers
+    receive() with http.disconnect once the body is exhausted and the response is done.
+    """
+    chunks = [body[i:i + CHUNK_BYTES] for i in range(0, len(body), CHUNK_BYTES)]
+    response_done = asyncio.Event()
+    sent = {"status": None, "body": b""}
+
+    async def receive():
+        if chunks:
+            await asyncio.sleep(0)
+            chunk = chunks.pop(0)
+            return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            sent["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            sent["body"] += message.get("body", b"")
+            if not message.get("more_body", False):
+                response_done.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 50000), "server": ("testserver", 80),
+    }
+    await asyncio.wait_for(app(scope, receive, send), timeout=60)
+    return sent["status"], [json.loads(line) for line in sent["body"].splitlines()]
+
+
+def test_multi_megabyte_ndjson_upload_is_imported_completely(app):
+    body = ndjson_feed(LINES)
+    assert len(body) > 4 * 1024 * 1024
+
+    status, lines = asyncio.run(post_like_uvicorn(app, "/products/bulk", body, "application/x-ndjson"))
+
+    assert status == 200
+    assert lines[-1] == {"summary": {"created": LINES}}
+    assert [line["index"] for line in lines[:-1]] == list(range(LINES))
+
+
+def test_ndjson_reports_bad_lines_and_keeps_going(app):
+    body = ndjson_feed(3) + b"not json\n" + ndjson_feed(1)
+
+    status, lines = asyncio.run(post_like_uvicorn(app, "/products/bulk", body, "application/x-ndjson"))
+
+    assert status == 200
+    assert lines[-1] == {"summary": {"created": 4, "error": 1}}
+    assert {"index": 3, "status": "error", "detail": "Invalid JSON."} in lines
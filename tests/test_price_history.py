@@ -0,0 +1,64 @@
+# AI-Shopping-Assistant/tests/test_price_history.py
+
+import numpy as np
+import pytest
+from app.services.price_history import downsample
+
+DAY = 86400
+HOUR = 3600
+START = 1_700_006_400 # Midnight UTC
+
+
+def series(*points):
+    ts = np.array([t for t, _ in points], dtype=np.int64)
+    prices = np.array([p for _, p in points], dtype=np.float64)
+    return ts, prices
+
+
+def test_bucket_includes_the_carried_in_price_and_weights_by_time():
+    # 100 all day, dropping to 50 at 23:00
+    ts, prices = series((START + 23 * HOUR, 50.0))
+    [bucket] = downsample(ts, prices, START, START + DAY, DAY, opening_price=100.0)
+    assert bucket["min"] == 50.0
+    assert bucket["max"] == 100.0
+    assert bucket["avg"] == pytest.approx((23 * 100 + 50) / 24, abs=0.01)
+    assert bucket["last"] == 50.0
+    assert bucket["count"] == 1
+
+
+def test_each_bucket_starts_from_the_previous_buckets_last_price():
+    ts, prices = series((START + 12 * HOUR, 80.0), (START + DAY + 6 * HOUR, 60.0))
+    first, second = downsample(ts, prices, START, START + 2 * DAY, DAY, opening_price=100.0)
+    assert (first["min"], first["max"], first["avg"], first["last"]) == (80.0, 100.0, 90.0, 80.0)
+    # 80 carried in for 6 hours, then 60 for 18
+    assert (second["min"], second["max"], second["last"]) == (60.0, 80.0, 60.0)
+    assert second["avg"] == pytest.approx((6 * 80 + 18 * 60) / 24, abs=0.01)
+
+
+def test_empty_buckets_report_the_carried_price():
+    ts, prices = series((START + HOUR, 70.0))
+    buckets = downsample(ts, prices, START, START + 3 * DAY, DAY)
+    assert [b["count"] for b in buckets] == [1, 0, 0]
+    for bucket in buckets[1:]:
+        assert (bucket["min"], bucket["max"], bucket["avg"], bucket["last"]) == (70.0, 70.0, 70.0, 70.0)
+
+
+def test_time_before_the_first_known_price_is_ignored():
+    ts, prices = series((START + DAY + 12 * HOUR, 40.0))
+    buckets = downsample(ts, prices, START, START + 2 * DAY, DAY)
+    # The first day has no known price; the second only counts the 12 hours at 40
+    assert len(buckets) == 1
+    assert (buckets[0]["min"], buckets[0]["max"], buckets[0]["avg"]) == (40.0, 40.0, 40.0)
+
+
+def test_window_without_changes_uses_the_opening_price():
+    ts, prices = series()
+    buckets = downsample(ts, prices, START, START + 2 * DAY, DAY, opening_price=25.0)
+    assert [(b["avg"], b["count"]) for b in buckets] == [(25.0, 0), (25.0, 0)]
+    assert downsample(ts, prices, START, START + DAY, DAY) == []
+
+
+def test_partial_last_bucket_is_weighted_to_the_window_end():
+    ts, prices = series((START + 2 * HOUR, 20.0))
+    [bucket] = downsample(ts, prices, START, START + 4 * HOUR, DAY, opening_price=10.0)
+    assert bucket["avg"] == 15.0
@@ -0,0 +1,60 @@
+# AI-Shopping-Assistant/tests/test_similar_cache.py
+
+import numpy as np
+import pytest
+from app.ai.similar_cache import SimilarProductsCache
+from app.ai.vector_index import VectorIndex
+
+
+def result(product_id, score):
+    return {"product_id": product_id, "name": f"Product {product_id}", "similarity_score": score, "current_price": 10.0}
+
+
+@pytest.fixture
+def shared(tmp_path):
+    # Two API processes pointed at the same SIMILAR_CACHE_DISK_PATH
+    path = str(tmp_path / "similar_cache.sqlite")
+    return SimilarProductsCache(disk_path=path), SimilarProductsCache(disk_path=path)
+
+
+def index_at(version, tmp_path):
+    index = VectorIndex(directory=str(tmp_path / f"index-{version}"), backend="numpy")
+    index.embedding_version = version
+    for product_id, vector in {1: [1.0, 0.0], 2: [0.9, 0.1], 3: [0.0, 1.0]}.items():
+        index.upsert(product_id, np.array(vector, dtype=np.float32))
+    return index
+
+
+def test_generation_is_the_same_in_every_process(tmp_path):
+    assert index_at(3, tmp_path).cache_generation == index_at(3, tmp_path).cache_generation
+    assert index_at(3, tmp_path).cache_generation != index_at(4, tmp_path).cache_generation
+
+
+def test_entry_written_by_one_process_is_served_to_another(shared, tmp_path):
+    first, second = shared
+    generation = index_at(3, tmp_path).cache_generation
+    first.put(1, 2, [result(2, 0.99)], generation)
+
+    assert second.get(1, 2, generation) == [result(2, 0.99)]
+    assert second.counters["disk_hits"] == 1
+    # Served from memory afterwards
+    assert second.get(1, 2, generation) == [result(2, 0.99)]
+    assert second.counters["hits"] == 1
+
+
+def test_entry_from_another_embedding_version_is_ignored(shared, tmp_path):
+    first, second = shared
+    first.put(1, 2, [result(2, 0.99)], index_at(3, tmp_path).cache_generation)
+    assert second.get(1, 2, index_at(4, tmp_path).cache_generation) is None
+
+
+def test_invalidation_in_one_process_reaches_the_other(shared, tmp_path):
+    first, second = shared
+    index = index_at(3, tmp_path)
+    first.put(1, 2, [result(2, 0.99)], index.cache_generation)
+    assert second.get(1, 2, index.cache_generation) is not None # Now in second's memory too
+
+    first.invalidate_for_embedding(2, index) # Product 2 is listed, so the entry is stale
+
+    assert second.get(1, 2, index.cache_generation) is None
+    assert first.get(1, 2, index.cache_generation) is None
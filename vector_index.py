@@ -0,0 +1,356 @@
+# AI-Shopping-Assistant/app/ai/vector_index.py
+
+import os
+import json
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from ..database.db import Product, BASE_DIR, SessionLocal, engine
+from ..utils.logger import setup_logging
+from .embedding_store import read_embedding, read_product_embedding, read_embedding_version
+
+logger = setup_logging(__name__)
+
+# --- Configuration ---
+# "numpy" (exact, brute-force matrix product) or "hnsw" (approximate, needs hnswlib)
+VECTOR_INDEX_BACKEND = os.getenv("VECTOR_INDEX_BACKEND", "numpy").lower()
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", os.path.join(BASE_DIR, "vector_index"))
+# Incremental updates are flushed to disk at most this often (seconds)
+VECTOR_INDEX_SAVE_INTERVAL = float(os.getenv("VECTOR_INDEX_SAVE_INTERVAL", "60"))
+# How often (seconds) the API checks catalog_state.embedding_version for outside writes
+VECTOR_INDEX_VERSION_TTL = float(os.getenv("VECTOR_INDEX_VERSION_TTL", "5"))
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class VectorIndex:
+    """
+    In-process similarity index over product embeddings.
+    Vectors live in one contiguous, L2-normalized float32 matrix, so cosine
+    similarity is a single matrix-vector product and top-k uses argpartition.
+    The matrix is persisted as .npy files and memory-mapped on load, so restarts
+    don't rebuild it. An optional HNSW graph (hnswlib) keeps query latency flat
+    for very large catalogs.
+    """
+
+    def __init__(self, directory: str = VECTOR_INDEX_DIR, backend: str = VECTOR_INDEX_BACKEND):
+        self.directory = directory
+        self.backend = backend
+        if self.backend == "hnsw" and hnswlib is None:
+            logger.warning("VECTOR_INDEX_BACKEND=hnsw but hnswlib is not installed; using numpy.")
+            self.backend = "numpy"
+
+        self.dim: Optional[int] = None
+        self.size = 0
+        self.ids = np.empty(0, dtype=np.int64)
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        self.id_to_row: Dict[int, int] = {}
+        # catalog_state.embedding_version this index reflects (also keys caches of search results)
+        self.embedding_version = 0
+        self._hnsw = None
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._last_save = 0.0
+
+    # --- Building ---
+
+    def _reset(self, dim: int, capacity: int):
+        self.dim = dim
+        self.size = 0
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.matrix = np.empty((capacity, dim), dtype=np.float32)
+        self.id_to_row = {}
+        self._hnsw = None
+
+    def _grow(self, min_capacity: int):
+        capacity = max(min_capacity, 2 * len(self.ids), 1024)
+        ids = np.empty(capacity, dtype=np.int64)
+        matrix = np.empty((capacity, self.dim), dtype=np.float32)
+        ids[:self.size] = self.ids[:self.size]
+        matrix[:self.size] = self.matrix[:self.size] # Also turns a memory-mapped matrix into RAM
+        self.ids, self.matrix = ids, matrix
+        if self._hnsw is not None:
+            self._hnsw.resize_index(capacity)
+
+    def _build_hnsw(self):
+        if self.backend != "hnsw" or self.size == 0:
+            return
+        graph = hnswlib.Index(space="ip", dim=self.dim)
+        graph.init_index(max_elements=len(self.ids), ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M)
+        graph.add_items(self.matrix[:self.size], self.ids[:self.size])
+        graph.set_ef(HNSW_EF_SEARCH)
+        self._hnsw = graph
+
+    def build_from_db(self, db: Session, chunk_size: int = 5000):
+        """Rebuilds the index by streaming every product embedding from the database."""
+        started = time.perf_counter()
+        with self._lock:
+            self.dim = None
+            self.size = 0
+            rows = db.query(
+                Product.id, Product.embedding_blob, Product.embedding_dtype,
+                Product.embedding_scale, Product.embedding_vector,
+            ).filter(
+                (Product.embedding_blob != None) | (Product.embedding_vector != None)
+            ).yield_per(chunk_size)
+            for product_id, blob, dtype, scale, raw in rows:
+                vector = read_embedding(blob, dtype, scale, raw)
+                if self.dim is None:
+                    self._reset(vector.shape[0], capacity=1024)
+                self._append(product_id, vector)
+            self._build_hnsw()
+            self._dirty = True
+        logger.info(f"Vector index built with {self.size} products in {time.perf_counter() - started:.2f}s ({self.backend}).")
+
+    @property
+    def cache_generation(self) -> str:
+        """
+        Key for cached search results. Derived from the shared embedding_version, so
+        every process serving the same embeddings agrees on it (a cache shared
+        between processes stays usable) and a rebuild for a new version drops the
+        old results everywhere.
+        """
+        return f"embeddings-v{self.embedding_version}"
+
+    def _append(self, product_id: int, vector: np.ndarray):
+        if self.size == len(self.ids):
+            self._grow(self.size + 1)
+        row = self.size
+        self.ids[row] = product_id
+        self.matrix[row] = _normalize(vector)
+        self.id_to_row[product_id] = row
+        self.size += 1
+        return row
+
+    def upsert(self, product_id: int, vector) -> None:
+        """Adds or replaces one product's embedding (e.g. after refresh-embedding)."""
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self._reset(vector.shape[0], capacity=1024)
+            row = self.id_to_row.get(product_id)
+            if row is None:
+                row = self._append(product_id, vector)
+            else:
+                self.matrix[row] = _normalize(vector)
+            if self._hnsw is not None:
+                self._hnsw.add_items(self.matrix[row:row + 1], np.array([product_id]))
+            elif self.backend == "hnsw":
+                self._build_hnsw()
+            self._dirty = True
+        self.maybe_save()
+
+    # --- Querying ---
+
+    def __contains__(self, product_id: int) -> bool:
+        return product_id in self.id_to_row
+
+    def search(self, product_id: int, k: int) -> List[Tuple[int, float]]:
+        """Returns up to k (product_id, cosine similarity) pairs most similar to the product."""
+        with self._lock:
+            row = self.id_to_row.get(product_id)
+            if row is None or self.size < 2:
+                return []
+            query = self.matrix[row]
+            k = min(k, self.size - 1)
+            if k <= 0:
+                return []
+
+            if self._hnsw is not None:
+                labels, distances = self._hnsw.knn_query(query, k=min(k + 1, self.size))
+                # hnswlib "ip" distance is 1 - inner product
+                results = [(int(l), float(1.0 - d)) for l, d in zip(labels[0], distances[0]) if l != product_id]
+                return results[:k]
+
+            scores = self.matrix[:self.size] @ query
+            scores[row] = -np.inf # Exclude the product itself
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(int(self.ids[i]), float(scores[i])) for i in top]
+
+    # --- Persistence ---
+
+    def _paths(self):
+        return (
+            os.path.join(self.directory, "vectors.npy"),
+            os.path.join(self.directory, "ids.npy"),
+            os.path.join(self.directory, "meta.json"),
+        )
+
+    def save(self):
+        """Writes the index atomically; the matrix file is memory-mapped on the next load."""
+        with self._lock:
+            if self.dim is None:
+                return
+            if isinstance(self.matrix, np.memmap):
+                # Release the mapping of the file we're about to replace (required on Windows)
+                self.matrix = np.array(self.matrix)
+            os.makedirs(self.directory, exist_ok=True)
+            vectors_path, ids_path, meta_path = self._paths()
+            for path, array in ((vectors_path, self.matrix[:self.size]), (ids_path, self.ids[:self.size])):
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    np.save(f, np.ascontiguousarray(array))
+                os.replace(tmp_path, path)
+            with open(meta_path, "w") as f:
+                json.dump({"dim": self.dim, "size": self.size, "embedding_version": self.embedding_version}, f)
+            self._dirty = False
+            self._last_save = time.monotonic()
+        logger.info(f"Vector index saved ({self.size} vectors) to {self.directory}.")
+
+    def maybe_save(self):
+        """Saves if there are unsaved updates and the last save is old enough."""
+        if self._dirty and time.monotonic() - self._last_save >= VECTOR_INDEX_SAVE_INTERVAL:
+            self.save()
+
+    def load(self) -> bool:
+        """Memory-maps a previously saved index. Returns False if none exists."""
+        vectors_path, ids_path, meta_path = self._paths()
+        if not all(os.path.exists(p) for p in self._paths()):
+            return False
+        with self._lock:
+            # Copy-on-write mapping: pages load lazily and in-place updates stay private until saved
+            self.matrix = np.load(vectors_path, mmap_mode="c")
+            self.ids = np.load(ids_path)
+            self.size = len(self.ids)
+            self.dim = self.matrix.shape[1] if self.size else None
+            self.id_to_row = {int(pid): row for row, pid in enumerate(self.ids)}
+            with open(meta_path) as f:
+                meta = json.load(f)
+            self.embedding_version = meta.get("embedding_version", 0)
+            self._build_hnsw()
+            self._dirty = False
+            self._last_save = time.monotonic()
+        logger.info(f"Vector index loaded ({self.size} vectors, memory-mapped) from {self.directory}.")
+        return True
+
+
+def search_similar_products(db: Session, index: "VectorIndex", product_id: int, limit: int) -> Optional[List[Dict]]:
+    """
+    Top-k similar products from the index, joined with their rows in one query.
+    Returns None if the product isn't indexed (caller falls back to the slow path).
+    """
+    if product_id not in index:
+        return None
+    matches = index.search(product_id, limit)
+    if not matches:
+        return []
+
+    rows = db.query(Product.id, Product.name, Product.current_price).filter(
+        Product.id.in_([pid for pid, _ in matches])
+    ).all()
+    by_id = {row.id: row for row in rows}
+    return [
+        {
+            "product_id": pid,
+            "name": by_id[pid].name,
+            "similarity_score": round(score, 4),
+            "current_price": by_id[pid].current_price,
+        }
+        for pid, score in matches if pid in by_id # Skip products deleted since indexing
+    ]
+
+
+def index_product_from_db(db: Session, index: "VectorIndex", product_id: int) -> bool:
+    """
+    Adds a product that has a stored embedding but isn't in the index yet (e.g.
+    written by the backfill after this process built its index). Returns False
+    when the product has no stored embedding.
+    """
+    product = db.query(Product).filter(Product.id == product_id).first()
+    vector = read_product_embedding(product) if product else None
+    if vector is None:
+        return False
+    index.upsert(product_id, vector)
+    return True
+
+
+vector_index = VectorIndex()
+_initialized = False
+_init_lock = threading.Lock()
+_next_version_check = 0.0
+_rebuilding = False
+
+
+def init_vector_index(db: Session) -> VectorIndex:
+    """
+    Loads the persisted index, or rebuilds it when missing or out of sync with the
+    number of embedded products. Call once from the application's startup event.
+    """
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return vector_index
+        expected = db.query(Product.id).filter(
+            (Product.embedding_blob != None) | (Product.embedding_vector != None)
+        ).count()
+        version = read_embedding_version(db)
+        if not vector_index.load() or vector_index.size != expected or vector_index.embedding_version != version:
+            vector_index.build_from_db(db)
+            vector_index.embedding_version = version
+            vector_index.save()
+        _initialized = True
+    return vector_index
+
+
+def _rebuild_in_background(version: int):
+    """Builds a fresh index off the request path and swaps it in when done."""
+    global vector_index, _rebuilding
+    db = SessionLocal()
+    try:
+        index = VectorIndex()
+        index.build_from_db(db)
+        index.embedding_version = version
+        vector_index = index # Requests keep searching the old index until here
+        try:
+            index.save()
+        except OSError as e: # The old index may still map the files (Windows); rebuilt again on restart
+            logger.warning(f"Could not save the rebuilt vector index: {e}")
+    except Exception as e:
+        logger.error(f"Vector index rebuild failed: {e}")
+    finally:
+        db.close()
+        _rebuilding = False
+
+
+def _check_embedding_version():
+    """
+    Starts a background rebuild when another process (the backfill) has bumped
+    embedding_version since this index was built. Checked at most every
+    VECTOR_INDEX_VERSION_TTL seconds.
+    """
+    global _next_version_check, _rebuilding
+    now = time.monotonic()
+    if now < _next_version_check or _rebuilding:
+        return
+    _next_version_check = now + VECTOR_INDEX_VERSION_TTL
+    with engine.connect() as conn:
+        version = read_embedding_version(conn)
+    with _init_lock:
+        if _rebuilding or version == vector_index.embedding_version:
+            return
+        _rebuilding = True
+    logger.info(f"Embedding version changed ({vector_index.embedding_version} -> {version}); rebuilding the vector index.")
+    threading.Thread(target=_rebuild_in_background, args=(version,), name="vector-index-rebuild", daemon=True).start()
+
+
+def get_vector_index(db: Session) -> VectorIndex:
+    """Returns the shared index, initializing it on first use."""
+    if not _initialized:
+        init_vector_index(db)
+    _check_embedding_version()
+    return vector_index
@@ -1,43 +1,63 @@
 # AI-Shopping-Assistant/worker.py
 
+import os
+import sys
 import time
+import socket
 import asyncio
-# Import UTC explicitly from datetime
-from datetime import datetime, timedelta, UTC
-from typing import List, Dict, Any
+import argparse
+import multiprocessing
+from typing import List, Dict, Any, Tuple
 
 # --- ABSOLUTE IMPORTS ---
-from app.database.db import SessionLocal, Product, PriceAlert, create_db_and_tables
+from app.database.db import SessionLocal, Product, create_db_and_tables
 from app.utils.logger import setup_logging
-from app.services.email_alerts import email_service
-from app.services.affiliate import affiliate_service
+from app.services.alert_evaluator import evaluate_price_alerts, alert_delivery_tracker
+from app.services.proxy_service import proxy_service
+from app.services.scrape_engine import scrape_engine
+from app.services.rate_limiter import rate_limiter
+from app.services.scheduler import scrape_scheduler, MIN_INTERVAL, RETRY_INTERVAL, SCRAPE_LEASE_SECONDS
+from app.services.http_client import http_client_pool
+from app.services.extractors import shutdown_executor
+from app.services.email_alerts import email_queue
+from app.services.scrape_writer import scrape_writer, ScrapeWriteError
+from app.services.price_history import migrate_legacy_history
+from app.services.db_executor import run_db, shutdown_db_executor
+from app.services.loop_monitor import loop_lag_monitor
+from app.services.scrape_jobs import (
+    ClaimedJob, claim_scrape_jobs, requeue_scrape_jobs, finish_scrape_jobs, has_queued_jobs, prune_finished_jobs,
+    SCRAPE_JOB_POLL_INTERVAL,
+)
 # Import the async scraping function directly from the routes module
-from app.routes.scraper import perform_scraping_task as scrape_product 
+from app.routes.scraper import scrape_and_record as scrape_product
 # ------------------------
 
 logger = setup_logging(__name__)
 
 # --- Configuration for Worker Scheduling (in seconds) ---
-# Check every 6 hours (6 hours * 60 minutes * 60 seconds)
-PRODUCT_CHECK_INTERVAL = 3600 * 6 
+# Per-product intervals come from the scheduler (app/services/scheduler.py).
+# When nothing is due, the worker sleeps until the next product is, but never longer than this
+# so products added through the API are picked up promptly.
+IDLE_POLL_INTERVAL = 60
+# Finished scrape jobs (POST /scraper/trigger) are pruned at most this often
+JOB_PRUNE_INTERVAL = 3600
+# Owner of this process's product leases (WORKER_ID, defaulting to the host name, plus the PID)
+WORKER_ID = f"{os.getenv('WORKER_ID') or socket.gethostname()}:{os.getpid()}"
 
 def get_products_to_scrape() -> List[Product]:
     """
-    Queries the database for products that are due for a price check.
-    Uses UTC to handle time comparison correctly.
+    Leases the next batch of due products (most overdue first) from the scheduler index.
+    Other workers skip leased products, so several workers can run side by side.
     """
     db = SessionLocal()
     try:
-        # Check products scraped before the threshold (6 hours ago)
-        # Using datetime.now(UTC) for time-zone aware comparison
-        threshold_time = datetime.now(UTC) - timedelta(seconds=PRODUCT_CHECK_INTERVAL)
+        products_due = scrape_scheduler.claim_due_products(db, WORKER_ID)
         
-        # Get products that have never been scraped OR were last scraped before the threshold
-        products_due = db.query(Product).filter(
-            (Product.last_scraped == None) | (Product.last_scraped < threshold_time)
-        ).all()
-        
-        logger.info(f"Found {len(products_due)} products due for scraping.")
+        if products_due:
+            lag = scrape_scheduler.get_overdue_seconds(products_due)
+            logger.info(f"Claimed {len(products_due)} due products (oldest overdue by {lag:.0f}s).")
+            if lag > MIN_INTERVAL:
+                logger.warning(f"Scheduler is falling behind by {lag:.0f}s; consider raising SCRAPE_CONCURRENCY.")
         return products_due
     except Exception as e:
         logger.error(f"Error fetching products due for scrape: {e}")
@@ -45,105 +65,306 @@ def get_products_to_scrape() -> List[Product]:
     finally:
         db.close()
 
-def check_and_send_price_alerts(product_data: Dict[str, Any]):
+def get_jobs_to_scrape() -> Tuple[List[ClaimedJob], Dict[str, int]]:
     """
-    Checks all active price alerts for a given product and sends emails if the price 
-    has dropped below the target.
+    Claims the next batch of scrape jobs submitted through the API and leases their
+    existing products, so the scheduler doesn't hand those out as due products too.
+    Returns the jobs and {url: product ID} for the leased products. A job whose
+    product another worker grabbed in the meantime goes back to the queue.
     """
     db = SessionLocal()
-    product_id = product_data['id']
-    
     try:
-        current_price = product_data['current_price']
-        
-        # Find active alerts for this product
-        active_alerts = db.query(PriceAlert).filter(
-            PriceAlert.product_id == product_id,
-            PriceAlert.active == True,
-            PriceAlert.target_price > current_price # Price drop condition
-        ).all()
-        
-        if not active_alerts:
-            return
+        jobs = claim_scrape_jobs(db)
+        if not jobs:
+            return [], {}
+        leased, busy = scrape_scheduler.lease_urls(db, WORKER_ID, [job.url for job in jobs])
+        if busy:
+            requeue_scrape_jobs(db, [job.id for job in jobs if job.url in busy])
+            jobs = [job for job in jobs if job.url not in busy]
+        logger.info(f"Claimed {len(jobs)} scrape jobs.")
+        return jobs, leased
+    except Exception as e:
+        logger.error(f"Error claiming scrape jobs: {e}")
+        return [], {}
+    finally:
+        db.close()
 
-        product_url = product_data['url']
-        
-        for alert in active_alerts:
-            # 1. Create a monetized link for the email notification
-            affiliate_link = affiliate_service.convert_to_affiliate_link(product_url)
-            
-            # 2. Prepare data for the email service
-            alert_data = {
-                "product_name": product_data.get('name', 'Product'),
-                "target_price": alert.target_price,
-                "current_price": current_price,
-                "product_url": affiliate_link,
-                "store": product_data.get('store', 'Store')
-            }
-            
-            # 3. Send the email notification
-            success = email_service.send_price_alert(alert.user_email, alert_data)
-            
-            # 4. Deactivate the alert to prevent spam (typical approach after a successful alert)
-            if success:
-                alert.active = False
-                db.commit()
-                logger.info(f"Price alert sent and deactivated for alert ID {alert.id}.")
+def finish_jobs(outcomes: List[Dict[str, Any]]):
+    """Stores the outcome of finished scrape jobs."""
+    db = SessionLocal()
+    try:
+        finish_scrape_jobs(db, outcomes)
+    except Exception as e:
+        logger.error(f"Error recording {len(outcomes)} scrape job results: {e}")
+    finally:
+        db.close()
+
+def jobs_waiting() -> bool:
+    db = SessionLocal()
+    try:
+        return has_queued_jobs(db)
+    finally:
+        db.close()
 
+def prune_jobs():
+    db = SessionLocal()
+    try:
+        prune_finished_jobs(db)
     except Exception as e:
-        logger.error(f"Error during price alert processing for product ID {product_id}: {e}")
+        logger.error(f"Error pruning finished scrape jobs: {e}")
     finally:
         db.close()
 
-async def run_scrape_cycle():
+async def check_and_send_price_alerts(product_ids: List[int]):
     """
-    Main function to run the scraping and price alert check cycle.
+    Checks all active price alerts for a batch of updated products in one pass and
+    queues emails for those whose price dropped below the target (without waiting
+    for delivery; alerts are deactivated as their emails are delivered).
     """
-    logger.info("--- WORKER: Starting scrape cycle ---")
-    products_to_scrape = get_products_to_scrape()
-    
-    for product in products_to_scrape:
-        logger.info(f"Processing scrape for Product ID: {product.id} ({product.name})...")
-        
-        # 1. Prepare a mock request object for the scraper function (needed for type compatibility)
-        mock_request = type('MockRequest', (object,), {
-            'url': product.url, 
-            'product_name': product.name,
-            'store': product.store
-        })()
-        
-        db = SessionLocal()
+    db = SessionLocal()
+    try:
+        await evaluate_price_alerts(db, product_ids)
+    except Exception as e:
+        logger.error(f"Error during price alert processing for {len(product_ids)} products: {e}")
+    finally:
+        db.close()
+
+async def scrape_product_task(product: Product) -> Tuple[int, bool]:
+    """
+    Scrapes a single product and reports whether its price changed.
+    """
+    logger.info(f"Processing scrape for Product ID: {product.id} ({product.name})...")
+    return await scrape_url(product.url, product.name, product.store)
+
+async def scrape_job_task(job: ClaimedJob) -> Tuple[int, bool]:
+    """
+    Runs a scrape job submitted through the API (the product may not exist yet).
+    """
+    logger.info(f"Processing scrape job {job.id} for {job.url}...")
+    return await scrape_url(job.url, job.product_name, job.store)
+
+async def scrape_url(url: str, name: str, store: str) -> Tuple[int, bool]:
+    """
+    Scrapes one URL and returns (product ID, price changed).
+    Each call uses its own (read-only) session so many can run concurrently;
+    the result is written by the buffered scrape_writer.
+    """
+    # 1. Prepare a mock request object for the scraper function (needed for type compatibility)
+    mock_request = type('MockRequest', (object,), {
+        'url': url, 
+        'product_name': name,
+        'store': store
+    })()
+
+    db = SessionLocal()
+    try:
+        # 2. Run the asynchronous scraping task through a rotated proxy
+        # 3. Only a moved price can trigger alerts (unchanged/304 pages can't newly trigger one,
+        #    since alerts must be created below the price that was current at the time)
+        result = await scrape_product(db, mock_request, proxy_service.get_random_proxy())
+        return result.product_id, result.price_changed
+    finally:
+        db.close()
+
+def reschedule_products(product_ids: List[int]):
+    """Stores the adaptive next_scrape_at for successfully scraped products (releasing their leases)."""
+    db = SessionLocal()
+    try:
+        scrape_scheduler.reschedule(db, WORKER_ID, product_ids)
+    except Exception as e:
+        logger.error(f"Error rescheduling {len(product_ids)} products: {e}")
+    finally:
+        db.close()
+
+def release_failed_products(product_ids: List[int]):
+    """Releases products whose scrape failed; they are retried after RETRY_INTERVAL."""
+    db = SessionLocal()
+    try:
+        scrape_scheduler.release_failed(db, WORKER_ID, product_ids)
+    except Exception as e:
+        logger.error(f"Error releasing {len(product_ids)} failed products: {e}")
+    finally:
+        db.close()
+
+def renew_leases(product_ids: List[int]) -> int:
+    db = SessionLocal()
+    try:
+        return scrape_scheduler.renew_leases(db, WORKER_ID, product_ids)
+    finally:
+        db.close()
+
+async def keep_leases(product_ids: List[int]):
+    """Renews this worker's product leases until cancelled (at the end of the batch)."""
+    while True:
+        await asyncio.sleep(SCRAPE_LEASE_SECONDS / 3)
         try:
-            # 2. Run the asynchronous scraping task 
-            updated_product = await scrape_product(db, mock_request, product.id) 
-            
-            # 3. Check for alerts immediately after a successful price update
-            if updated_product:
-                # __dict__ converts the ORM object to a dictionary for easier passing
-                check_and_send_price_alerts(updated_product.__dict__)
-                
+            held = await run_db(renew_leases, product_ids)
         except Exception as e:
-            # Log the error but don't stop the worker
-            logger.error(f"Failed to execute scraping or alert check for Product ID {product.id}: {e}")
-        finally:
-            db.close()
-            
-    logger.info("--- WORKER: Scrape cycle finished ---")
+            logger.error(f"Error renewing product leases: {e}")
+            continue
+        if held < len(product_ids):
+            logger.warning(f"Lost {len(product_ids) - held} product leases; another worker may scrape them too.")
+
+async def run_scrape_cycle():
+    """
+    Scrapes one batch of submitted jobs and due products, evaluates alerts for the
+    ones whose price changed, and reschedules them.
+    Everything is scraped concurrently within the ScrapeEngine's global and per-store limits.
+    Returns the batch stats, or None when nothing was due.
+    """
+    # Scheduler queries run on the DB threads so in-flight fetches keep progressing.
+    # Jobs lease their products first, so a product is never also claimed as due (and scraped twice).
+    jobs, job_products = await run_db(get_jobs_to_scrape)
+    products_to_scrape = await run_db(get_products_to_scrape)
+    if not jobs and not products_to_scrape:
+        return None
+
+    logger.info("--- WORKER: Starting scrape batch ---")
+    succeeded: List[int] = []
+    failed: List[int] = []
+    price_changed: List[int] = []
+    job_outcomes: List[Dict[str, Any]] = []
+
+    async def scrape_task(item):
+        if isinstance(item, ClaimedJob):
+            try:
+                product_id, changed = await scrape_job_task(item)
+            except Exception as e:
+                job_outcomes.append({"id": item.id, "status": "failed", "product_id": None, "error": str(e)[:500]})
+                if item.url in job_products:
+                    failed.append(job_products[item.url])
+                raise
+            job_outcomes.append({"id": item.id, "status": "done", "product_id": product_id, "error": None})
+        else:
+            try:
+                product_id, changed = await scrape_product_task(item)
+            except Exception:
+                failed.append(item.id)
+                raise
+        succeeded.append(product_id)
+        if changed:
+            price_changed.append(product_id)
+
+    # Failures are logged per product by the engine and don't stop the worker; failed products
+    # are released for a retry after RETRY_INTERVAL. The product leases are renewed for as long
+    # as the batch runs. Jobs go first: a client is polling for them.
+    lease_keeper = asyncio.create_task(keep_leases([*job_products.values(), *(p.id for p in products_to_scrape)]))
+    try:
+        stats = await scrape_engine.run([*jobs, *products_to_scrape], scrape_task, interval=RETRY_INTERVAL)
+        # Alerts (and job results) are read against the stored prices, so write the buffered results first
+        try:
+            await scrape_writer.flush()
+        except ScrapeWriteError as e:
+            # The results stay buffered for the next flush, but a job isn't done until its result is stored
+            for outcome in job_outcomes:
+                if outcome["status"] == "done":
+                    outcome.update(status="failed", error=f"Scraped, but saving the result failed: {e}"[:500])
+        await run_db(finish_jobs, job_outcomes)
+        await check_and_send_price_alerts(price_changed)
+        await run_db(reschedule_products, succeeded)
+        await run_db(release_failed_products, failed)
+    finally:
+        lease_keeper.cancel()
+
+    logger.info("--- WORKER: Scrape batch finished ---")
+    return stats
+
+async def wait_for_work(sleep_for: float):
+    """Sleeps up to `sleep_for` seconds, waking early when a scrape job is submitted."""
+    deadline = time.monotonic() + sleep_for
+    while (remaining := deadline - time.monotonic()) > 0:
+        await asyncio.sleep(min(SCRAPE_JOB_POLL_INTERVAL, remaining))
+        if await run_db(jobs_waiting):
+            return
+
+def get_idle_sleep() -> float:
+    """How long to sleep when no product is due."""
+    db = SessionLocal()
+    try:
+        until_next = scrape_scheduler.seconds_until_next_due(db)
+    finally:
+        db.close()
+    if until_next is None:
+        return IDLE_POLL_INTERVAL
+    return min(IDLE_POLL_INTERVAL, max(1.0, until_next))
 
 async def start_worker():
     """
     Starts the continuous worker loop.
     """
-    logger.info(f"Worker process starting. Checking products every {PRODUCT_CHECK_INTERVAL/3600} hours.")
+    logger.info(f"Worker {WORKER_ID} starting. Pulling due products from the scrape scheduler.")
     
     # Run database setup before starting the infinite loop
     create_db_and_tables()
+    db = SessionLocal()
+    try:
+        await run_db(migrate_legacy_history, db) # One-time move of old PriceHistory rows to the compact store
+    finally:
+        db.close()
+    await email_queue.start()
+    loop_lag_monitor.start()
     
-    while True:
-        await run_scrape_cycle()
-        logger.info(f"Worker sleeping for {PRODUCT_CHECK_INTERVAL} seconds...")
-        await asyncio.sleep(PRODUCT_CHECK_INTERVAL)
+    last_prune = None
+    try:
+        while True:
+            if last_prune is None or time.monotonic() - last_prune > JOB_PRUNE_INTERVAL:
+                await run_db(prune_jobs)
+                last_prune = time.monotonic()
+            stats = await run_scrape_cycle()
+            if stats is not None:
+                logger.info(f"HTTP pool stats: {http_client_pool.get_stats()}")
+                logger.info(f"Write buffer stats: {scrape_writer.get_stats()}")
+                logger.info(f"Event loop lag: {loop_lag_monitor.get_stats()}")
+                continue # Keep draining due products without pausing
+            sleep_for = await run_db(get_idle_sleep)
+            logger.debug(f"No products due. Worker sleeping for {sleep_for:.0f} seconds...")
+            await wait_for_work(sleep_for)
+    finally:
+        # Write buffered results, deliver queued alerts, then release pooled connections and parser processes
+        await scrape_writer.stop()
+        await email_queue.stop()
+        await alert_delivery_tracker.drain() # Record what the queue delivered while draining
+        await http_client_pool.aclose()
+        shutdown_executor()
+        loop_lag_monitor.stop()
+        shutdown_db_executor()
 
-if __name__ == "__main__":
-    # If run standalone, use asyncio to start the async loop
+def run_worker_process(processes: int = 1, index: int = 0):
+    # Sibling processes share each store's request rate and concurrency budget
+    rate_limiter.set_processes(processes, index)
+    scrape_engine.set_processes(processes, index)
     asyncio.run(start_worker())
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape worker. Any number of these (on one or many machines) can share one database.")
+    parser.add_argument(
+        "--processes", type=int, default=int(os.getenv("WORKER_PROCESSES", "1")),
+        help="Worker processes to run on this machine (each has its own event loop and leases, and a share of the per-store budget; "
+             "each gets at least 1 concurrent scrape and burst token per store).",
+    )
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        # If run standalone, use asyncio to start the async loop
+        run_worker_process()
+        return
+
+    # The tables already exist (db.py creates them on import), so the children don't race on DDL
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=run_worker_process, args=(args.processes, i), name=f"worker-{i}")
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    logger.info(f"Started {args.processes} worker processes.")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join() # Children got the same Ctrl+C and shut down on their own
+    sys.exit(max((process.exitcode or 0) for process in processes))
+
+if __name__ == "__main__":
+    main()